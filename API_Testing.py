@@ -1,8 +1,8 @@
 # Import libraries
 import re
-import json
 from tqdm import tqdm
-from openai import OpenAI
+from extractionRunner import timed_completion
+from jsonlIO import load_jsonl_dataset, JsonlWriter
 
 # API key
 OPENAI_KEY = ""
@@ -11,13 +11,15 @@ OPENAI_KEY = ""
 class API:
     def __init__(self, model, test_dataset, output_path, prompt):
         self.model = model
+        # Import the SDK only when a client is created, not on import of this script
+        from openai import OpenAI
         self.client = OpenAI(api_key=OPENAI_KEY)
         self.test_dataset = test_dataset
         self.output = output_path
         self.prompt = prompt
 
     def run(self):
-        with open(self.output, 'w') as outfile:
+        with JsonlWriter(self.output) as outfile:
             # Load the data
             for data in tqdm(self.test_dataset):
                 abstract = data['input']
@@ -27,17 +29,7 @@ class API:
                 text = self.prompt + abstract
 
                 # Run through the model
-                response = self.client.chat.completions.create(
-                    model=self.model,
-                    messages=[
-                        {
-                            "role": "user",
-                            "content": text
-                        },
-                    ]
-                )
-        
-                generated_output = response.choices[0].message.content.strip()
+                generated_output, stats = timed_completion(self.client, self.model, text)
 
                 # Initally set valid as False
                 valid = False
@@ -55,17 +47,7 @@ class API:
                     print(generated_output)
 
                 # Save the {'input': abstract, 'output': output} pair to JSONL
-                json.dump({'input': abstract, 'output':output, 'output_complete': generated_output, 'valid':valid}, outfile)
-                outfile.write('\n')
-
-# Load JSONL dataset
-def load_jsonl_dataset(file_path):
-    dataset = []
-    with open(file_path, 'r', encoding='utf-8') as file:
-        for line in file:
-            data = json.loads(line.strip())
-            dataset.append(data)
-    return dataset
+                outfile.write({'input': abstract, 'output':output, 'output_complete': generated_output, 'valid':valid, 'model': self.model, 'latency': stats['latency'], 'usage': {'prompt_tokens': stats['prompt_tokens'], 'completion_tokens': stats['completion_tokens']}})
 
 if __name__ == "__main__":
     # Initialize variables
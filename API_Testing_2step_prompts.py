@@ -1,8 +1,8 @@
 # Import libraries
 import re
-import json
 from tqdm import tqdm
-from openai import OpenAI
+from extractionRunner import timed_completion, merge_stats
+from jsonlIO import load_jsonl_dataset, JsonlWriter
 
 # API key
 OPENAI_KEY = ""
@@ -11,12 +11,14 @@ OPENAI_KEY = ""
 class API:
     def __init__(self, model, test_dataset, output_path, prompt1):
         self.model = model
+        # Import the SDK only when a client is created, not on import of this script
+        from openai import OpenAI
         self.client = OpenAI(api_key=OPENAI_KEY)
         self.test_dataset = test_dataset
         self.output = output_path
         self.prompt1 = prompt1
     def run(self):
-        with open(self.output, 'w') as outfile:
+        with JsonlWriter(self.output) as outfile:
             # Load the data
             for data in tqdm(self.test_dataset):
                 abstract = data['input']
@@ -26,17 +28,7 @@ class API:
                 text = self.prompt1 + abstract 
 
                 # Run through the model
-                response = self.client.chat.completions.create(
-                    model=self.model,
-                    messages=[
-                        {
-                            "role": "user",
-                            "content": text
-                        },
-                    ]
-                )
-        
-                generated_output = response.choices[0].message.content.strip()
+                generated_output, stats1 = timed_completion(self.client, self.model, text)
 
                 prompt2 = f"""You are a top-tier algorithm designed for extracting information in structured formats to build a knowledge graph. 
                 extract semantic triples using the following predicates (the definition for each predicate has been defined in the corresponding parentheses):
@@ -97,22 +89,15 @@ class API:
                 text = prompt2 + abstract 
 
                 # Run through the model
-                response = self.client.chat.completions.create(
-                    model=self.model,
-                    messages=[
-                        {
-                            "role": "user",
-                            "content": text
-                        },
-                    ]
-                )
-        
-                generated_output = response.choices[0].message.content.strip()
+                generated_output, stats2 = timed_completion(self.client, self.model, text)
 
 
 
 
 
+                # Combine the latency and token usage of both requests
+                stats = merge_stats(stats1, stats2)
+
                 # Initally set valid as False
                 valid = False
 
@@ -129,17 +114,7 @@ class API:
                     print(generated_output)
 
                 # Save the {'input': abstract, 'output': output} pair to JSONL
-                json.dump({'input': abstract, 'output':output, 'output_complete': generated_output, 'valid':valid}, outfile)
-                outfile.write('\n')
-
-# Load JSONL dataset
-def load_jsonl_dataset(file_path):
-    dataset = []
-    with open(file_path, 'r', encoding='utf-8') as file:
-        for line in file:
-            data = json.loads(line.strip())
-            dataset.append(data)
-    return dataset
+                outfile.write({'input': abstract, 'output':output, 'output_complete': generated_output, 'valid':valid, 'model': self.model, 'latency': stats['latency'], 'usage': {'prompt_tokens': stats['prompt_tokens'], 'completion_tokens': stats['completion_tokens']}})
 
 if __name__ == "__main__":
     # Initialize variables
@@ -1,15 +1,17 @@
 # Import Libraries
 import os
-from crewai import Agent, Task, Crew
 from tqdm import tqdm
 import re
-import json
+from jsonlIO import load_jsonl_dataset, JsonlWriter
 
 # Set up OPEN AI key
 os.environ["OPENAI_API_KEY"] = ""
 
 
 def abstract_to_triple(abstract):
+    # Import crewai only when an extraction actually runs
+    from crewai import Agent, Task, Crew
+
     # Define predicates
     predicates = """
         1) Environmental processes (A series of events that occur naturally in the environment and not within an organism)
@@ -93,20 +95,12 @@ def abstract_to_triple(abstract):
     result = crew.kickoff()
     return result   
 
-def load_jsonl_dataset(file_path):
-    dataset = []
-    with open(file_path, 'r', encoding='utf-8') as file:
-        for line in file:
-            data = json.loads(line.strip())
-            dataset.append(data)
-    return dataset
-
 if __name__ == "__main__":  
     testing_set = "/home/wishartlab/TMIC/Data/Training_Data/213_Data_Total/44_Testing.jsonl"
     output_path = "/home/wishartlab/TMIC/test.jsonl"
     test_dataset = load_jsonl_dataset(testing_set)
 
-    with open(output_path, 'w') as outfile:
+    with JsonlWriter(output_path) as outfile:
         for data in tqdm(testing_set):
             abstract = data['input']
             generated_output = abstract_to_triple(abstract)
@@ -128,5 +122,4 @@ if __name__ == "__main__":
                 print(generated_output)
 
             # Save the {'input': abstract, 'output': output} pair to JSONL
-            json.dump({'input': abstract, 'output':output, 'output_complete': generated_output, 'valid':valid}, outfile)
-            outfile.write('\n')
\ No newline at end of file
+            outfile.write({'input': abstract, 'output':output, 'output_complete': generated_output, 'valid':valid})
\ No newline at end of file
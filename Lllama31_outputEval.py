@@ -1,8 +1,8 @@
 # Import libraries
 import re
-import json
 from tqdm import tqdm
-from groq import Groq
+from extractionRunner import timed_completion
+from jsonlIO import load_jsonl_dataset, JsonlWriter
 
 
 
@@ -10,13 +10,15 @@ from groq import Groq
 class API:
     def __init__(self, model, test_dataset, output_path, prompt,api_key):
         self.model = model
+        # Import the SDK only when a client is created, not on import of this script
+        from groq import Groq
         self.client = Groq(api_key=api_key)
         self.test_dataset = test_dataset
         self.output = output_path
         self.prompt = prompt
 
     def run(self):
-        with open(self.output, 'w') as outfile:
+        with JsonlWriter(self.output) as outfile:
             # Load the data
             for data in tqdm(self.test_dataset):
                 abstract = data['input']
@@ -26,18 +28,7 @@ class API:
                 text = self.prompt + abstract
 
                 # Run through the model
-                chat_completion = self.client.chat.completions.create(
-                                                                    model=self.model,
-                                                                    messages=[
-                                                                        {
-                                                                            "role": "user",
-                                                                            "content": text
-                                                                        }
-                                                                    ],
-                                                                
-                                                                )
-        
-                generated_output = chat_completion.choices[0].message.content
+                generated_output, stats = timed_completion(self.client, self.model, text)
 
                 # Initally set valid as False
                 valid = False
@@ -55,17 +46,7 @@ class API:
                     print(generated_output)
 
                 # Save the {'input': abstract, 'output': output} pair to JSONL
-                json.dump({'input': abstract, 'output':output, 'output_complete': generated_output, 'valid':valid}, outfile)
-                outfile.write('\n')
-
-# Load JSONL dataset
-def load_jsonl_dataset(file_path):
-    dataset = []
-    with open(file_path, 'r', encoding='utf-8') as file:
-        for line in file:
-            data = json.loads(line.strip())
-            dataset.append(data)
-    return dataset
+                outfile.write({'input': abstract, 'output':output, 'output_complete': generated_output, 'valid':valid, 'model': self.model, 'latency': stats['latency'], 'usage': {'prompt_tokens': stats['prompt_tokens'], 'completion_tokens': stats['completion_tokens']}})
 
 if __name__ == "__main__":
     # Initialize variables
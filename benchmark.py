@@ -0,0 +1,238 @@
+import os
+import sys
+import json
+import time
+import socket
+import platform
+import argparse
+import subprocess
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from memoryStats import peak_rss, reset_peak_rss, format_bytes
+
+STAGES = ['filter', 'extract', 'evaluate']
+
+def _percentile(values, q):
+    """
+    Nearest-rank percentile of a list of numbers.
+    """
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q / 100 * len(ordered)))]
+
+def stage_result(latencies, elapsed, peak):
+    return {
+        "docs": len(latencies),
+        "seconds": elapsed,
+        "docs_per_sec": len(latencies) / elapsed if elapsed > 0 else None,
+        "p50": _percentile(latencies, 50) if latencies else None,
+        "p99": _percentile(latencies, 99) if latencies else None,
+        "peak_rss": peak,
+    }
+
+def timed_stage(items, function, workers=1):
+    """
+    Runs function over every item and returns (results, stage result). Peak RSS is the
+    process high-water mark during the stage, where the kernel allows resetting it.
+    """
+    reset = reset_peak_rss()
+    latencies = []
+
+    def run_one(item):
+        start = time.perf_counter()
+        result = function(item)
+        latencies.append(time.perf_counter() - start)
+        return result
+
+    start = time.perf_counter()
+    if workers > 1:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(run_one, items))
+    else:
+        results = [run_one(item) for item in items]
+    elapsed = time.perf_counter() - start
+    result = stage_result(latencies, elapsed, peak_rss())
+    result["peak_rss_is_process_lifetime"] = not reset
+    return results, result
+
+def bench_filter(xml_dir):
+    from memo import iter_xml_files, parse_xml_file, filter_articles, get_nlp
+    import logging
+    logger = logging.getLogger("benchmark")
+    # Load the model outside the timed region; its load time is reported separately
+    start = time.perf_counter()
+    get_nlp()
+    load_seconds = time.perf_counter() - start
+
+    def filter_one(file_path):
+        article = parse_xml_file(file_path, logger)
+        return bool(article) and filter_articles(article)
+
+    kept, result = timed_stage(sorted(iter_xml_files(xml_dir)), filter_one)
+    result["model_load_seconds"] = load_seconds
+    result["kept"] = sum(kept)
+    return result
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def start_mock_server(latency, jitter, error_rate, rate_limit, seconds_per_token=0.0):
+    """
+    Starts mockLLMServer.py in its own process, so the server never competes with the
+    client for the GIL, and waits until it accepts connections.
+    """
+    port = _free_port()
+    command = [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'mockLLMServer.py'),
+               '--port', str(port), '--latency', str(latency), '--jitter', str(jitter), '--error_rate', str(error_rate),
+               '--seconds_per_token', str(seconds_per_token)]
+    if rate_limit:
+        command += ['--rate_limit', str(rate_limit)]
+    process = subprocess.Popen(command, stdout=subprocess.DEVNULL)
+    for _ in range(100):
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=0.1).close()
+            return process, f"http://127.0.0.1:{port}/v1"
+        except OSError:
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError("Mock LLM server did not start")
+
+def bench_extract(passages, prompt, workers, latency, jitter, error_rate, rate_limit, seconds_per_token=0.0, structured=None):
+    from extractionRunner import ExtractionRunner, create_client
+    process, url = start_mock_server(latency, jitter, error_rate, rate_limit, seconds_per_token)
+    try:
+        client = create_client('openai', api_key='mock', base_url=url)
+        runner = ExtractionRunner('mock', passages, None, prompt, client, structured=structured)
+
+        def extract_one(data):
+            try:
+                return runner.extract(data['input'])
+            except Exception:
+                # Requests that fail after the SDK's own retries count as empty outputs
+                return None
+
+        records, result = timed_stage(passages, extract_one, workers)
+    finally:
+        process.terminate()
+        process.wait()
+    result["failed"] = sum(record is None for record in records)
+    result["invalid"] = sum(record is not None and not record['valid'] for record in records)
+    completed = [record for record in records if record is not None]
+    result["mean_completion_tokens"] = sum(record['usage']['completion_tokens'] for record in completed) / len(completed) if completed else None
+    result["workers"] = workers
+    return records, result
+
+def bench_evaluate(records, passages):
+    from multiBasicEval import calculate_confusion_lists
+    pairs = [((record or {}).get('output', []), data['output']) for record, data in zip(records, passages)]
+    counts, result = timed_stage(pairs, lambda pair: [len(part) for part in calculate_confusion_lists(*pair)])
+    tp = sum(count[0] for count in counts)
+    fp = sum(count[1] for count in counts)
+    fn = sum(count[2] for count in counts)
+    result["precision"] = tp / (tp + fp) if tp + fp > 0 else None
+    result["recall"] = tp / (tp + fn) if tp + fn > 0 else None
+    return result
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+def print_results(results):
+    print(f"{'Stage':10} {'Docs':>7} {'Docs/s':>9} {'p50 s':>8} {'p99 s':>8} {'Peak RSS':>10}")
+    for stage in STAGES:
+        stats = results["stages"].get(stage)
+        if stats is None:
+            continue
+        if "skipped" in stats:
+            print(f"{stage:10} skipped: {stats['skipped']}")
+            continue
+        print(f"{stage:10} {stats['docs']:>7} {stats['docs_per_sec']:>9.2f} {stats['p50']:>8.4f} {stats['p99']:>8.4f} {format_bytes(stats['peak_rss']):>10}")
+
+def print_history(results_dir):
+    """
+    Prints docs/sec of every stored run, oldest first, to compare runs over time.
+    """
+    runs = []
+    for name in sorted(os.listdir(results_dir)):
+        if name.startswith('bench_') and name.endswith('.json'):
+            with open(os.path.join(results_dir, name), 'r') as file:
+                runs.append(json.load(file))
+    print(f"{'Timestamp':20} {'Commit':10} " + " ".join(f"{stage + ' docs/s':>16}" for stage in STAGES))
+    for run in runs:
+        rates = []
+        for stage in STAGES:
+            rate = run["stages"].get(stage, {}).get("docs_per_sec")
+            rates.append(f"{rate:>16.2f}" if rate is not None else f"{'-':>16}")
+        print(f"{run['timestamp']:20} {run['commit'] or '-':10} " + " ".join(rates))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the filter, extraction and evaluation stages offline on a synthetic corpus.')
+    parser.add_argument('--corpus', type=str, default='bench_corpus', help='Synthetic corpus folder; generated if missing (default: bench_corpus)')
+    parser.add_argument('--num_docs', type=int, default=200, help='Articles to generate for a new corpus (default: 200)')
+    parser.add_argument('--body_paragraphs', type=int, default=20, help='Body paragraphs per generated article (default: 20)')
+    parser.add_argument('--stages', type=str, default=','.join(STAGES), help='Comma separated stages to run (default: all)')
+    parser.add_argument('--prompt_file', type=str, default=None, help='Prompt prepended to every passage (default: a one-line prompt)')
+    parser.add_argument('--extract_workers', type=int, default=8, help='Concurrent extraction requests (default: 8)')
+    parser.add_argument('--latency', type=float, default=0.2, help='Mock server mean latency in seconds (default: 0.2)')
+    parser.add_argument('--jitter', type=float, default=0.05, help='Mock server latency standard deviation (default: 0.05)')
+    parser.add_argument('--error_rate', type=float, default=0.0, help='Mock server HTTP 500 rate (default: 0)')
+    parser.add_argument('--rate_limit', type=float, default=None, help='Mock server requests per second before HTTP 429 (default: unlimited)')
+    parser.add_argument('--seconds_per_token', type=float, default=0.0, help='Mock server latency per completion token (default: 0)')
+    parser.add_argument('--structured_output', type=str, default=None, choices=['json_schema', 'guided_json'], help='Request schema-constrained output (default: free text)')
+    parser.add_argument('--results_dir', type=str, default='bench_results', help='Folder to store result JSON in (default: bench_results)')
+    parser.add_argument('--history', action='store_true', help='Print stored results instead of running')
+
+    args = parser.parse_args(argv)
+
+    if args.history:
+        print_history(args.results_dir)
+        return
+
+    from syntheticCorpus import generate
+    from extractionRunner import load_jsonl_dataset
+    if not os.path.exists(os.path.join(args.corpus, 'passages.jsonl')):
+        generate(args.corpus, args.num_docs, args.body_paragraphs)
+    passages = load_jsonl_dataset(os.path.join(args.corpus, 'passages.jsonl'))
+    prompt = "Extract [subject, predicate, object] triples from the passage:\n"
+    if args.prompt_file:
+        with open(args.prompt_file, 'r', encoding='utf-8') as file:
+            prompt = file.read()
+
+    stages = args.stages.split(',')
+    results = {
+        "timestamp": datetime.now().isoformat(timespec='seconds'),
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "config": {key: value for key, value in vars(args).items() if key not in ('history', 'results_dir')},
+        "stages": {},
+    }
+
+    if 'filter' in stages:
+        try:
+            results["stages"]["filter"] = bench_filter(os.path.join(args.corpus, 'xml'))
+        except (ImportError, OSError) as e:
+            # No spaCy or no en_ner_bc5cdr_md model in this environment
+            results["stages"]["filter"] = {"skipped": str(e)}
+    records = [None] * len(passages)
+    if 'extract' in stages:
+        records, results["stages"]["extract"] = bench_extract(passages, prompt, args.extract_workers, args.latency,
+                                                               args.jitter, args.error_rate, args.rate_limit,
+                                                               args.seconds_per_token, args.structured_output)
+    if 'evaluate' in stages:
+        results["stages"]["evaluate"] = bench_evaluate(records, passages)
+
+    print_results(results)
+    os.makedirs(args.results_dir, exist_ok=True)
+    results_path = os.path.join(args.results_dir, f"bench_{datetime.now().strftime('%Y%m%d%H%M%S')}.json")
+    with open(results_path, 'w') as file:
+        json.dump(results, file, indent=4)
+    print(f"Results written to {results_path}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,159 @@
+import os
+import gzip
+import json
+import hashlib
+import argparse
+from tqdm import tqdm
+from jsonlIO import iter_jsonl, JsonlIndex, JsonlWriter, OFFLINE_BATCH_SIZE, loads, dumps
+from textNormalize import normalize_record
+
+RAW_SUFFIX = '.raw.jsonl.gz'
+META_SUFFIX = '.meta.json'
+
+def input_hash(text):
+    """
+    Short content hash of a passage, to check that a reference still points at the same text.
+    """
+    return hashlib.blake2b(text.encode('utf-8'), digest_size=8).hexdigest()
+
+class CompactOutput:
+    """
+    Turns extraction records into their compact form: the passage is replaced by an
+    'input_ref' (position in the run, byte offset in the dataset where known, content
+    hash) and the raw completion is moved to a gzip side file, <output>.raw.jsonl.gz,
+    that is only read for debugging. <output>.meta.json records the dataset path and
+    whether passages were normalised (normalize_record) after reading, as the
+    extraction runner does; hashes are of the passage as the model saw it.
+    """
+    def __init__(self, output_path, dataset_path=None, normalized=True):
+        self.raw = gzip.open(output_path + RAW_SUFFIX, 'wb')
+        with open(output_path + META_SUFFIX, 'w') as file:
+            json.dump({'format': 'compact', 'dataset': os.path.abspath(dataset_path) if dataset_path else None,
+                       'normalized': normalized}, file)
+
+    def compact(self, record, index, offset=None):
+        record = dict(record)
+        text = record.pop('input')
+        raw = record.pop('output_complete', None)
+        input_ref = {'index': index, 'hash': input_hash(text)}
+        if offset is not None:
+            input_ref['offset'] = offset
+        record['input_ref'] = input_ref
+        # A duplicate's completion is its representative's, which is already stored
+        if raw is not None and 'duplicate_of' not in record:
+            self.raw.write(dumps({'index': index, 'output_complete': raw}) + b'\n')
+        return record
+
+    def close(self):
+        self.raw.close()
+
+def read_meta(output_path):
+    """
+    Returns the metadata of a compact output file, or None for a full output file.
+    """
+    try:
+        with open(output_path + META_SUFFIX, 'r') as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return None
+
+def read_raw(output_path):
+    """
+    Raw completions of a compact output file by run position. Reads the whole side file.
+    """
+    raw = {}
+    with gzip.open(output_path + RAW_SUFFIX, 'rb') as file:
+        for line in file:
+            entry = loads(line)
+            raw[entry['index']] = entry['output_complete']
+    return raw
+
+def iter_output(output_path, inputs=False, raw=False, dataset_path=None):
+    """
+    Yields the records of an extraction output file, full or compact. For compact records
+    the passage (inputs=True) and the raw completion (raw=True) are restored on demand;
+    passages are read from the dataset by byte offset (or position), normalised as they
+    were for the run, and checked against their hash.
+    """
+    meta = read_meta(output_path)
+    if meta is None or not (inputs or raw):
+        yield from iter_jsonl(output_path)
+        return
+    dataset = None
+    if inputs:
+        dataset_path = dataset_path or meta['dataset']
+        if dataset_path is None:
+            raise ValueError(f"{output_path} does not name its dataset; pass dataset_path")
+        dataset = JsonlIndex(dataset_path, normalize_record if meta.get('normalized') else None)
+    raw_completions = read_raw(output_path) if raw else None
+    try:
+        for record in iter_output(output_path):
+            input_ref = record.get('input_ref')
+            if input_ref is None:
+                yield record
+                continue
+            if dataset is not None:
+                if 'offset' in input_ref:
+                    text = dataset.read_at(input_ref['offset'])['input']
+                else:
+                    text = dataset[input_ref['index']]['input']
+                if input_hash(text) != input_ref['hash']:
+                    raise ValueError(f"Record {input_ref['index']} of {output_path} no longer matches {dataset.path}")
+                record['input'] = text
+            if raw_completions is not None:
+                source = record.get('duplicate_of', input_ref['index'])
+                record['output_complete'] = raw_completions.get(source, '')
+            yield record
+    finally:
+        if dataset is not None:
+            dataset.close()
+
+def compact_file(output_path, compact_path, dataset_path=None, normalized=True):
+    """
+    Writes the compact form of an existing full output file. With the dataset, references
+    carry byte offsets; records must then be in dataset order. normalized says whether
+    the run normalised its passages (every run since textNormalize was added does).
+    """
+    dataset = JsonlIndex(dataset_path) if dataset_path else None
+    compact = CompactOutput(compact_path, dataset_path, normalized)
+    try:
+        with JsonlWriter(compact_path, batch_size=OFFLINE_BATCH_SIZE) as outfile:
+            for index, record in enumerate(tqdm(iter_jsonl(output_path), desc="Compacting", unit=" records")):
+                outfile.write(compact.compact(record, index, dataset.offset(index) if dataset is not None else None))
+    finally:
+        compact.close()
+        if dataset is not None:
+            dataset.close()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Convert extraction output between the full and the compact format.')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    compact_parser = subparsers.add_parser('compact', help='Write the compact form of a full output file')
+    compact_parser.add_argument('output', type=str, help='Full extraction output JSONL')
+    compact_parser.add_argument('compact', type=str, help='Compact output JSONL to write')
+    compact_parser.add_argument('--dataset', type=str, default=None, help='Dataset the output was extracted from, to store byte offsets')
+    compact_parser.add_argument('--raw_inputs', action='store_true', help='The run sent dataset passages without normalising them (older runs)')
+
+    expand_parser = subparsers.add_parser('expand', help='Write the full form of a compact output file')
+    expand_parser.add_argument('compact', type=str, help='Compact extraction output JSONL')
+    expand_parser.add_argument('output', type=str, help='Full output JSONL to write')
+    expand_parser.add_argument('--dataset', type=str, default=None, help='Dataset to restore passages from (default: the one recorded)')
+    expand_parser.add_argument('--no_raw', action='store_true', help='Do not restore the raw completions')
+
+    args = parser.parse_args(argv)
+
+    if args.command == 'compact':
+        compact_file(args.output, args.compact, args.dataset, not args.raw_inputs)
+        before, after = os.path.getsize(args.output), os.path.getsize(args.compact)
+        side = os.path.getsize(args.compact + RAW_SUFFIX)
+        print(f"{before / 1e6:.2f} MB -> {after / 1e6:.2f} MB (+ {side / 1e6:.2f} MB compressed raw completions)")
+    else:
+        with JsonlWriter(args.output, batch_size=OFFLINE_BATCH_SIZE) as outfile:
+            for record in tqdm(iter_output(args.compact, inputs=True, raw=not args.no_raw, dataset_path=args.dataset),
+                               desc="Expanding", unit=" records"):
+                record.pop('input_ref', None)
+                outfile.write(record)
+
+if __name__ == '__main__':
+    main()
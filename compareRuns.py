@@ -0,0 +1,111 @@
+import os
+import json
+import argparse
+import numpy as np
+import pandas as pd
+from multiBasicEval import score_rows, incremental_score_rows
+
+COMPARISON_METRICS = [
+    "Precision",
+    "Recall",
+    "F1-score",
+    "Bonus Precision",
+    "Bonus Recall",
+    "Bonus F1-score",
+    "Bonus Precision and Recall F1 Score",
+]
+CHUNK_SIZE = 1000
+
+def load_score_matrix(file_path, incremental=False):
+    """
+    Reads an evaluated Excel sheet and returns its (rows x metrics) score matrix.
+    """
+    df = pd.read_excel(file_path)
+    rows = [row for _, row in df.iterrows()]
+    if incremental:
+        row_scores = incremental_score_rows(rows, file_path.split(".")[0] + ".evalcache.json")
+    else:
+        row_scores = score_rows(rows)
+    return np.array([[scores[metric] for metric in COMPARISON_METRICS] for scores in row_scores], dtype=np.float64)
+
+def bootstrap_means(score_matrices, num_samples=10000, seed=0):
+    """
+    Paired bootstrap over rows: every resample draws the same rows for every run.
+    Returns an array of shape (runs, samples, metrics) with the resampled means.
+
+    Resamples are expressed as multinomial row counts, so each chunk of samples is
+    a single matrix product per run instead of a Python loop.
+    """
+    scores = np.stack(score_matrices)
+    num_runs, num_rows, num_metrics = scores.shape
+    rng = np.random.default_rng(seed)
+
+    means = np.empty((num_runs, num_samples, num_metrics))
+    uniform = np.full(num_rows, 1.0 / num_rows)
+    for start in range(0, num_samples, CHUNK_SIZE):
+        stop = min(start + CHUNK_SIZE, num_samples)
+        counts = rng.multinomial(num_rows, uniform, size=stop - start).astype(np.float64)
+        for run in range(num_runs):
+            means[run, start:stop] = counts @ scores[run] / num_rows
+    return means
+
+def compare_runs(file_paths, num_samples=10000, confidence=0.95, seed=0, incremental=False):
+    """
+    Computes bootstrap confidence intervals for every run and for the difference of
+    every run against the first (baseline) run.
+    """
+    score_matrices = [load_score_matrix(file_path, incremental) for file_path in file_paths]
+    num_rows = {len(matrix) for matrix in score_matrices}
+    if len(num_rows) != 1:
+        raise ValueError(f"Runs must be evaluated on the same rows to be paired, got row counts {sorted(num_rows)}")
+
+    means = bootstrap_means(score_matrices, num_samples, seed)
+    lower = (1 - confidence) / 2 * 100
+    upper = 100 - lower
+
+    results = {"samples": num_samples, "confidence": confidence, "baseline": file_paths[0], "runs": {}}
+    for run, file_path in enumerate(file_paths):
+        run_result = {}
+        for m, metric in enumerate(COMPARISON_METRICS):
+            low, high = np.percentile(means[run, :, m], [lower, upper])
+            run_result[metric] = {"mean": float(score_matrices[run][:, m].mean()), "ci": [float(low), float(high)]}
+            if run > 0:
+                diff = means[run, :, m] - means[0, :, m]
+                diff_low, diff_high = np.percentile(diff, [lower, upper])
+                run_result[metric]["diff"] = float(score_matrices[run][:, m].mean() - score_matrices[0][:, m].mean())
+                run_result[metric]["diff_ci"] = [float(diff_low), float(diff_high)]
+                # Fraction of resamples where this run is not better than the baseline
+                run_result[metric]["p_not_better"] = float(np.mean(diff <= 0))
+        results["runs"][file_path] = run_result
+    return results
+
+def print_comparison(results):
+    confidence = int(results["confidence"] * 100)
+    for file_path, run_result in results["runs"].items():
+        print(os.path.basename(file_path) + (" (baseline)" if file_path == results["baseline"] else "") + ":")
+        for metric, stats in run_result.items():
+            line = f"  {metric}: {stats['mean']:.4f} [{confidence}% CI {stats['ci'][0]:.4f}, {stats['ci'][1]:.4f}]"
+            if "diff" in stats:
+                line += f"  diff {stats['diff']:+.4f} [{stats['diff_ci'][0]:+.4f}, {stats['diff_ci'][1]:+.4f}] p(not better)={stats['p_not_better']:.4f}"
+            print(line)
+        print()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Compare evaluated runs with paired bootstrap confidence intervals.')
+    parser.add_argument('sheets', type=str, nargs='+', help='Evaluated Excel sheets; the first is the baseline')
+    parser.add_argument('--samples', type=int, default=10000, help='Number of bootstrap samples (default: 10000)')
+    parser.add_argument('--confidence', type=float, default=0.95, help='Confidence level (default: 0.95)')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed (default: 0)')
+    parser.add_argument('--incremental', action='store_true', help='Reuse the per-row score caches of incremental evaluation')
+    parser.add_argument('--output', type=str, default=None, help='Optional JSON file to write the comparison to')
+
+    args = parser.parse_args(argv)
+
+    results = compare_runs(args.sheets, args.samples, args.confidence, args.seed, args.incremental)
+    print_comparison(results)
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(results, file, indent=4)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,144 @@
+import os
+import json
+import argparse
+from collections import defaultdict
+from tqdm import tqdm
+from predicates import PREDICATES, canonical_predicate
+from extractionRunner import request_cost
+from multiBasicEval import calculate_confusion_lists
+from jsonlIO import loads
+
+OFF_LIST = "(off-list)"
+
+def _percentile(values, q):
+    """
+    Nearest-rank percentile of a list of numbers.
+    """
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q / 100 * len(ordered)))]
+
+def _ratio(numerator, denominator):
+    return numerator / denominator if denominator > 0 else None
+
+def build_report(output_file, ground_truth_file, normalizer=None):
+    """
+    Joins the per-request latency/token usage recorded by the extraction runner with
+    per-predicate confusion counts for one output file.
+    """
+    counts = {predicate: {"tp": 0, "fp": 0, "fn": 0} for predicate in PREDICATES + [OFF_LIST]}
+    latencies = []
+    prompt_tokens = 0
+    completion_tokens = 0
+    cost = 0.0
+    models = defaultdict(int)
+    num_records = 0
+    invalid = 0
+
+    with open(output_file, 'r', encoding="utf-8") as output_file_handle, open(ground_truth_file, "r", encoding="utf-8") as gt_file:
+        for output_line, gt_line in tqdm(zip(output_file_handle, gt_file), desc="Reading JSONL", unit=" lines"):
+            output_data = loads(output_line)
+            gt_data = loads(gt_line)
+            num_records += 1
+            invalid += not output_data.get('valid', True)
+
+            true_positives, false_positives, false_negatives = calculate_confusion_lists(output_data['output'], gt_data['output'], normalizer)
+            for key, triples in (("tp", true_positives), ("fp", false_positives), ("fn", false_negatives)):
+                for triple in triples:
+                    counts[canonical_predicate(triple[1]) or OFF_LIST][key] += 1
+
+            # Records written before latency/usage were recorded count towards quality only
+            model = output_data.get('model', 'unknown')
+            models[model] += 1
+            if 'latency' in output_data:
+                latencies.append(output_data['latency'])
+            usage = output_data.get('usage', {})
+            prompt_tokens += usage.get('prompt_tokens', 0)
+            completion_tokens += usage.get('completion_tokens', 0)
+            cost += request_cost(model, usage.get('prompt_tokens', 0), usage.get('completion_tokens', 0))
+            # An escalated cascade record also paid for the small model's attempt; a duplicate
+            # copied from it (by older runs, 'cascade' included) paid for nothing
+            cascade = output_data.get('cascade')
+            if cascade and cascade.get('escalated') and 'duplicate_of' not in output_data:
+                small_usage = cascade.get('small_usage', {})
+                prompt_tokens += small_usage.get('prompt_tokens', 0)
+                completion_tokens += small_usage.get('completion_tokens', 0)
+                cost += request_cost(cascade['small_model'], small_usage.get('prompt_tokens', 0), small_usage.get('completion_tokens', 0))
+
+    predicates = {}
+    for predicate, predicate_counts in counts.items():
+        tp, fp, fn = predicate_counts["tp"], predicate_counts["fp"], predicate_counts["fn"]
+        if tp + fp + fn == 0:
+            continue
+        predicates[predicate] = dict(predicate_counts, precision=_ratio(tp, tp + fp), recall=_ratio(tp, tp + fn))
+
+    correct = sum(predicate_counts["tp"] for predicate_counts in counts.values())
+    total_tokens = prompt_tokens + completion_tokens
+    total_latency = sum(latencies)
+    return {
+        "output_file": output_file,
+        "models": dict(models),
+        "records": num_records,
+        "invalid_outputs": invalid,
+        "correct_triples": correct,
+        "false_positives": sum(predicate_counts["fp"] for predicate_counts in counts.values()),
+        "false_negatives": sum(predicate_counts["fn"] for predicate_counts in counts.values()),
+        "latency": {
+            "total": total_latency,
+            "mean": _ratio(total_latency, len(latencies)),
+            "p50": _percentile(latencies, 50) if latencies else None,
+            "p95": _percentile(latencies, 95) if latencies else None,
+        },
+        "tokens": {"prompt": prompt_tokens, "completion": completion_tokens, "total": total_tokens},
+        "cost_usd": cost,
+        "per_correct_triple": {
+            "tokens": _ratio(total_tokens, correct) if total_tokens else None,
+            "seconds": _ratio(total_latency, correct) if latencies else None,
+            "cost_usd": _ratio(cost, correct) if total_tokens else None,
+        },
+        "predicates": predicates,
+    }
+
+def _format(value, digits=4):
+    if value is None:
+        return "-"
+    if isinstance(value, float):
+        return f"{value:.{digits}f}"
+    return str(value)
+
+def print_report(reports):
+    """
+    Prints the configuration summary and the per-predicate table for every report.
+    """
+    header = f"{'Configuration':40} {'Correct':>8} {'FP':>6} {'Tokens/TP':>10} {'Sec/TP':>8} {'USD/TP':>10} {'p50 s':>7} {'p95 s':>7}"
+    print(header)
+    print('-' * len(header))
+    for report in reports:
+        per_tp = report["per_correct_triple"]
+        print(f"{os.path.basename(report['output_file'])[:40]:40} {report['correct_triples']:>8} {report['false_positives']:>6} "
+              f"{_format(per_tp['tokens'], 1):>10} {_format(per_tp['seconds'], 3):>8} {_format(per_tp['cost_usd'], 6):>10} "
+              f"{_format(report['latency']['p50'], 2):>7} {_format(report['latency']['p95'], 2):>7}")
+    print()
+
+    for report in reports:
+        print(os.path.basename(report['output_file']) + ":")
+        print(f"  {'Predicate':36} {'TP':>6} {'FP':>6} {'FN':>6} {'Precision':>10} {'Recall':>8}")
+        # Predicates driving the most false positives first
+        for predicate, stats in sorted(report["predicates"].items(), key=lambda item: -item[1]["fp"]):
+            print(f"  {predicate:36} {stats['tp']:>6} {stats['fp']:>6} {stats['fn']:>6} {_format(stats['precision']):>10} {_format(stats['recall']):>8}")
+        print()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Build a per-predicate quality and latency/cost report for extraction runs.')
+    parser.add_argument('ground_truth', type=str, help='Ground truth JSONL file')
+    parser.add_argument('outputs', type=str, nargs='+', help='Extraction output JSONL files, one per configuration')
+    parser.add_argument('--report', type=str, default='evaluation_report.json', help='JSON file to write the report to (default: evaluation_report.json)')
+
+    args = parser.parse_args(argv)
+
+    reports = [build_report(output_file, args.ground_truth) for output_file in args.outputs]
+    print_report(reports)
+    with open(args.report, 'w') as file:
+        json.dump(reports, file, indent=4)
+
+if __name__ == '__main__':
+    main()
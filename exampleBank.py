@@ -0,0 +1,310 @@
+import re
+import json
+import time
+import argparse
+import numpy as np
+from tqdm import tqdm
+from predicates import PREDICATES, PREDICATE_DEFINITIONS, canonical_predicate
+from jsonlIO import iter_jsonl
+
+WORD_PATTERN = re.compile(r'\w+')
+# Bound on queries x examples scored at once: a score matrix that stays in cache is
+# faster to accumulate into, so large banks are queried a few passages at a time
+MAX_SCORES_PER_BATCH = 64 * 1024
+
+# The hand-written examples of API_testing_w_examples.py
+EXAMPLES = [
+    {"input": "However, vitamin D receptor (VDR) signalling is also plausible. A recent article reported that VDR signalling led to downregulation of one of the master transcription factors for cell division, FOXM1",
+     "output": [["Vitamin D", "Biological processes", "downregulation of FOXM1"]]},
+    {"input": "Funding from the BSF enabled us to report evidence that higher vitamin A levels in the blood appeared to reduce the protective effect of vitamin D",
+     "output": [["vitamin A", "Biological locations", "blood"], ["vitamin D", "Biological locations", "blood"], ["vitamin A", "adverse biological role", "antagonize vitamin D"]]},
+    {"input": "in addition to standard immunosuppression with tacrolimus and mycophenolate.",
+     "output": [["tacrolimus", "Industrial application", "immunosuppressant"], ["tacrolimus", "Normal biological roles", "immunosuppression"], ["mycophenolate", "Industrial application", "immunosuppressant"], ["mycophenolate", "Normal biological roles", "immunosuppression"]]},
+    {"input": "Title: In House Validated UHPLC Protocol for the Determination of the Total Hydroxytyrosol and Tyrosol Content in Virgin Olive Oil and there antioxidant activity.",
+     "output": [["Tyrosol", "sources", "extra virgin olive oil"], ["Hydroxytyrosol", "sources", "extra virgin olive oil"], ["Tyrosol", "Routes of exposure", "ingestion"], ["Hydroxytyrosol", "Routes of exposure", "ingestion"], ["Tyrosol", "normal biological role", "antioxidant"], ["hydroxytyrosol", "normal biological role", "antioxidant"]]},
+    {"input": "We quantified Tau protein, a marker of neuronal death, in cerebrospinal fluid",
+     "output": []},
+    {"input": "chemical Vanillin is known for giving off a distinct vanilla aroma.",
+     "output": [["Vanillin", "Organoleptic effects", "vanilla aroma"]]},
+    {"input": "protective role for vitamin D in melanoma relapse and that higher vitamin D was associated with thinner primary melanomas",
+     "output": [["Vitamin D", "high concentration health effect", "thinner primary melanomas"], ["vitamin D", "normal biological role", "portecting against melanoma"]]},
+    {"input": "benzene are harmful to your health, posing serious risks to both the environment and human well-being.",
+     "output": [["benzene", "exposure health effect", "harmful"], ["benzene", "Environmental roles", "pollutant"]]},
+    {"input": "nitrogen fixation is the process where nitrogen gas (N₂) from the atmosphere is converted into ammonia (NH₃)",
+     "output": [["ammonia", "Environmental processes", "nitrogen fixation"], ["nitrogen", "Environmental processes", "nitrogen fixation"]]},
+    {"input": "The Haber-Bosch process synthesizes ammonia from nitrogen",
+     "output": [["ammonia", "Industrial processes", "Haber-Bosch process"], ["nitrogen", "Industrial processes", "Haber-Bosch process"]]},
+    {"input": "Low concentrations of the hormone cortisol can cause symptoms of Addison's disease, such as fatigue and muscle weakness, while having no cortisol at all can lead to an adrenal crisis, which is potentially life-threatening.",
+     "output": [["cortisol", "Low concentration Health effect", "Addison's disease"], ["cortisol", "No concentration Health effect", "adrenal crisis"]]},
+]
+
+# The prompt of API_testing_w_examples.py with the predicate list and examples left to the bank
+DEFAULT_TEMPLATE = """You are a top-tier algorithm designed for extracting information in structured formats to build a knowledge graph.
+extract semantic triples using the following predicates (the definition for each predicate has been defined in the corresponding parentheses):
+
+{predicates}
+
+follow the following rules:
+1. Only include triples where the subject is a chemical/metabolite.
+
+2. Try to Keep a short Object for the triple, the triplet is a fact.
+
+3. It is ok to output nothing.
+
+4. Output the triples in the format [["subject", "predicate", "object"],["subject", "predicate", "object"]]
+
+5. in the triple Only use full names for the subject, predicate and object.
+
+6.Coreference Resolution
+    - **Maintain Entity Consistency**: When extracting entities, it's vital to ensure consistency.
+    If an entity, such as "Tyrosine", is mentioned multiple times in the text but is referred to by different names or pronouns (e.g., "Tyr"),
+    always use the most complete identifier for that entity throughout the knowledge graph. In this example, use "Tyrosine" as the entity ID.
+    Remember, the knowledge graph should be coherent and easily understandable, so maintaining consistency in entity references is crucial.
+
+7. do not include triples with the word "and" in it, rather split the triplet into 2 triplets.
+
+General Guidelines:
+Subject: Chemical the sentence is about.
+Predicate: Identify what action or state the subject is associated with from the list of predicates above.
+Object: Identify what is receiving the action or associated with the state.
+
+only extract triples from the text provided
+
+output triples in a format of a list of 3 string to make it a string please put the items in the list in a quote
+
+Tip: Make sure to answer in the correct format
+
+{examples}
+
+Here is the article:
+
+"""
+
+def tokenize(text):
+    return WORD_PATTERN.findall(text.lower())
+
+def format_predicates(predicates):
+    return "\n".join(f"{number}) {predicate} ({PREDICATE_DEFINITIONS[predicate]})" for number, predicate in enumerate(predicates, 1))
+
+def format_examples(examples):
+    return "\n".join(f"Example:\ninput: {example['input']}\noutput: {json.dumps(example['output'], ensure_ascii=False)}\nEND OF EXAMPLE"
+                     for example in examples)
+
+def render_prompt(template, predicates, examples):
+    """
+    Fills the {predicates} and {examples} placeholders of a prompt template.
+    """
+    if '{predicates}' not in template or '{examples}' not in template:
+        raise ValueError("A prompt used with an example bank needs {predicates} and {examples} placeholders")
+    return template.replace('{predicates}', format_predicates(predicates)).replace('{examples}', format_examples(examples))
+
+class ExampleBank:
+    """
+    TF-IDF index over few-shot examples. For each passage it picks the `shots` most
+    similar examples, and the predicates used by its `neighbours` most similar examples
+    (weighted by similarity, keeping those with at least `min_share` of the votes), so a
+    prompt only defines the predicates likely to apply. The index is an inverted file of
+    numpy arrays; a batch of passages is scored against all examples with one bincount,
+    using the max_query_terms highest-weighted terms of each passage.
+
+    Examples that share no term with a passage are never picked for their (zero)
+    similarity: the shots they would fill go to the `fallback` examples, by default the
+    first `shots` of the bank, like the fixed examples of a static prompt. A passage
+    with nothing in common with the bank gets only those and the full predicate list.
+    """
+    def __init__(self, examples, shots=3, neighbours=20, min_share=0.05, max_query_terms=64, fallback=None):
+        self.examples = list(examples)
+        self.shots = shots
+        self.fallback = list(fallback) if fallback is not None else list(range(min(shots, len(self.examples))))
+        self.neighbours = neighbours
+        self.min_share = min_share
+        self.max_query_terms = max_query_terms
+        self.vocabulary = {}
+
+        # Term counts per example
+        term_ids = []
+        doc_ids = []
+        counts = []
+        for doc, example in enumerate(self.examples):
+            tokens = [self.vocabulary.setdefault(token, len(self.vocabulary)) for token in tokenize(example['input'])]
+            terms, term_counts = np.unique(np.array(tokens, dtype=np.int64), return_counts=True)
+            term_ids.append(terms)
+            doc_ids.append(np.full(len(terms), doc))
+            counts.append(term_counts)
+        term_ids = np.concatenate(term_ids) if term_ids else np.zeros(0, dtype=np.int64)
+        doc_ids = np.concatenate(doc_ids) if doc_ids else np.zeros(0, dtype=np.int64)
+        counts = np.concatenate(counts) if counts else np.zeros(0)
+
+        # Smoothed IDF and log-scaled TF, L2-normalised per example
+        num_docs = len(self.examples)
+        document_frequency = np.bincount(term_ids, minlength=len(self.vocabulary))
+        self.idf = np.log((1 + num_docs) / (1 + document_frequency)) + 1
+        weights = (1 + np.log(counts)) * self.idf[term_ids]
+        norms = np.sqrt(np.bincount(doc_ids, weights=weights ** 2, minlength=num_docs))
+        weights = weights / np.maximum(norms[doc_ids], 1e-12)
+
+        # Postings sorted by term: examples containing term t are doc_ids[pointers[t]:pointers[t + 1]]
+        order = np.argsort(term_ids, kind='stable')
+        self.doc_ids = doc_ids[order]
+        self.weights = weights[order].astype(np.float32)
+        self.pointers = np.concatenate([[0], np.cumsum(document_frequency)])
+
+        # Canonical predicates used by each example
+        self.example_predicates = np.zeros((num_docs, len(PREDICATES)), dtype=bool)
+        for doc, example in enumerate(self.examples):
+            for triple in example['output']:
+                predicate = canonical_predicate(triple[1])
+                if predicate is not None:
+                    self.example_predicates[doc, PREDICATES.index(predicate)] = True
+
+    @classmethod
+    def from_jsonl(cls, file_path, **kwargs):
+        """
+        Builds a bank from a JSONL file of {"input", "output"} records, e.g. a training split.
+        """
+        return cls(iter_jsonl(file_path), **kwargs)
+
+    def similarities(self, texts):
+        """
+        Cosine similarity of every text to every example, as a (texts, examples) matrix.
+        """
+        num_docs = len(self.examples)
+        query_ids = []
+        term_ids = []
+        query_weights = []
+        for query, text in enumerate(texts):
+            known = [self.vocabulary[token] for token in tokenize(text) if token in self.vocabulary]
+            terms, counts = np.unique(np.array(known, dtype=np.int64), return_counts=True)
+            weights = (1 + np.log(counts)) * self.idf[terms]
+            norm = np.sqrt(np.sum(weights ** 2))
+            if len(terms) > self.max_query_terms:
+                # Only the most distinctive terms are scored; common terms have long postings
+                # lists but barely change the ranking
+                keep = np.argpartition(-weights, self.max_query_terms - 1)[:self.max_query_terms]
+                terms, weights = terms[keep], weights[keep]
+            query_ids.append(np.full(len(terms), query))
+            term_ids.append(terms)
+            query_weights.append(weights / norm if norm > 0 else weights)
+        if not texts:
+            return np.zeros((0, num_docs), dtype=np.float32)
+        query_ids = np.concatenate(query_ids)
+        term_ids = np.concatenate(term_ids)
+        query_weights = np.concatenate(query_weights)
+
+        # Expand every (query, term) pair into the postings of the term
+        starts = self.pointers[term_ids]
+        lengths = self.pointers[term_ids + 1] - starts
+        pair = np.repeat(np.arange(len(term_ids)), lengths)
+        positions = starts[pair] + np.arange(len(pair)) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+        scores = np.bincount(query_ids[pair] * num_docs + self.doc_ids[positions],
+                             weights=self.weights[positions] * query_weights[pair], minlength=len(texts) * num_docs)
+        return scores.reshape(len(texts), num_docs)
+
+    def select(self, texts):
+        """
+        Returns (example indices, predicates) for every text, most similar examples first.
+        """
+        selections = []
+        batch_size = max(1, MAX_SCORES_PER_BATCH // max(1, len(self.examples)))
+        for batch_start in range(0, len(texts), batch_size):
+            scores = self.similarities(texts[batch_start:batch_start + batch_size])
+            shots = min(self.shots, scores.shape[1])
+            neighbours = min(max(self.neighbours, shots), scores.shape[1])
+            if neighbours == 0:
+                selections.extend(([], list(PREDICATES)) for _ in range(len(scores)))
+                continue
+            # Top neighbours per row, best first
+            top = np.argpartition(-scores, neighbours - 1, axis=1)[:, :neighbours]
+            top_scores = np.take_along_axis(scores, top, axis=1)
+            order = np.argsort(-top_scores, axis=1, kind='stable')
+            top = np.take_along_axis(top, order, axis=1)
+            top_scores = np.take_along_axis(top_scores, order, axis=1)
+            # Similarity-weighted predicate votes of the neighbours
+            votes = np.einsum('qn,qnp->qp', top_scores, self.example_predicates[top])
+            totals = votes.sum(axis=1, keepdims=True)
+            chosen = (votes >= self.min_share * totals) & (votes > 0)
+            for row in range(len(scores)):
+                similar = top[row, :shots][top_scores[row, :shots] > 0].tolist()
+                indices = similar + [index for index in self.fallback if index not in similar][:shots - len(similar)]
+                if totals[row, 0] == 0:
+                    # Nothing similar in the bank: keep the full predicate list
+                    predicates = list(PREDICATES)
+                else:
+                    # Predicates the chosen examples use must be defined in the prompt
+                    keep = chosen[row] | self.example_predicates[indices].any(axis=0)
+                    predicates = [predicate for predicate, used in zip(PREDICATES, keep) if used]
+                selections.append((indices, predicates))
+        return selections
+
+    def prompts(self, template, texts):
+        """
+        Builds the prompt for every text from a template with {predicates} and {examples} placeholders.
+        """
+        return [render_prompt(template, predicates, [self.examples[index] for index in indices])
+                for indices, predicates in self.select(texts)]
+
+    def prompt(self, template, text):
+        return self.prompts(template, [text])[0]
+
+def load_example_bank(source, shots=3):
+    """
+    The built-in examples for 'builtin', otherwise the examples of a JSONL file.
+    """
+    if source == 'builtin':
+        return ExampleBank(EXAMPLES, shots)
+    return ExampleBank.from_jsonl(source, shots=shots)
+
+def compare(bank, template, passages, model, batch_size=256):
+    """
+    Mean prompt tokens with every example and predicate against the bank's selection,
+    and the bank's query throughput in batches of batch_size.
+    """
+    from tokenBudget import count_tokens
+    static_tokens = count_tokens(render_prompt(template, PREDICATES, bank.examples), model)
+    dynamic_tokens = 0
+    start = time.perf_counter()
+    prompts = []
+    for batch_start in tqdm(range(0, len(passages), batch_size), desc="Selecting examples", unit=" batches"):
+        prompts.extend(bank.prompts(template, passages[batch_start:batch_start + batch_size]))
+    seconds = time.perf_counter() - start
+    for prompt in prompts:
+        dynamic_tokens += count_tokens(prompt, model)
+    return {
+        "passages": len(passages),
+        "static_prompt_tokens": static_tokens,
+        "mean_dynamic_prompt_tokens": dynamic_tokens / len(passages) if passages else None,
+        "queries_per_second": len(passages) / seconds if seconds > 0 else None,
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Select few-shot examples and predicate definitions per passage from an example bank.')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    subparsers.add_parser('template', help='Print the default prompt template with {predicates} and {examples} placeholders')
+
+    compare_parser = subparsers.add_parser('compare', help='Compare prompt tokens with all examples against the selected ones')
+    compare_parser.add_argument('dataset', type=str, help='Input JSONL dataset with an "input" field per line')
+    compare_parser.add_argument('--example_bank', type=str, default='builtin', help="JSONL file of examples, or 'builtin' (default)")
+    compare_parser.add_argument('--shots', type=int, default=3, help='Examples per prompt (default: 3)')
+    compare_parser.add_argument('--prompt_file', type=str, default=None, help='Prompt template (default: the built-in template)')
+    compare_parser.add_argument('--model', type=str, default='gpt-4o', help='Model whose tokenizer counts the prompts (default: gpt-4o)')
+
+    args = parser.parse_args(argv)
+
+    if args.command == 'template':
+        print(DEFAULT_TEMPLATE)
+        return
+    template = DEFAULT_TEMPLATE
+    if args.prompt_file:
+        with open(args.prompt_file, 'r', encoding='utf-8') as file:
+            template = file.read()
+    start = time.perf_counter()
+    bank = load_example_bank(args.example_bank, args.shots)
+    print(f"Indexed {len(bank.examples)} examples in {time.perf_counter() - start:.3f}s")
+    result = compare(bank, template, [data['input'] for data in iter_jsonl(args.dataset)], args.model)
+    saved = 1 - result['mean_dynamic_prompt_tokens'] / result['static_prompt_tokens'] if result['passages'] else 0
+    print(f"Prompt tokens: {result['static_prompt_tokens']} with every example -> {result['mean_dynamic_prompt_tokens']:.0f} on average "
+          f"({saved:.1%} saved), {result['queries_per_second']:.0f} passages/s selected")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,500 @@
+# Import libraries
+import os
+import re
+import sys
+import json
+import time
+import argparse
+import threading
+from tqdm import tqdm
+import metrics
+from predicates import canonical_predicate, TRIPLE_SCHEMA
+import tokenBudget
+from tokenBudget import SpendCapExceeded
+from textNormalize import normalize_record
+from jsonlIO import iter_jsonl, JsonlIndex, JsonlWriter, loads
+
+TRIPLE_PATTERN = r'\["([^"]+)",\s*"([^"]+)",\s*"([^"]+)"\]'
+CONFIDENCE_PATTERN = r'confidence\W{0,3}\s*(\d*\.?\d+)'
+CONFIDENCE_INSTRUCTION = "\nAfter the triples, write 'Confidence: ' followed by a number from 0 to 1 for how sure you are that the list is complete and correct.\n"
+STRUCTURED_INSTRUCTION = '\nAnswer only with JSON of the form {"triples": [["subject", "predicate", "object"], ...]}, with an empty list if there are none.\n'
+STRUCTURED_MODES = ['json_schema', 'guided_json']
+
+# USD per 1M (prompt, completion) tokens; models missing here are costed at 0
+MODEL_PRICES = {
+    "gpt-4o": (2.50, 10.00),
+    "gpt-4o-mini": (0.15, 0.60),
+    "llama-3.1-70b-versatile": (0.59, 0.79),
+    "llama-3.1-8b-instant": (0.05, 0.08),
+}
+
+def create_client(provider, api_key=None, base_url=None):
+    """
+    Creates a chat completion client. The SDK is only imported for the provider in use.
+    """
+    if provider == "openai":
+        from openai import OpenAI
+        return OpenAI(api_key=api_key or os.environ.get("OPENAI_API_KEY"), base_url=base_url)
+    if provider == "groq":
+        from groq import Groq
+        return Groq(api_key=api_key or os.environ.get("GROQ_API_KEY"), base_url=base_url)
+    raise ValueError(f"Unknown provider: {provider}")
+
+def timed_completion(client, model, text, **kwargs):
+    """
+    Sends a single user message and returns the completion text together with the
+    request latency in seconds and the token usage reported by the provider.
+    """
+    start = time.perf_counter()
+    try:
+        response = client.chat.completions.create(
+            model=model,
+            messages=[
+                {
+                    "role": "user",
+                    "content": text
+                },
+            ],
+            **kwargs
+        )
+    except Exception:
+        metrics.inc('llm_errors')
+        raise
+    latency = time.perf_counter() - start
+    metrics.observe('llm_request', latency)
+
+    usage = getattr(response, "usage", None)
+    stats = {
+        "latency": latency,
+        "prompt_tokens": getattr(usage, "prompt_tokens", 0) or 0,
+        "completion_tokens": getattr(usage, "completion_tokens", 0) or 0,
+    }
+    metrics.inc('prompt_tokens', stats["prompt_tokens"])
+    metrics.inc('completion_tokens', stats["completion_tokens"])
+    return (response.choices[0].message.content or "").strip(), stats
+
+def merge_stats(*all_stats):
+    """
+    Sums the latency and token usage of several requests made for one record.
+    """
+    merged = {"latency": 0.0, "prompt_tokens": 0, "completion_tokens": 0}
+    for stats in all_stats:
+        for key in merged:
+            merged[key] += stats[key]
+    return merged
+
+def request_cost(model, prompt_tokens, completion_tokens):
+    """
+    Estimates the USD cost of a request from its token usage.
+    """
+    prompt_price, completion_price = MODEL_PRICES.get(model, (0.0, 0.0))
+    return (prompt_tokens * prompt_price + completion_tokens * completion_price) / 1e6
+
+@metrics.timed('parse')
+def parse_triples(generated_output):
+    """
+    Extracts ["subject", "predicate", "object"] triples from free-text model output.
+    """
+    extracted_list = re.findall(TRIPLE_PATTERN, generated_output, re.MULTILINE)
+    return [triple for triple in extracted_list if 'NA' not in triple]
+
+def structured_output_kwargs(mode):
+    """
+    Request arguments that constrain the completion to TRIPLE_SCHEMA. 'json_schema' uses
+    the response_format field of OpenAI-compatible servers (vLLM, llama.cpp, Ollama);
+    'guided_json' is the vLLM extension for servers that predate it.
+    """
+    if mode == 'json_schema':
+        return {"response_format": {"type": "json_schema", "json_schema": {"name": "triples", "schema": TRIPLE_SCHEMA, "strict": True}}}
+    if mode == 'guided_json':
+        return {"extra_body": {"guided_json": TRIPLE_SCHEMA}}
+    raise ValueError(f"Unknown structured output mode: {mode}")
+
+@metrics.timed('parse')
+def parse_structured(generated_output):
+    """
+    Reads the triples of a schema-constrained answer, or returns None if the output is
+    not of the schema's shape, e.g. because the server ignored the constraint.
+    """
+    try:
+        triples = json.loads(generated_output)["triples"]
+    except (ValueError, KeyError, TypeError):
+        return None
+    if not isinstance(triples, list) or not all(isinstance(triple, list) and len(triple) == 3
+                                                and all(isinstance(part, str) for part in triple) for triple in triples):
+        return None
+    return [tuple(triple) for triple in triples if 'NA' not in triple]
+
+class ExtractionRunner:
+    """
+    Runs a single-prompt triple extraction over a dataset and records per-request
+    latency and token usage next to every output record.
+    """
+    def __init__(self, model, test_dataset, output_path, prompt, client, budget=None, spend_cap=None, structured=None, example_bank=None):
+        self.model = model
+        self.client = client
+        self.test_dataset = test_dataset
+        self.output = output_path
+        self.prompt = prompt + STRUCTURED_INSTRUCTION if structured else prompt
+        self.budget = budget
+        self.spend_cap = spend_cap
+        self.spent = 0.0
+        # extract() may be called from several threads (see pipeline.py)
+        self.spend_lock = threading.Lock()
+        # Structured output mode (one of STRUCTURED_MODES), or None for free text
+        self.structured = structured
+        self.request_kwargs = structured_output_kwargs(structured) if structured else {}
+        # With an ExampleBank, the prompt is a template whose examples and predicates are chosen per passage
+        self.example_bank = example_bank
+
+    def prompts_for(self, passages):
+        if self.example_bank is None:
+            return [self.prompt] * len(passages)
+        return self.example_bank.prompts(self.prompt, passages)
+
+    def _with_prompts(self, dataset, batch_size=256):
+        """
+        Pairs every record with its prompt, selecting few-shot examples for a batch of passages at a time.
+        """
+        batch = []
+        for data in dataset:
+            batch.append(data)
+            if len(batch) == batch_size:
+                yield from zip(batch, self.prompts_for([data['input'] for data in batch]))
+                batch = []
+        yield from zip(batch, self.prompts_for([data['input'] for data in batch]))
+
+    def charge(self, model, stats):
+        """
+        Adds the cost of a request to the run's spend.
+        """
+        cost = request_cost(model, stats['prompt_tokens'], stats['completion_tokens'])
+        with self.spend_lock:
+            self.spent += cost
+
+    def check_spend(self):
+        """
+        Stops the run before the next passage once the spend cap is reached; the passage
+        that crossed the cap has already been paid for, so its record is still written.
+        """
+        if self.spend_cap is not None and self.spent >= self.spend_cap:
+            raise SpendCapExceeded(f"Spent ${self.spent:.2f}, reaching the spend cap of ${self.spend_cap:.2f}")
+
+    def extract(self, abstract, prompt=None):
+        """
+        Extracts triples from one passage and returns the output record. With a token
+        budget, a passage too long for one request is split (or truncated) first.
+        """
+        self.check_spend()
+        if prompt is None:
+            prompt = self.prompts_for([abstract])[0]
+        pieces = self.budget.fit(prompt, abstract) if self.budget is not None else [abstract]
+        outputs = []
+        output = []
+        all_stats = []
+        valid = True
+        for piece in pieces:
+            generated_output, stats = timed_completion(self.client, self.model, prompt + piece, **self.request_kwargs)
+            self.charge(self.model, stats)
+            outputs.append(generated_output)
+            triples = parse_structured(generated_output) if self.structured else None
+            if triples is None:
+                # Free text, or a server that did not honour the schema
+                valid = valid and not self.structured
+                triples = parse_triples(generated_output)
+            output += [triple for triple in triples if triple not in output]
+            all_stats.append(stats)
+        stats = merge_stats(*all_stats)
+        record = {'input': abstract, 'output': output, 'output_complete': '\n'.join(outputs), 'valid': valid,
+                  'model': self.model, 'latency': stats['latency'],
+                  'usage': {'prompt_tokens': stats['prompt_tokens'], 'completion_tokens': stats['completion_tokens']}}
+        if self.structured:
+            record['structured'] = self.structured
+        if len(pieces) > 1:
+            record['pieces'] = len(pieces)
+        return record
+
+    def run(self, dedup=None, compact=None):
+        """
+        Extracts every passage in the dataset. With a PassageDeduplicator, only one
+        representative per near-duplicate cluster is sent to the model and its triples
+        are copied to the other members, which are marked with 'duplicate_of'. With a
+        CompactOutput, records reference their passage instead of repeating it.
+        """
+        # Byte offsets of the passages in the dataset file, when read through a JsonlIndex
+        dataset_offset = getattr(self.test_dataset, 'offset', None)
+        total = len(self.test_dataset) if hasattr(self.test_dataset, '__len__') else None
+        with JsonlWriter(self.output) as outfile, open(self.output, 'rb') as reader:
+            for index, (data, prompt) in enumerate(tqdm(self._with_prompts(self.test_dataset), total=total)):
+                representative = None
+                if dedup is not None:
+                    keys, representative = dedup.find(data['input'])
+                if representative is None:
+                    offset = outfile.tell()
+                    record = self.extract(data['input'], prompt)
+                    if dedup is not None:
+                        dedup.add(keys, index, offset)
+                else:
+                    # Read the representative's record back from the output written so far
+                    outfile.flush()
+                    reader.seek(representative[1])
+                    record = dict(loads(reader.readline()), input=data['input'], duplicate_of=representative[0],
+                                  latency=0.0, usage={'prompt_tokens': 0, 'completion_tokens': 0})
+                    # The small model's attempt was paid for by the representative only
+                    record.pop('cascade', None)
+                if compact is not None:
+                    record = compact.compact(record, index, dataset_offset(index) if dataset_offset is not None else None)
+                outfile.write(record)
+        if dedup is not None:
+            print(f"{dedup.duplicates} of {dedup.seen} passages were near duplicates: {dedup.saved_fraction():.1%} of LLM calls saved")
+
+def validate_output(generated_output, triples, passage, min_confidence=None):
+    """
+    Returns the reasons an extraction should not be trusted: no triple list in the
+    output, a predicate outside the 15 canonical ones, a subject that does not occur
+    in the passage, or a self-reported confidence below min_confidence.
+    """
+    reasons = []
+    if not re.search(TRIPLE_PATTERN, generated_output):
+        reasons.append('unparseable')
+    if any(canonical_predicate(triple[1]) is None for triple in triples):
+        reasons.append('off_list_predicate')
+    passage_key = ' '.join(passage.lower().split())
+    if any(' '.join(triple[0].lower().split()) not in passage_key for triple in triples):
+        reasons.append('subject_not_in_text')
+    if min_confidence is not None:
+        match = re.search(CONFIDENCE_PATTERN, generated_output, re.IGNORECASE)
+        if match is None or float(match.group(1)) < min_confidence:
+            reasons.append('low_confidence')
+    return reasons
+
+class CascadeRunner(ExtractionRunner):
+    """
+    Sends every passage to a small model first and escalates to the large model only
+    when the small model's output fails validate_output. Records keep the final model's
+    usage; the small model's attempt is kept under 'cascade'.
+    """
+    def __init__(self, small_model, large_model, test_dataset, output_path, prompt, small_client, large_client, min_confidence=None,
+                 budget=None, spend_cap=None, structured=None, example_bank=None):
+        super().__init__(large_model, test_dataset, output_path, prompt, large_client, budget, spend_cap, structured, example_bank)
+        self.small_model = small_model
+        self.small_client = small_client
+        self.min_confidence = min_confidence
+        self.small_prompt = prompt + CONFIDENCE_INSTRUCTION if min_confidence is not None else prompt
+        # The small model's context window is usually the smaller one
+        self.small_budget = budget.for_model(small_model) if budget is not None else None
+        self.totals = {"passages": 0, "escalated": 0, "small_latency": 0.0, "large_latency": 0.0,
+                       "small_cost": 0.0, "large_cost": 0.0, "large_only_cost_estimate": 0.0}
+        self.reasons = {}
+        # Shared by the extract() calls of several threads, like spent
+        self.totals_lock = threading.Lock()
+
+    def _add_totals(self, reasons=(), **amounts):
+        with self.totals_lock:
+            for key, amount in amounts.items():
+                self.totals[key] += amount
+            for reason in reasons:
+                self.reasons[reason] = self.reasons.get(reason, 0) + 1
+
+    def extract(self, abstract, prompt=None):
+        self.check_spend()
+        small_prompt = self.small_prompt
+        if self.example_bank is not None:
+            # Both models see the examples chosen for this passage
+            prompt = prompt if prompt is not None else self.prompts_for([abstract])[0]
+            small_prompt = prompt + CONFIDENCE_INSTRUCTION if self.min_confidence is not None else prompt
+        try:
+            pieces = self.small_budget.fit(small_prompt, abstract) if self.small_budget is not None else [abstract]
+            outputs = []
+            all_stats = []
+            triples = []
+            for piece in pieces:
+                piece_output, piece_stats = timed_completion(self.small_client, self.small_model, small_prompt + piece)
+                self.charge(self.small_model, piece_stats)
+                outputs.append(piece_output)
+                all_stats.append(piece_stats)
+                triples += [triple for triple in parse_triples(piece_output) if triple not in triples]
+            small_output, small_stats = '\n'.join(outputs), merge_stats(*all_stats)
+            reasons = validate_output(small_output, triples, abstract, self.min_confidence)
+        except SpendCapExceeded:
+            raise
+        except Exception:
+            small_output, small_stats, triples, reasons = "", merge_stats(), [], ['error']
+        small_cost = request_cost(self.small_model, small_stats['prompt_tokens'], small_stats['completion_tokens'])
+        self._add_totals(passages=1, small_latency=small_stats['latency'], small_cost=small_cost)
+        cascade = {'small_model': self.small_model, 'escalated': bool(reasons), 'reasons': reasons,
+                   'small_latency': small_stats['latency'],
+                   'small_usage': {'prompt_tokens': small_stats['prompt_tokens'], 'completion_tokens': small_stats['completion_tokens']}}
+
+        if not reasons:
+            # What the large model would have cost for the same tokens
+            self._add_totals(large_only_cost_estimate=request_cost(self.model, small_stats['prompt_tokens'], small_stats['completion_tokens']))
+            return {'input': abstract, 'output': triples, 'output_complete': small_output, 'valid': True,
+                    'model': self.small_model, 'latency': small_stats['latency'], 'usage': cascade['small_usage'], 'cascade': cascade}
+
+        self._add_totals(reasons, escalated=1)
+        record = super().extract(abstract, prompt)
+        large_cost = request_cost(self.model, record['usage']['prompt_tokens'], record['usage']['completion_tokens'])
+        self._add_totals(large_latency=record['latency'], large_cost=large_cost, large_only_cost_estimate=large_cost)
+        record['latency'] += small_stats['latency']
+        record['cascade'] = cascade
+        return record
+
+    def summary(self):
+        """
+        Escalation rate and cost/latency against sending every passage to the large model.
+        Large-only figures for passages that were not escalated are estimates: their
+        tokens at large-model prices, and the mean large-model latency seen on escalations.
+        """
+        totals = self.totals
+        passages = totals["passages"]
+        escalated = totals["escalated"]
+        mean_large_latency = totals["large_latency"] / escalated if escalated else None
+        cascade_cost = totals["small_cost"] + totals["large_cost"]
+        cascade_latency = totals["small_latency"] + totals["large_latency"]
+        large_only_latency = mean_large_latency * passages if mean_large_latency is not None else None
+        return {
+            "passages": passages,
+            "escalated": escalated,
+            "escalation_rate": escalated / passages if passages else None,
+            "reasons": dict(self.reasons),
+            "cascade_cost_usd": cascade_cost,
+            "large_only_cost_usd_estimate": totals["large_only_cost_estimate"],
+            "cost_saved_usd": totals["large_only_cost_estimate"] - cascade_cost,
+            "cascade_latency": cascade_latency,
+            "large_only_latency_estimate": large_only_latency,
+            "latency_saved": large_only_latency - cascade_latency if large_only_latency is not None else None,
+        }
+
+    def run(self, dedup=None, compact=None):
+        super().run(dedup, compact)
+        summary = self.summary()
+        print(f"Escalated {summary['escalated']} of {summary['passages']} passages ({(summary['escalation_rate'] or 0):.1%}): {summary['reasons']}")
+        print(f"Cost: ${summary['cascade_cost_usd']:.4f} vs ~${summary['large_only_cost_usd_estimate']:.4f} large-only, saved ~${summary['cost_saved_usd']:.4f}")
+        if summary['latency_saved'] is not None:
+            print(f"Request time: {summary['cascade_latency']:.1f}s vs ~{summary['large_only_latency_estimate']:.1f}s large-only, saved ~{summary['latency_saved']:.1f}s")
+        return summary
+
+def summarize_output(output_path):
+    """
+    Output format, validity, completion tokens and latency of a finished run, read back
+    from its output file; duplicate records, which made no request, are skipped.
+    """
+    records = 0
+    invalid = 0
+    completion_tokens = 0
+    latency = 0.0
+    structured = set()
+    for record in iter_jsonl(output_path):
+        if 'duplicate_of' in record:
+            continue
+        records += 1
+        invalid += not record.get('valid', True)
+        completion_tokens += record.get('usage', {}).get('completion_tokens', 0)
+        latency += record.get('latency', 0.0)
+        structured.add(record.get('structured', 'free text'))
+    return {
+        "output_file": output_path,
+        "format": ', '.join(sorted(structured)) or '-',
+        "records": records,
+        "invalid": invalid,
+        "mean_completion_tokens": completion_tokens / records if records else None,
+        "mean_latency": latency / records if records else None,
+    }
+
+def print_output_summaries(summaries):
+    print(f"{'Output':30} {'Format':12} {'Records':>8} {'Invalid':>8} {'Out tok/req':>12} {'Latency s':>10}")
+    for summary in summaries:
+        tokens = f"{summary['mean_completion_tokens']:.1f}" if summary['mean_completion_tokens'] is not None else '-'
+        latency = f"{summary['mean_latency']:.3f}" if summary['mean_latency'] is not None else '-'
+        print(f"{os.path.basename(summary['output_file'])[:30]:30} {summary['format']:12} {summary['records']:>8} "
+              f"{summary['invalid']:>8} {tokens:>12} {latency:>10}")
+
+# Load JSONL dataset
+def load_jsonl_dataset(file_path):
+    return [normalize_record(data) for data in iter_jsonl(file_path)]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Extract triples from a JSONL dataset with an LLM.')
+    parser.add_argument('dataset', type=str, help='Input JSONL dataset with an "input" field per line')
+    parser.add_argument('output', type=str, help='Output JSONL path')
+    parser.add_argument('--prompt_file', type=str, required=True, help='Text file holding the prompt; the passage is appended to it')
+    parser.add_argument('--provider', type=str, default='openai', choices=['openai', 'groq'], help='API provider (default: openai)')
+    parser.add_argument('--model', type=str, default='gpt-4o', help='Model name (default: gpt-4o)')
+    parser.add_argument('--base_url', type=str, default=None, help='Base URL of an OpenAI-compatible server')
+    parser.add_argument('--dedup', action='store_true', help='Send one passage per near-duplicate cluster to the model (MinHash/LSH)')
+    parser.add_argument('--cascade_model', type=str, default=None, help='Small model tried first; only failed validations go to --model')
+    parser.add_argument('--cascade_provider', type=str, default=None, choices=['openai', 'groq'], help='Provider of the small model (default: --provider)')
+    parser.add_argument('--cascade_base_url', type=str, default=None, help='Base URL of the small model, e.g. a local server')
+    parser.add_argument('--min_confidence', type=float, default=None, help='Ask the small model for a confidence and escalate below this value')
+    parser.add_argument('--structured_output', type=str, default=None, choices=STRUCTURED_MODES,
+                        help='Constrain answers to a JSON schema with the 15 predicates: response_format json_schema, or vLLM guided_json')
+    parser.add_argument('--start', type=int, default=0, help='First record of the dataset to extract, e.g. to retry the rest of a run (default: 0)')
+    parser.add_argument('--stop', type=int, default=None, help='Record to stop before (default: the end of the dataset)')
+    parser.add_argument('--example_bank', type=str, default=None,
+                        help="Pick few-shot examples and predicate definitions per passage from this JSONL file, or 'builtin'; "
+                             "the prompt needs {predicates} and {examples} placeholders (see exampleBank.py template)")
+    parser.add_argument('--shots', type=int, default=3, help='Few-shot examples per prompt with --example_bank (default: 3)')
+    parser.add_argument('--compact', action='store_true', help='Store passage references instead of passages, and raw completions in a gzip side file')
+    parser.add_argument('--project', action='store_true', help='Print the projected tokens and cost before starting (always done with --spend_cap)')
+    parser.add_argument('--compare_with', type=str, default=None, help='Output JSONL of an earlier run (e.g. free text) to compare tokens and latency with')
+    metrics.add_arguments(parser)
+    tokenBudget.add_arguments(parser)
+
+    args = parser.parse_args(argv)
+
+    metrics.configure_from_args(args)
+    with open(args.prompt_file, 'r', encoding='utf-8') as file:
+        prompt = file.read()
+    # Records are read lazily through an offset index, so --start seeks straight to its record
+    dataset = JsonlIndex(args.dataset, normalize_record, args.start, args.stop)
+
+    budget = tokenBudget.budget_from_args(args)
+    example_bank = None
+    if args.example_bank:
+        from exampleBank import load_example_bank
+        example_bank = load_example_bank(args.example_bank, args.shots)
+    if args.project or args.spend_cap is not None:
+        # Count tokens locally and refuse to start a run projected to cost more than the cap
+        projected_prompt = prompt + STRUCTURED_INSTRUCTION if args.structured_output else prompt
+        prompts_for = (lambda passages: example_bank.prompts(projected_prompt, passages)) if example_bank is not None else None
+        projection = tokenBudget.project_run((data['input'] for data in dataset), projected_prompt, budget, prompts_for=prompts_for)
+        tokenBudget.print_projection(projection)
+        try:
+            tokenBudget.check_spend_cap(projection, args.spend_cap)
+        except SpendCapExceeded as e:
+            print(e)
+            sys.exit(1)
+
+    client = create_client(args.provider, base_url=args.base_url)
+    if args.cascade_model:
+        small_client = create_client(args.cascade_provider or args.provider, base_url=args.cascade_base_url)
+        runner = CascadeRunner(args.cascade_model, args.model, dataset, args.output, prompt,
+                               small_client, client, args.min_confidence, budget, args.spend_cap, args.structured_output, example_bank)
+    else:
+        runner = ExtractionRunner(args.model, dataset, args.output, prompt, client, budget, args.spend_cap, args.structured_output,
+                                  example_bank)
+    dedup = None
+    if args.dedup:
+        from passageDedup import PassageDeduplicator
+        dedup = PassageDeduplicator()
+    compact = None
+    if args.compact:
+        from compactOutput import CompactOutput
+        compact = CompactOutput(args.output, args.dataset, normalized=True)
+    try:
+        runner.run(dedup, compact)
+    except SpendCapExceeded as e:
+        print(f"Stopped: {e}")
+        sys.exit(1)
+    finally:
+        if compact is not None:
+            compact.close()
+    if args.structured_output or args.compare_with:
+        summaries = [summarize_output(args.output)]
+        if args.compare_with:
+            summaries.append(summarize_output(args.compare_with))
+        print_output_summaries(summaries)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+import re
+import sys
+import time
+import argparse
+import importlib
+import subprocess
+
+# Subcommand -> (module, entry point, help). Modules are imported only when their
+# subcommand runs, so `factfinder.py --help` never loads spaCy, pandas or an LLM SDK.
+COMMANDS = {
+    'filter': ('memo', 'run_cli', 'Filter PubMed XML for chemical articles (memo.py)'),
+    'extract': ('extractionRunner', 'main', 'Extract triples from a JSONL dataset with an LLM (extractionRunner.py)'),
+    'evaluate': ('multiBasicEval', 'run_cli', 'Build evaluation sheets and compute metrics (multiBasicEval.py)'),
+    'dedup': ('passageDedup', 'main', 'Find near-duplicate passages with MinHash/LSH (passageDedup.py)'),
+    'examples': ('exampleBank', 'main', 'Few-shot example selection: prompt template and token comparison (exampleBank.py)'),
+    'compact': ('compactOutput', 'main', 'Convert extraction output between the full and the compact format (compactOutput.py)'),
+    'jsonl': ('jsonlIO', 'main', 'Index JSONL files for random access and read single records (jsonlIO.py)'),
+    'normalize': ('textNormalize', 'main', 'Repair mojibake and normalise text fields of a JSONL dataset (textNormalize.py)'),
+    'budget': ('tokenBudget', 'main', 'Project tokens, cost and duration of an extraction run (tokenBudget.py)'),
+    'report': ('evalReport', 'main', 'Per-predicate quality and latency/cost report (evalReport.py)'),
+    'compare': ('compareRuns', 'main', 'Bootstrap comparison of evaluated runs (compareRuns.py)'),
+    'split': ('splitFiles', 'main', 'Split a directory or write shard manifests (splitFiles.py)'),
+    'store': ('tripleStore', 'main', 'Merge extraction output into the deduplicated triple store and query it (tripleStore.py)'),
+    'metrics': ('metrics', 'main', 'Summarise metrics snapshots and slowest-document profiles of a run (metrics.py)'),
+    'bench': ('benchmark', 'main', 'Offline throughput/latency/memory benchmark on a synthetic corpus (benchmark.py)'),
+    'pipeline': ('pipeline', 'main', 'Filter, prepare, extract and evaluate as one resumable pipeline (pipeline.py)'),
+}
+
+IMPORTTIME_PATTERN = re.compile(r'import time:\s+(\d+)\s+\|\s+(\d+)\s+\|\s+(\S+)')
+
+def measure_import(module):
+    """
+    Imports a module in a fresh interpreter under -X importtime. Returns the wall time
+    of the whole process and the cumulative import time of the module in seconds.
+    """
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'], capture_output=True, text=True)
+    wall = time.perf_counter() - start
+    if result.returncode != 0:
+        return wall, None
+    cumulative = None
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME_PATTERN.match(line)
+        if match and match.group(3) == module:
+            cumulative = int(match.group(2)) / 1e6
+    return wall, cumulative
+
+def bench_imports(argv=None):
+    parser = argparse.ArgumentParser(prog='factfinder.py bench-imports', description='Measure the cold import time of every subcommand module.')
+    parser.add_argument('modules', nargs='*', help='Modules to measure (default: every subcommand module)')
+    args = parser.parse_args(argv)
+
+    modules = args.modules or sorted({module for module, _, _ in COMMANDS.values()})
+    baseline, _ = measure_import('sys')
+    print(f"{'Module':20} {'Import s':>10} {'Process s':>10}")
+    for module in modules:
+        wall, cumulative = measure_import(module)
+        if cumulative is None:
+            print(f"{module:20} {'failed':>10} {wall:>10.3f}")
+        else:
+            print(f"{module:20} {cumulative:>10.3f} {wall:>10.3f}")
+    print(f"Interpreter startup: {baseline:.3f}s")
+
+def print_usage():
+    print("usage: factfinder.py <command> [args...]")
+    print()
+    print("commands:")
+    for name, (_, _, help_text) in COMMANDS.items():
+        print(f"  {name:14} {help_text}")
+    print(f"  {'bench-imports':14} Measure the cold import time of every subcommand module")
+    print()
+    print("Run `factfinder.py <command> --help` for the options of a command.")
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv or argv[0] in ('-h', '--help'):
+        print_usage()
+        return
+    command, command_args = argv[0], argv[1:]
+    if command == 'bench-imports':
+        bench_imports(command_args)
+        return
+    if command not in COMMANDS:
+        print(f"Unknown command: {command}")
+        print_usage()
+        sys.exit(2)
+    module_name, function_name, _ = COMMANDS[command]
+    entry_point = getattr(importlib.import_module(module_name), function_name)
+    entry_point(command_args)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,220 @@
+import os
+import json
+import argparse
+
+# Decode and encode with the fastest library installed; every backend reads and writes bytes
+try:
+    import orjson
+    BACKEND = 'orjson'
+    loads = orjson.loads
+    dumps = orjson.dumps
+except ImportError:
+    try:
+        import msgspec
+        BACKEND = 'msgspec'
+        loads = msgspec.json.Decoder().decode
+        dumps = msgspec.json.Encoder().encode
+    except ImportError:
+        BACKEND = 'json'
+        loads = json.loads
+
+        def dumps(record):
+            return json.dumps(record).encode('utf-8')
+
+INDEX_SUFFIX = '.idx'
+# Records per disk write for offline transforms, where a crash only means running again
+OFFLINE_BATCH_SIZE = 1000
+SCAN_CHUNK = 64 * 1024 * 1024
+# What bytes.strip() removes, so build_offsets skips the same lines as iter_jsonl
+WHITESPACE = b' \t\n\r\x0b\x0c'
+
+def iter_jsonl(file_path, start_offset=0):
+    """
+    Lazily yields the records of a JSONL file from a byte offset on, skipping blank lines.
+    """
+    with open(file_path, 'rb') as file:
+        file.seek(start_offset)
+        for line in file:
+            if line.strip():
+                yield loads(line)
+
+def load_jsonl_dataset(file_path):
+    """
+    Reads a whole JSONL file into a list; prefer iter_jsonl or JsonlIndex for large files.
+    """
+    return list(iter_jsonl(file_path))
+
+def build_offsets(file_path):
+    """
+    Byte offset of every non-blank line of a JSONL file, found by scanning a memory
+    map for newlines in chunks, so no line is decoded.
+    """
+    # numpy is imported only by the code that indexes, so streaming readers start quickly
+    import numpy as np
+    size = os.path.getsize(file_path)
+    if size == 0:
+        return np.zeros(0, dtype=np.int64)
+    data = np.memmap(file_path, dtype=np.uint8, mode='r')
+    starts = [np.zeros(1, dtype=np.int64)]
+    for chunk_start in range(0, size, SCAN_CHUNK):
+        newlines = np.flatnonzero(data[chunk_start:chunk_start + SCAN_CHUNK] == ord('\n'))
+        starts.append(newlines.astype(np.int64) + chunk_start + 1)
+    starts = np.concatenate(starts)
+    starts = starts[starts < size]
+    # Drop blank lines, as iter_jsonl does; only lines starting with whitespace need a closer look
+    keep = ~np.isin(data[starts], np.frombuffer(WHITESPACE, dtype=np.uint8))
+    ends = np.append(starts[1:], size)
+    for i in np.flatnonzero(~keep):
+        keep[i] = bool(data[starts[i]:ends[i]].tobytes().strip())
+    offsets = starts[keep]
+    del data
+    return offsets
+
+class JsonlIndex:
+    """
+    Random access to the records of a JSONL file through a byte offset index, so record i
+    is one seek and one line read. The index is cached next to the file as <file>.idx and
+    rebuilt when the file's size or modification time changes. An index covers records
+    [start, stop) of the file, and transform (e.g. normalize_record) is applied to every
+    record read.
+    """
+    def __init__(self, file_path, transform=None, start=0, stop=None, cache=True):
+        self.path = file_path
+        self.transform = transform
+        offsets = self._load_cached() if cache else None
+        if offsets is None:
+            offsets = build_offsets(file_path)
+            if cache:
+                self._save_cache(offsets)
+        self.offsets = offsets[start:stop]
+        self.file = open(file_path, 'rb')
+
+    def _stamp(self):
+        import numpy as np
+        stat = os.stat(self.path)
+        return np.array([stat.st_size, stat.st_mtime_ns], dtype=np.int64)
+
+    def _load_cached(self):
+        import numpy as np
+        try:
+            with open(self.path + INDEX_SUFFIX, 'rb') as file:
+                cached = np.load(file)
+        except (OSError, ValueError, EOFError):
+            return None
+        if len(cached) < 2 or not np.array_equal(cached[:2], self._stamp()):
+            return None
+        return cached[2:]
+
+    def _save_cache(self, offsets):
+        import numpy as np
+        try:
+            with open(self.path + INDEX_SUFFIX, 'wb') as file:
+                np.save(file, np.concatenate([self._stamp(), offsets]))
+        except OSError:
+            # A read-only data directory just means the index is rebuilt next time
+            pass
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def __getitem__(self, index):
+        return self.read_at(int(self.offsets[index]))
+
+    def read_at(self, offset):
+        """
+        Reads the record that starts at a byte offset of the file.
+        """
+        self.file.seek(offset)
+        record = loads(self.file.readline())
+        return self.transform(record) if self.transform is not None else record
+
+    def offset(self, index):
+        return int(self.offsets[index])
+
+    def __iter__(self):
+        if len(self.offsets) == 0:
+            return
+        records = iter_jsonl(self.path, int(self.offsets[0]))
+        for _ in range(len(self.offsets)):
+            record = next(records)
+            yield self.transform(record) if self.transform is not None else record
+        records.close()
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+class JsonlWriter:
+    """
+    Writes records as JSONL, encoding each record and its newline in one call. By
+    default every record is written and flushed as it arrives, so a crash loses no
+    paid-for completion; offline transforms pass batch_size=OFFLINE_BATCH_SIZE to write
+    in batches. tell() and write() return logical byte offsets that count records
+    still in the batch, so they can be used for random access once the writer is flushed.
+    """
+    def __init__(self, file_path, mode='wb', batch_size=1):
+        self.file = open(file_path, mode)
+        self.batch_size = batch_size
+        self.batch = []
+        self.offset = self.file.tell()
+
+    def write(self, record):
+        """
+        Adds a record and returns the byte offset it starts at.
+        """
+        line = dumps(record) + b'\n'
+        offset = self.offset
+        self.batch.append(line)
+        self.offset += len(line)
+        if len(self.batch) >= self.batch_size:
+            self.flush()
+        return offset
+
+    def tell(self):
+        return self.offset
+
+    def flush(self):
+        if self.batch:
+            self.file.write(b''.join(self.batch))
+            self.batch = []
+        self.file.flush()
+
+    def close(self):
+        self.flush()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Index JSONL files for random access and read single records.')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    index_parser = subparsers.add_parser('index', help='Build (or refresh) the <file>.idx offset index and print the record count')
+    index_parser.add_argument('files', type=str, nargs='+', help='JSONL files')
+
+    get_parser = subparsers.add_parser('get', help='Print records by their position in the file')
+    get_parser.add_argument('file', type=str, help='JSONL file')
+    get_parser.add_argument('indices', type=int, nargs='+', help='Record numbers, counting from 0; negative counts from the end')
+
+    args = parser.parse_args(argv)
+
+    if args.command == 'index':
+        for file_path in args.files:
+            with JsonlIndex(file_path) as index:
+                print(f"{file_path}: {len(index)} records")
+    else:
+        with JsonlIndex(args.file) as index:
+            for i in args.indices:
+                print(json.dumps(index[i]))
+
+if __name__ == '__main__':
+    main()
@@ -1,15 +1,26 @@
 import os
+import io
 import json
+import gzip
+import tarfile
 import xml.etree.ElementTree as ET
-import spacy
 from tqdm import tqdm  # Progress bar library
 import sys
+import argparse
 from datetime import datetime
 import logging
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+import multiprocessing
+import gc
+import itertools
+from splitFiles import read_manifest
+from memoryStats import available_memory, current_rss, peak_rss, reset_peak_rss, memory_breakdown, format_bytes
+import metrics
+from textNormalize import normalize_text
 
 # Set up logging for errors only
-def setup_error_logging(stderr_folder):
-    timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
+def setup_error_logging(stderr_folder, suffix=""):
+    timestamp = datetime.now().strftime("%Y%m%d%H%M%S") + suffix
     log_file = os.path.join(stderr_folder, f"stderr_{timestamp}.log")
     logger = logging.getLogger(f"error_logger_{timestamp}")
     logger.setLevel(logging.ERROR)
@@ -26,42 +37,111 @@ namespaces = {
     'mml': 'http://www.w3.org/1998/Math/MathML'
 }
 
-# Load Spacy model globally to ensure it's not loaded multiple times
-nlp = spacy.load("en_ner_bc5cdr_md")
+# Spacy model, loaded once per process on first use
+nlp = None
+
+# Inputs: loose articles, gzipped articles and PMC bulk packages (tar archives of articles)
+XML_SUFFIXES = ('.xml', '.nxml')
+GZIP_XML_SUFFIXES = ('.xml.gz', '.nxml.gz')
+ARCHIVE_SUFFIXES = ('.tar', '.tar.gz', '.tgz')
 
 MAX_FILE_SIZE = 50 * 1024 * 1024  # 50 MB
 MAX_CHUNK_SIZE = 25000
 THRESHOLD = 1.25
 
+# Worker sizing: the largest few of the first files are processed up front to measure per-document peak memory
+CALIBRATION_POOL = 200
+CALIBRATION_FILES = 3
+MEMORY_RESERVE = 1024 ** 3  # Left free for the OS and the parent process
+
+def get_nlp():
+    """
+    Loads the Spacy model on first use.
+    """
+    global nlp
+    if nlp is None:
+        import spacy
+        nlp = spacy.load("en_ner_bc5cdr_md")
+    return nlp
+
 def TagCount(text, threshold):
     """
     Counts the number of 'CHEMICAL' entities in the first 5000 characters of the text.
     """
     # Process only the first 5000 characters
     chunk = text[:MAX_CHUNK_SIZE]
-    doc = nlp(chunk)
+    with metrics.timer('ner'):
+        doc = get_nlp()(chunk)
     chemical_count = sum(1 for ent in doc.ents if ent.label_ == "CHEMICAL" or ent.label_ == "DISEASE")
     return min(chemical_count, threshold)
 
 
+MATHML_NAMESPACE = '{http://www.w3.org/1998/Math/MathML}'
+
 def extract_text(element):
     """
-    Extracts and concatenates text from an XML element and its sub-elements.
+    Extracts and concatenates text from an XML element and its sub-elements, skipping
+    inline MathML, whose text is markup residue rather than prose.
     """
     if element is None:
         return ''
-    return ''.join(element.itertext())
+    parts = []
+    _collect_text(element, parts)
+    return ''.join(parts)
+
+def _collect_text(element, parts):
+    if isinstance(element.tag, str) and element.tag.startswith(MATHML_NAMESPACE):
+        parts.append(' ')
+    else:
+        if element.text:
+            parts.append(element.text)
+        for child in element:
+            _collect_text(child, parts)
+    if element.tail:
+        parts.append(element.tail)
+
+def is_archive(file_path):
+    return file_path.endswith(ARCHIVE_SUFFIXES)
+
+def document_name(file_path):
+    """
+    Document name of an article path or archive member, e.g. PMC123 for PMC123.xml,
+    PMC123.nxml.gz or package.tar.gz:articles/PMC123.nxml.
+    """
+    name = os.path.basename(file_path.rpartition(':')[2])
+    if name.endswith('.gz'):
+        name = name[:-3]
+    return os.path.splitext(name)[0]
+
+def iter_archive(archive_path):
+    """
+    Yields (member name, XML bytes) for every article in a tar archive, gzipped or not.
+    The archive is read as a stream, once and front to back, and nothing is unpacked to disk.
+    """
+    with tarfile.open(archive_path, 'r|*') as archive:
+        for member in archive:
+            if member.isfile() and member.name.endswith(XML_SUFFIXES):
+                yield member.name, archive.extractfile(member).read()
 
-def parse_xml_file(file_path, logger):
+@metrics.timed('xml_parse')
+def parse_xml_file(file_path, logger, data=None):
     """
-    Parses an XML file to extract the article title, abstract, and body text.
+    Parses an XML file to extract the article title, abstract, and body text. .gz files
+    are decompressed on the fly; data, if given, is the XML itself (an archive member)
+    and file_path only names it.
     """
     try:
-        tree = ET.parse(file_path)
+        if data is not None:
+            tree = ET.parse(io.BytesIO(data))
+        elif file_path.endswith('.gz'):
+            with gzip.open(file_path, 'rb') as file:
+                tree = ET.parse(file)
+        else:
+            tree = ET.parse(file_path)
         root = tree.getroot()
-        article_title = extract_text(root.find('.//title'))
-        abstract = extract_text(root.find('.//abstract'))
-        body = extract_text(root.find('.//body'))
+        article_title = normalize_text(extract_text(root.find('.//title')))
+        abstract = normalize_text(extract_text(root.find('.//abstract')))
+        body = normalize_text(extract_text(root.find('.//body')))
         del tree, root
         return {
             'title': article_title,
@@ -70,11 +150,14 @@ def parse_xml_file(file_path, logger):
         }
     except ET.ParseError as e:
         logger.error(f"ParseError in file {file_path}: {e}")
+        metrics.inc('parse_errors')
         return None
     except Exception as e:
         logger.error(f"Unexpected error in file {file_path}: {e}")
+        metrics.inc('parse_errors')
         return None
 
+@metrics.timed('filter')
 def filter_articles(article_data):
     """
     Filters articles based on a dynamic threshold of tagged entities.
@@ -90,51 +173,261 @@ def filter_articles(article_data):
     count = TagCount(text, dynamic_threshold)
     return count >= dynamic_threshold
 
-def process_file(file_name, output_folder, logger):
+def process_file(file_name, output_folder, logger, data=None):
     """
-    Process a single file and return the result.
+    Process a single file (or archive member, given its data) and return the result.
     """
     try:
-        result = parse_xml_file(file_name, logger)
-        if result and filter_articles(result):
-            # Correct JSON file naming
-            article_file_name = os.path.join(output_folder, f"{os.path.splitext(os.path.basename(file_name))[0]}.json")
-            with open(article_file_name, 'w') as f:
-                json.dump(result, f, indent=4)
-            return True
+        with metrics.document(file_name):
+            result = parse_xml_file(file_name, logger, data)
+            if result and filter_articles(result):
+                # Correct JSON file naming
+                article_file_name = os.path.join(output_folder, f"{document_name(file_name)}.json")
+                with metrics.timer('json_write'), open(article_file_name, 'w') as f:
+                    json.dump(result, f, indent=4)
+                metrics.inc('docs_kept')
+                return True
+            metrics.inc('docs_rejected')
     except Exception as e:
         logger.error(f"Error processing file {file_name}: {e}")
+        metrics.inc('errors')
     return False
 
-def parse_xml_folder(folder_path, output_folder, stderr_folder):
+def process_archive(archive_path, output_folder, logger):
+    """
+    Processes every article of a tar archive and returns (documents, kept). A damaged
+    archive is logged and the articles read before the damage still count.
+    """
+    docs = 0
+    kept = 0
+    try:
+        for member_name, data in iter_archive(archive_path):
+            docs += 1
+            kept += process_file(f"{archive_path}:{member_name}", output_folder, logger, data)
+    except (tarfile.TarError, OSError, EOFError) as e:
+        logger.error(f"Error reading archive {archive_path}: {e}")
+        metrics.inc('errors')
+    return docs, kept
+
+def process_input(file_path, output_folder, logger):
+    """
+    Processes one input, an article or an archive of articles, and returns (documents, kept).
+    """
+    if is_archive(file_path):
+        return process_archive(file_path, output_folder, logger)
+    return 1, process_file(file_path, output_folder, logger)
+
+def iter_xml_files(folder_path):
+    """
+    Yields the path of every XML file, gzipped or not, under a folder.
+    """
+    for root, dirs, files in os.walk(folder_path):
+        for file in files:
+            if file.endswith(XML_SUFFIXES) or file.endswith(GZIP_XML_SUFFIXES):
+                yield os.path.join(root, file)
+
+def is_input(file_path):
+    return file_path.endswith(XML_SUFFIXES) or file_path.endswith(GZIP_XML_SUFFIXES) or is_archive(file_path)
+
+def iter_input_files(folder_path):
+    """
+    Yields the path of every XML file, gzipped XML file and tar archive under a folder.
+    """
+    for root, dirs, files in os.walk(folder_path):
+        for file in files:
+            if is_input(file):
+                yield os.path.join(root, file)
+
+def calibrate(files, output_folder, logger):
     """
-    Parses a folder of XML files, filters the articles, and saves the results.
+    Measures the resident memory of the Spacy model and the peak memory of the largest
+    of the first few documents. The calibration documents are processed for real and
+    returned so they are not processed again. With only archives to go on, the first
+    articles of the first archive are measured without writing anything; they are
+    processed with the rest of their archive.
+    """
+    rss_before = current_rss()
+    get_nlp()
+    model_rss = current_rss() - rss_before
+
+    articles = [file_path for file_path in files[:CALIBRATION_POOL] if not is_archive(file_path)]
+    candidates = sorted(articles, key=os.path.getsize, reverse=True)[:CALIBRATION_FILES]
+    doc_peak = 0
+    kept = 0
+    for file_path in candidates:
+        rss = current_rss()
+        reset_peak_rss()
+        kept += process_file(file_path, output_folder, logger)
+        doc_peak = max(doc_peak, peak_rss() - rss)
+    if not candidates and files:
+        try:
+            for member_name, data in itertools.islice(iter_archive(files[0]), CALIBRATION_FILES):
+                rss = current_rss()
+                reset_peak_rss()
+                article = parse_xml_file(member_name, logger, data)
+                if article:
+                    filter_articles(article)
+                doc_peak = max(doc_peak, peak_rss() - rss)
+        except (tarfile.TarError, OSError, EOFError):
+            # process_archive logs the damage when the archive's turn comes
+            pass
+
+    # A worker needs the interpreter, the model and one worst-case document
+    worker_memory = current_rss() + doc_peak
+    return model_rss, doc_peak, worker_memory, candidates, kept
+
+def size_worker_pool(worker_memory, requested):
+    """
+    Picks the number of workers that fits in available memory, capped by the CPU count
+    and by the requested number of workers ('auto' for no cap). worker_memory is the
+    memory each additional worker needs.
+    """
+    by_memory = max(1, (available_memory() - MEMORY_RESERVE) // worker_memory)
+    workers = min(os.cpu_count() or 1, by_memory)
+    if requested != 'auto':
+        if int(requested) > workers:
+            print(f"Only enough memory for {workers} workers, not {requested}")
+        workers = min(workers, int(requested))
+    return workers
+
+# Per-worker state for the process pool
+_worker_logger = None
+
+def _init_worker(stderr_folder, metrics_config=None):
+    global _worker_logger
+    _worker_logger = setup_error_logging(stderr_folder, suffix=f"_{os.getpid()}")
+    if metrics_config:
+        metrics.configure(**metrics_config)
+    get_nlp()
+
+def _process_in_worker(file_name, output_folder):
+    reset_peak_rss()
+    docs, kept = process_input(file_name, output_folder, _worker_logger)
+    return os.getpid(), docs, kept, peak_rss(), memory_breakdown()
+
+def process_files(files, output_folder, stderr_folder, workers=1, share_model=False):
+    """
+    Processes XML files and archives serially or with a memory-aware pool of worker
+    processes, then prints a run summary including the peak RSS of every worker.
+    Each archive is one task, so archives are decompressed in parallel, one per worker.
+
+    With share_model, workers are forked after the parent has loaded the model, so all
+    of them share one physical copy of its weights and vectors copy-on-write.
     """
     logger = setup_error_logging(stderr_folder)
+    files = list(files)
+    model_rss, doc_peak, worker_memory, done, kept = calibrate(files, output_folder, logger)
+    docs = len(done)
+    done = set(done)
+    remaining = [file_path for file_path in files if file_path not in done]
+
+    worker_peaks = {}
+    worker_memory_use = {}
+    if workers != 'auto' and int(workers) <= 1:
+        num_workers = 1
+        for file_path in tqdm(remaining, desc="Processing files"):
+            file_docs, file_kept = process_input(file_path, output_folder, logger)
+            docs += file_docs
+            kept += file_kept
+        worker_peaks[os.getpid()] = peak_rss()
+    else:
+        if share_model:
+            # The model pages are shared, so each extra worker only costs its private memory
+            num_workers = size_worker_pool(worker_memory - model_rss, workers)
+            # Move the loaded model out of the collector's reach so collections in the
+            # workers do not write to (and so copy) the shared pages
+            gc.freeze()
+            context = multiprocessing.get_context('fork')
+        else:
+            num_workers = size_worker_pool(worker_memory, workers)
+            # Spawned workers load their own model, so each one's memory use is measured on its own
+            context = multiprocessing.get_context('spawn')
+        print(f"Model RSS {format_bytes(model_rss)}, document peak {format_bytes(doc_peak)}, starting {num_workers} workers")
+        max_in_flight = num_workers * 2
+        in_flight = set()
+        with ProcessPoolExecutor(num_workers, mp_context=context, initializer=_init_worker, initargs=(stderr_folder, metrics.current_config())) as executor, \
+                tqdm(total=len(remaining), desc="Processing files") as pbar:
 
-    # Initialize the progress bar
-    total_files = sum([len(files) for r, d, files in os.walk(folder_path) if any(file.endswith('.xml') for file in files)])
-    with tqdm(total=total_files, desc="Processing files") as pbar:
-        for root, dirs, files in os.walk(folder_path):
-            for file in files:
-                if file.endswith('.xml'):
-                    file_path = os.path.join(root, file)
-                    process_file(file_path, output_folder, logger)
+            def collect(futures):
+                nonlocal docs, kept
+                for future in futures:
+                    in_flight.discard(future)
+                    pid, file_docs, file_kept, peak, breakdown = future.result()
+                    docs += file_docs
+                    kept += file_kept
+                    worker_peaks[pid] = max(worker_peaks.get(pid, 0), peak)
+                    if breakdown:
+                        worker_memory_use[pid] = breakdown
                     pbar.update(1)
 
-def main(folder_path, output_folder, stderr_folder):
+            for file_path in remaining:
+                # Pause new work while there is no room for another worst-case document
+                while in_flight and (len(in_flight) >= max_in_flight or available_memory() < MEMORY_RESERVE + doc_peak):
+                    done_futures, _ = wait(in_flight, timeout=1, return_when=FIRST_COMPLETED)
+                    collect(done_futures)
+                in_flight.add(executor.submit(_process_in_worker, file_path, output_folder))
+            collect(list(in_flight))
+
+    print(f"Processed {docs} documents from {len(files)} files, kept {kept}")
+    print(f"Model RSS: {format_bytes(model_rss)}, per-document peak: {format_bytes(doc_peak)}, workers: {num_workers}")
+    for pid, peak in sorted(worker_peaks.items()):
+        line = f"  Worker {pid} peak RSS: {format_bytes(peak)}"
+        if pid in worker_memory_use:
+            line += f", private: {format_bytes(worker_memory_use[pid]['private'])}, PSS: {format_bytes(worker_memory_use[pid]['pss'])}"
+        print(line)
+    if worker_memory_use:
+        # RSS counts shared pages once per worker; PSS splits them, so the difference is what sharing saves
+        total_rss = sum(use['rss'] for use in worker_memory_use.values())
+        total_pss = sum(use['pss'] for use in worker_memory_use.values())
+        print(f"Workers RSS total: {format_bytes(total_rss)}, PSS total: {format_bytes(total_pss)}, saved by sharing: {format_bytes(total_rss - total_pss)}")
+
+def parse_xml_folder(folder_path, output_folder, stderr_folder, workers=1, share_model=False):
+    """
+    Parses a folder of XML files and archives, filters the articles, and saves the results.
+    """
+    process_files(iter_input_files(folder_path), output_folder, stderr_folder, workers, share_model)
+
+def parse_xml_manifest(manifest_path, output_folder, stderr_folder, workers=1, share_model=False):
+    """
+    Parses the XML files and archives listed in a shard manifest written by splitFiles.py --manifest.
+    """
+    files = [file_path for file_path, size in read_manifest(manifest_path) if is_input(file_path)]
+    process_files(files, output_folder, stderr_folder, workers, share_model)
+
+def main(folder_path, output_folder, stderr_folder, manifest_path=None, workers=1, share_model=False):
     """
     Main function to parse XML files, filter them, and save the results.
     """
     os.makedirs(output_folder, exist_ok=True)
     os.makedirs(stderr_folder, exist_ok=True)
-    parse_xml_folder(folder_path, output_folder, stderr_folder)
+    if manifest_path:
+        parse_xml_manifest(manifest_path, output_folder, stderr_folder, workers, share_model)
+    else:
+        parse_xml_folder(folder_path, output_folder, stderr_folder, workers, share_model)
 
-if __name__ == "__main__":
-    if len(sys.argv) != 4:
-        print("Usage: python memo.py <path_to_xml_folder> <path_to_output_folder> <path_to_stderr_folder>")
+def run_cli(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Filter PMC XML articles (loose, .xml.gz or in .tar/.tar.gz packages) by chemical/disease entity density.',
+        usage='python memo.py <path_to_xml_folder> <path_to_output_folder> <path_to_stderr_folder>\n'
+              '       python memo.py --manifest <shard_k.txt> <path_to_output_folder> <path_to_stderr_folder>')
+    parser.add_argument('paths', nargs='+', help='XML or archive folder (unless --manifest is given), output folder and stderr folder')
+    parser.add_argument('--manifest', type=str, default=None, help='Shard manifest listing the XML files to process instead of a folder')
+    parser.add_argument('--workers', type=str, default='1', help="Number of worker processes, or 'auto' to size the pool from available memory (default: 1)")
+    parser.add_argument('--share_model', action='store_true', help='Load the model once and fork workers that share it copy-on-write')
+    metrics.add_arguments(parser)
+    args = parser.parse_args(argv)
+
+    expected = 2 if args.manifest else 3
+    if len(args.paths) != expected:
+        parser.print_usage()
         sys.exit(1)
-    folder_path = sys.argv[1]
-    output_folder = sys.argv[2]
-    stderr_folder = sys.argv[3]
-    main(folder_path, output_folder, stderr_folder)
+    if args.manifest:
+        folder_path = None
+        output_folder, stderr_folder = args.paths
+    else:
+        folder_path, output_folder, stderr_folder = args.paths
+    metrics.configure_from_args(args)
+    main(folder_path, output_folder, stderr_folder, args.manifest, args.workers, args.share_model)
+
+if __name__ == "__main__":
+    run_cli()
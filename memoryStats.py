@@ -0,0 +1,90 @@
+import os
+
+def available_memory():
+    """
+    Returns the memory available for new work in bytes (MemAvailable from /proc/meminfo),
+    falling back to free physical pages where /proc is not available.
+    """
+    try:
+        with open('/proc/meminfo', 'r') as file:
+            for line in file:
+                if line.startswith('MemAvailable:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return os.sysconf('SC_AVPHYS_PAGES') * os.sysconf('SC_PAGE_SIZE')
+
+def total_memory():
+    """
+    Returns the total physical memory in bytes.
+    """
+    return os.sysconf('SC_PHYS_PAGES') * os.sysconf('SC_PAGE_SIZE')
+
+def _status_field(field):
+    """
+    Reads a memory field (in bytes) from /proc/self/status, or None if unavailable.
+    """
+    try:
+        with open('/proc/self/status', 'r') as file:
+            for line in file:
+                if line.startswith(field + ':'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+def current_rss():
+    """
+    Returns the resident set size of this process in bytes.
+    """
+    rss = _status_field('VmRSS')
+    if rss is None:
+        import resource
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    return rss
+
+def peak_rss():
+    """
+    Returns the peak resident set size of this process in bytes since start or the last reset.
+    """
+    peak = _status_field('VmHWM')
+    if peak is None:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    return peak
+
+def reset_peak_rss():
+    """
+    Resets the peak RSS high-water mark (Linux only), so the peak of a single
+    document can be measured. Returns False where this is not supported.
+    """
+    try:
+        with open('/proc/self/clear_refs', 'w') as file:
+            file.write('5')
+        return True
+    except OSError:
+        return False
+
+def format_bytes(num_bytes):
+    return f"{num_bytes / 1024 ** 2:.0f} MB"
+
+def memory_breakdown():
+    """
+    Returns RSS, PSS and private memory of this process in bytes from /proc/self/smaps_rollup.
+    PSS splits shared pages between the processes sharing them, and private memory is
+    what the process would free on exit. Returns None where this is not available.
+    """
+    fields = {}
+    try:
+        with open('/proc/self/smaps_rollup', 'r') as file:
+            for line in file:
+                parts = line.split()
+                if len(parts) >= 2 and parts[0].endswith(':') and parts[1].isdigit():
+                    fields[parts[0][:-1]] = int(parts[1]) * 1024
+    except OSError:
+        return None
+    return {
+        'rss': fields.get('Rss', 0),
+        'pss': fields.get('Pss', 0),
+        'private': fields.get('Private_Clean', 0) + fields.get('Private_Dirty', 0),
+    }
@@ -0,0 +1,350 @@
+import os
+import sys
+import json
+import time
+import heapq
+import argparse
+import threading
+import functools
+from collections import Counter
+from contextlib import contextmanager
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# Upper bounds in seconds of the latency histogram buckets; the last bucket is unbounded
+BUCKETS = [0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, float('inf')]
+PROMETHEUS_PREFIX = 'factfinder'
+
+class Histogram:
+    def __init__(self):
+        self.counts = [0] * len(BUCKETS)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, seconds):
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                self.counts[i] += 1
+                break
+        self.count += 1
+        self.sum += seconds
+
+def histogram_percentile(buckets, q):
+    """
+    Estimates a percentile from bucket counts as the upper bound of the bucket it falls in.
+    """
+    total = sum(buckets)
+    if total == 0:
+        return None
+    rank = q / 100 * total
+    seen = 0
+    for bound, count in zip(BUCKETS, buckets):
+        seen += count
+        if seen >= rank:
+            return bound
+    return BUCKETS[-1]
+
+class Metrics:
+    """
+    Thread-safe counters and latency histograms for one process.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = Counter()
+        self.histograms = {}
+
+    def inc(self, name, value=1):
+        with self.lock:
+            self.counters[name] += value
+
+    def observe(self, name, seconds):
+        with self.lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram()
+            histogram.observe(seconds)
+
+    @contextmanager
+    def timer(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start)
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                "pid": os.getpid(),
+                "time": time.time(),
+                "counters": dict(self.counters),
+                "timers": {name: {"count": h.count, "sum": h.sum, "buckets": list(h.counts)} for name, h in self.histograms.items()},
+            }
+
+class SlowDocumentProfiler:
+    """
+    Opt-in sampling profiler. While a document is being processed, a background thread
+    samples the stack of the thread handling it; the collapsed stacks of the slowest
+    documents are kept for inspection (one 'file:function:line;...' string per stack,
+    the format flame graph tools read).
+    """
+    def __init__(self, keep=10, interval=0.005, max_stacks=25):
+        self.keep = keep
+        self.interval = interval
+        self.max_stacks = max_stacks
+        self.lock = threading.Lock()
+        self.active = {}
+        self.slowest = []
+        threading.Thread(target=self._sample_loop, daemon=True).start()
+
+    def _sample_loop(self):
+        while True:
+            time.sleep(self.interval)
+            with self.lock:
+                if not self.active:
+                    continue
+                frames = sys._current_frames()
+                for thread_id, stacks in self.active.items():
+                    frame = frames.get(thread_id)
+                    if frame is not None:
+                        stacks[_collapse(frame)] += 1
+
+    @contextmanager
+    def document(self, doc_id):
+        thread_id = threading.get_ident()
+        stacks = Counter()
+        with self.lock:
+            self.active[thread_id] = stacks
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            duration = time.perf_counter() - start
+            with self.lock:
+                del self.active[thread_id]
+                entry = (duration, str(doc_id), stacks.most_common(self.max_stacks))
+                if len(self.slowest) < self.keep:
+                    heapq.heappush(self.slowest, entry)
+                elif duration > self.slowest[0][0]:
+                    heapq.heapreplace(self.slowest, entry)
+
+    def report(self):
+        with self.lock:
+            ordered = sorted(self.slowest, reverse=True)
+        return [{"document": doc_id, "seconds": duration, "samples": sum(count for _, count in stacks),
+                 "stacks": [{"stack": stack, "samples": count} for stack, count in stacks]}
+                for duration, doc_id, stacks in ordered]
+
+def _collapse(frame, max_depth=40):
+    parts = []
+    while frame is not None and len(parts) < max_depth:
+        code = frame.f_code
+        parts.append(f"{os.path.basename(code.co_filename)}:{code.co_name}:{frame.f_lineno}")
+        frame = frame.f_back
+    return ";".join(reversed(parts))
+
+# Process-wide registry used by the instrumented scripts
+METRICS = Metrics()
+PROFILER = None
+_config = None
+_flush_lock = threading.Lock()
+
+def timer(name):
+    return METRICS.timer(name)
+
+def inc(name, value=1):
+    METRICS.inc(name, value)
+
+def observe(name, seconds):
+    METRICS.observe(name, seconds)
+
+def timed(name):
+    """
+    Decorator recording every call of a function in the named timer.
+    """
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with METRICS.timer(name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+@contextmanager
+def document(doc_id):
+    """
+    Times one document end to end and, when profiling is enabled, samples its stacks.
+    """
+    with METRICS.timer('document'):
+        if PROFILER is None:
+            yield
+        else:
+            with PROFILER.document(doc_id):
+                yield
+
+def flush():
+    """
+    Writes this process's snapshot (and slowest-document profile) to the metrics folder.
+    """
+    if _config is None:
+        return
+    with _flush_lock:
+        pid = os.getpid()
+        _write_json(os.path.join(_config['metrics_dir'], f"metrics_{pid}.json"), METRICS.snapshot())
+        if PROFILER is not None:
+            _write_json(os.path.join(_config['metrics_dir'], f"slowest_{pid}.json"), PROFILER.report())
+
+def _write_json(path, data):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as file:
+        json.dump(data, file, indent=4)
+    os.replace(tmp_path, path)
+
+def _flush_loop(interval):
+    while True:
+        time.sleep(interval)
+        flush()
+
+def configure(metrics_dir, interval=30, port=None, profile_slowest=0):
+    """
+    Turns on periodic snapshots to metrics_dir/metrics_<pid>.json, the optional
+    Prometheus endpoint on port, and the optional profiler keeping the stacks of the
+    profile_slowest slowest documents. Worker processes call it with the dict returned
+    by current_config(), without the port. Counts recorded before the call are discarded.
+    """
+    global _config, PROFILER, METRICS, _flush_lock
+    os.makedirs(metrics_dir, exist_ok=True)
+    # A forked worker starts from its own empty registry (and locks) rather than a copy of the parent's
+    METRICS = Metrics()
+    _flush_lock = threading.Lock()
+    _config = {'metrics_dir': metrics_dir, 'interval': interval, 'port': port, 'profile_slowest': profile_slowest}
+    if profile_slowest:
+        PROFILER = SlowDocumentProfiler(keep=profile_slowest)
+    threading.Thread(target=_flush_loop, args=(interval,), daemon=True).start()
+    if port:
+        start_prometheus_server(port, metrics_dir)
+    # Runs at interpreter exit, and also when a multiprocessing worker exits
+    from multiprocessing.util import Finalize
+    Finalize(None, flush, exitpriority=10)
+
+def current_config():
+    """
+    Returns the configuration to hand to worker processes (without the HTTP port), or None.
+    """
+    if _config is None:
+        return None
+    return dict(_config, port=None)
+
+def add_arguments(parser):
+    parser.add_argument('--metrics_dir', type=str, default=None, help='Folder for periodic metrics snapshots (default: off)')
+    parser.add_argument('--metrics_interval', type=float, default=30, help='Seconds between metrics snapshots (default: 30)')
+    parser.add_argument('--metrics_port', type=int, default=None, help='Serve Prometheus text metrics on this port (needs --metrics_dir)')
+    parser.add_argument('--profile_slowest', type=int, default=0, help='Sample stacks and keep the N slowest documents (needs --metrics_dir)')
+
+def configure_from_args(args):
+    if args.metrics_dir:
+        configure(args.metrics_dir, args.metrics_interval, args.metrics_port, args.profile_slowest)
+
+def merge_snapshots(metrics_dir):
+    """
+    Sums the latest snapshot of every process that wrote to metrics_dir.
+    """
+    counters = Counter()
+    timers = {}
+    processes = 0
+    for name in sorted(os.listdir(metrics_dir)):
+        if not (name.startswith('metrics_') and name.endswith('.json')):
+            continue
+        try:
+            with open(os.path.join(metrics_dir, name), 'r') as file:
+                snapshot = json.load(file)
+        except (OSError, json.JSONDecodeError):
+            continue
+        processes += 1
+        counters.update(snapshot['counters'])
+        for timer_name, data in snapshot['timers'].items():
+            merged = timers.setdefault(timer_name, {"count": 0, "sum": 0.0, "buckets": [0] * len(BUCKETS)})
+            merged["count"] += data["count"]
+            merged["sum"] += data["sum"]
+            merged["buckets"] = [a + b for a, b in zip(merged["buckets"], data["buckets"])]
+    return {"processes": processes, "counters": dict(counters), "timers": timers}
+
+def prometheus_text(merged):
+    lines = []
+    for name, value in sorted(merged["counters"].items()):
+        metric = f"{PROMETHEUS_PREFIX}_{name}_total"
+        lines += [f"# TYPE {metric} counter", f"{metric} {value}"]
+    for name, data in sorted(merged["timers"].items()):
+        metric = f"{PROMETHEUS_PREFIX}_{name}_seconds"
+        lines.append(f"# TYPE {metric} histogram")
+        cumulative = 0
+        for bound, count in zip(BUCKETS, data["buckets"]):
+            cumulative += count
+            le = "+Inf" if bound == float('inf') else repr(bound)
+            lines.append(f'{metric}_bucket{{le="{le}"}} {cumulative}')
+        lines += [f"{metric}_sum {data['sum']}", f"{metric}_count {data['count']}"]
+    return "\n".join(lines) + "\n"
+
+def start_prometheus_server(port, metrics_dir):
+    """
+    Serves the merged metrics of every process writing to metrics_dir at /metrics.
+    """
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+        def do_GET(self):
+            if self.path != '/metrics':
+                self.send_error(404)
+                return
+            flush()
+            body = prometheus_text(merge_snapshots(metrics_dir)).encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    server = ThreadingHTTPServer(('0.0.0.0', port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def print_summary(metrics_dir, slowest=5):
+    merged = merge_snapshots(metrics_dir)
+    print(f"{merged['processes']} processes")
+    print(f"{'Timer':16} {'Count':>9} {'Total s':>10} {'Mean ms':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    # Steps taking the most total time first
+    for name, data in sorted(merged["timers"].items(), key=lambda item: -item[1]["sum"]):
+        mean = data["sum"] / data["count"] * 1000 if data["count"] else 0
+        percentiles = [histogram_percentile(data["buckets"], q) for q in (50, 95, 99)]
+        print(f"{name:16} {data['count']:>9} {data['sum']:>10.1f} {mean:>9.2f} " +
+              " ".join(f"{p * 1000:>8.1f}" if p is not None else f"{'-':>8}" for p in percentiles))
+    for name, value in sorted(merged["counters"].items()):
+        print(f"{name:16} {value:>9}")
+
+    documents = []
+    for name in os.listdir(metrics_dir):
+        if name.startswith('slowest_') and name.endswith('.json'):
+            with open(os.path.join(metrics_dir, name), 'r') as file:
+                documents += json.load(file)
+    for entry in sorted(documents, key=lambda entry: -entry["seconds"])[:slowest]:
+        print()
+        print(f"{entry['document']}: {entry['seconds']:.2f}s, {entry['samples']} samples")
+        for stack in entry["stacks"][:3]:
+            print(f"  {stack['samples']:>5}  {stack['stack'].split(';')[-1]}  ({stack['stack'].count(';') + 1} frames)")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Summarise the metrics snapshots and slowest-document profiles of a run.')
+    parser.add_argument('metrics_dir', type=str, help='Folder passed as --metrics_dir to the run')
+    parser.add_argument('--slowest', type=int, default=5, help='Slowest documents to show (default: 5)')
+    parser.add_argument('--prometheus', action='store_true', help='Print the merged metrics in Prometheus text format instead')
+
+    args = parser.parse_args(argv)
+
+    if args.prometheus:
+        print(prometheus_text(merge_snapshots(args.metrics_dir)), end='')
+    else:
+        print_summary(args.metrics_dir, args.slowest)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,162 @@
+import re
+import json
+import time
+import random
+import argparse
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from syntheticCorpus import TEMPLATES
+
+def _template_pattern(template):
+    pattern = re.escape(template)
+    for field in ("chemical", "disease", "source", "location"):
+        pattern = pattern.replace(re.escape("{" + field + "}"), f"(?P<{field}>[^.\n]+?)")
+    return re.compile(pattern, re.IGNORECASE)
+
+TEMPLATE_PATTERNS = [(_template_pattern(template), subject, predicate, obj) for template, subject, predicate, obj in TEMPLATES]
+
+def answer_triples(text):
+    """
+    Recovers the triples stated by syntheticCorpus sentences, so the mock's answers can be evaluated.
+    """
+    triples = []
+    for pattern, subject, predicate, obj in TEMPLATE_PATTERNS:
+        for match in pattern.finditer(text):
+            values = {key: value.strip() for key, value in match.groupdict().items()}
+            # Undo the capitalisation of a chemical that starts a sentence
+            values["chemical"] = values["chemical"][:1].lower() + values["chemical"][1:]
+            triples.append([subject.format(**values), predicate, obj.format(**values)])
+    return triples
+
+class RateLimiter:
+    """
+    Token bucket allowing `rate` requests per second with bursts of up to `rate` requests.
+    """
+    def __init__(self, rate):
+        self.rate = rate
+        self.tokens = rate
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.rate, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return True
+            return False
+
+class MockLLMServer(ThreadingHTTPServer):
+    """
+    OpenAI/Groq-compatible chat completions endpoint with configurable latency, error
+    rate and rate limit. Answers with the triples stated in syntheticCorpus passages,
+    as JSON when the request asks for schema-constrained output.
+    """
+    daemon_threads = True
+
+    def __init__(self, address, latency=0.5, jitter=0.2, error_rate=0.0, rate_limit=None, seconds_per_token=0.0, seed=0):
+        super().__init__(address, MockRequestHandler)
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rate_limiter = RateLimiter(rate_limit) if rate_limit else None
+        self.seconds_per_token = seconds_per_token
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.counts = {"requests": 0, "errors": 0, "rate_limited": 0}
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def count(self, key):
+        with self.lock:
+            self.counts[key] += 1
+
+    def start(self):
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        return thread
+
+class MockRequestHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, body, headers=None):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        server = self.server
+        # The Groq SDK posts to /openai/v1/chat/completions, the OpenAI SDK to /v1/chat/completions
+        if not self.path.endswith("/chat/completions"):
+            self._send(404, {"error": {"message": f"Unknown path {self.path}"}})
+            return
+        request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+        server.count("requests")
+
+        if server.rate_limiter is not None and not server.rate_limiter.acquire():
+            server.count("rate_limited")
+            self._send(429, {"error": {"message": "Rate limit exceeded", "type": "rate_limit_error"}}, {"Retry-After": "1"})
+            return
+        with server.lock:
+            failed = server.rng.random() < server.error_rate
+            delay = max(0.0, server.rng.gauss(server.latency, server.jitter))
+        if failed:
+            server.count("errors")
+            time.sleep(delay / 2)
+            self._send(500, {"error": {"message": "Mock server error", "type": "server_error"}})
+            return
+
+        text = " ".join(message.get("content") or "" for message in request.get("messages", []))
+        if request.get("response_format", {}).get("type") == "json_schema" or "guided_json" in request:
+            # Constrained decoding: compact JSON matching the requested schema
+            content = json.dumps({"triples": answer_triples(text)}, separators=(",", ":"))
+        else:
+            content = "\n".join(json.dumps(triple) for triple in answer_triples(text)) or '["NA", "NA", "NA"]'
+        prompt_tokens = len(text.split()) * 4 // 3
+        # About four characters per token; word counts would undercount compact JSON
+        completion_tokens = max(1, len(content) // 4)
+        time.sleep(delay + completion_tokens * server.seconds_per_token)
+        self._send(200, {
+            "id": f"mock-{time.time_ns()}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request.get("model", "mock"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens, "total_tokens": prompt_tokens + completion_tokens},
+        })
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Run a local OpenAI/Groq-compatible mock chat completions server.')
+    parser.add_argument('--host', type=str, default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--latency', type=float, default=0.5, help='Mean response latency in seconds (default: 0.5)')
+    parser.add_argument('--jitter', type=float, default=0.2, help='Standard deviation of the latency in seconds (default: 0.2)')
+    parser.add_argument('--error_rate', type=float, default=0.0, help='Fraction of requests answered with HTTP 500 (default: 0)')
+    parser.add_argument('--rate_limit', type=float, default=None, help='Requests per second before answering HTTP 429 (default: unlimited)')
+    parser.add_argument('--seconds_per_token', type=float, default=0.0, help='Extra latency per completion token (default: 0)')
+
+    args = parser.parse_args(argv)
+
+    server = MockLLMServer((args.host, args.port), args.latency, args.jitter, args.error_rate, args.rate_limit, args.seconds_per_token)
+    print(f"Mock LLM server listening on {server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(json.dumps(server.counts))
+
+if __name__ == '__main__':
+    main()
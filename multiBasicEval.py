@@ -1,47 +1,38 @@
 import json
 import ast
+import argparse
+from metrics import timed
+import os
+import hashlib
+from fractions import Fraction
 from tqdm import tqdm
-from jaro import jaro_winkler_metric
-import numpy as np
-import pandas as pd
+from similarity import jaro_winkler_batch, aligned_triple_similarity
+from synonymIndex import SynonymIndex, TripleNormalizer
+from textNormalize import normalize_text
+from jsonlIO import loads
 
 DEBUG = False
 
-def compute_metrics_for_excel(file_path, number_of_fails, skip_ranges):
-    # Read the Excel file
-    df = pd.read_excel(file_path)
-
-    # Convert skip_ranges string to list of tuples
-    if skip_ranges:
-        skip_ranges = [tuple(map(int, rng.split('-'))) for rng in skip_ranges.split(',')]
-    print(skip_ranges)
-
-    # Initialize lists to store scores
-    precision_scores = []
-    bonus_precision_scores = []
-    recall_scores = []
-    bonus_recall_scores = []
-    f1_scores = []
-    bonus_f1_scores = []
-    jaro_winkler_scores = []
-    bonus_jaro_winkler_scores = []
-    f1_bonus_precison_recall_score = []
-    false_positive_ratios = []
-
-    count = 0
-    # Iterate through each row
-    for index, row in tqdm(df.iterrows(), total=len(df), desc="Processing rows"):
-        # Skip rows if within skip_ranges
-        skip_row = False
-        if skip_ranges:
-            for rng in skip_ranges:
-                if rng[0] <= index + 2 <= rng[1]:
-                    skip_row = True
-                    break
-        if skip_row:
-            continue
-
-        count += 1
+# Columns whose content determines a row's metric contribution
+ROW_HASH_COLUMNS = ["Output", "Ground Truth", "True Positives", "False Positives", "False Negatives", "False Positives Adjustments"]
+CACHE_VERSION = 2
+# Per-row scores summarised over a sheet
+METRIC_COLUMNS = ["Precision", "Recall", "F1-score", "Jaro-Winkler Similarity", "Bonus Precision", "Bonus Recall",
+                  "Bonus F1-score", "Bonus Jaro-Winkler Similarity", "Bonus Precision and Recall F1 Score", "False Positive Ratio"]
+
+def score_rows(rows, aligned_jaro=False):
+    """
+    Computes the per-row metric contributions for a list of evaluation sheet rows.
+    Jaro-Winkler pairs are collected across all rows and scored in one batch.
+    """
+    row_scores = []
+
+    # Jaro-Winkler pairs are collected per row and scored in one batch after the loop
+    jaro_winkler_pairs = []
+    bonus_jaro_winkler_pairs = []
+
+    for row in tqdm(rows, desc="Processing rows"):
+        scores = {}
         output_list = ast.literal_eval(row["Output"])[0]
         ground_truth_list = ast.literal_eval(row["Ground Truth"])[0]
         true_positives_list = ast.literal_eval(row["True Positives"])[0]
@@ -83,76 +74,269 @@ def compute_metrics_for_excel(file_path, number_of_fails, skip_ranges):
 
         # Compute Original Scores
         # Do initial text to see if ground truth and output is both empty
-        scores_list = [precision_scores, recall_scores, f1_scores, jaro_winkler_scores, bonus_precision_scores, bonus_recall_scores, bonus_f1_scores, bonus_jaro_winkler_scores,f1_bonus_precison_recall_score]
         if ground_truth_list == output_list:
-            for score_metric in scores_list:
-                score_metric.append(1)
+            for metric in ["Precision", "Recall", "F1-score", "Jaro-Winkler Similarity", "Bonus Precision", "Bonus Recall", "Bonus F1-score", "Bonus Jaro-Winkler Similarity", "Bonus Precision and Recall F1 Score"]:
+                scores[metric] = 1
         else:
             # Compute precision
             precision = len(true_positives_flat) / (len(true_positives_flat) + len(false_positives_flat)) if (len(true_positives_flat) + len(false_positives_flat)) > 0 else 0
-            precision_scores.append(precision)
+            scores["Precision"] = precision
 
             # Compute recall
             recall = len(true_positives_flat) / (len(true_positives_flat) + len(false_negatives_flat) + decrement_false_negative) if (len(true_positives_flat) + len(false_negatives_flat) + decrement_false_negative) > 0 else 0
-            recall_scores.append(recall)
+            scores["Recall"] = recall
 
             # Compute F1-score
             f1 = (2 * precision * recall) / (precision + recall) if (precision + recall) > 0 else 0
-            f1_scores.append(f1)
+            scores["F1-score"] = f1
 
-            # Compute Jaro-Winkler similarity
-            jaro_winkler_similarity = jaro_winkler_metric(' '.join(ground_truth_flat), ' '.join(true_positives_flat))
-            jaro_winkler_scores.append(jaro_winkler_similarity)
+            # Queue Jaro-Winkler similarity
+            if aligned_jaro:
+                scores["Jaro-Winkler Similarity"] = aligned_triple_similarity(ground_truth_list, true_positives_list)
+            else:
+                jaro_winkler_pairs.append((scores, ' '.join(ground_truth_flat), ' '.join(true_positives_flat)))
 
             # Compute Bonus Scores
             # Compute bonus precision
             bonus_precision = (len(true_positives_flat) + len(bonus_positives_flat)) / (len(true_positives_flat) + len(false_positives_flat) + len(bonus_positives_flat)) if (len(true_positives_flat) + len(false_positives_flat) + len(bonus_positives_flat)) > 0 else 0
-            bonus_precision_scores.append(bonus_precision)
+            scores["Bonus Precision"] = bonus_precision
 
             # Compute bonus recall
             bonus_recall = (len(true_positives_flat) + len(bonus_positives_flat)) / (len(true_positives_flat) + len(false_negatives_flat) + decrement_false_negative) if (len(true_positives_flat) + len(false_negatives_flat) + decrement_false_negative) > 0 else 0
-            bonus_recall_scores.append(bonus_recall)
+            scores["Bonus Recall"] = bonus_recall
 
             # Compute bonus F1-score
             bonus_f1 = (2 * bonus_precision * bonus_recall) / (bonus_precision + bonus_recall) if (bonus_precision + bonus_recall) > 0 else 0
-            bonus_f1_scores.append(bonus_f1)
+            scores["Bonus F1-score"] = bonus_f1
 
-            # Compute bonus Jaro-Winkler similarity
-            bonus_jaro_winkler_similarity = jaro_winkler_metric(' '.join(ground_truth_flat), ' '.join(true_positives_flat + bonus_positives_flat))
-            bonus_jaro_winkler_scores.append(bonus_jaro_winkler_similarity)
+            # Queue bonus Jaro-Winkler similarity
+            if aligned_jaro:
+                scores["Bonus Jaro-Winkler Similarity"] = aligned_triple_similarity(ground_truth_list, true_positives_list + bonus_positives_list)
+            else:
+                bonus_jaro_winkler_pairs.append((scores, ' '.join(ground_truth_flat), ' '.join(true_positives_flat + bonus_positives_flat)))
 
             # Compute bonus precsion and recall F1-score
             f1_bonus_precison_recall = (2 * bonus_precision * recall) / (bonus_precision + recall) if (bonus_precision + recall) > 0 else 0
-            f1_bonus_precison_recall_score.append(f1_bonus_precison_recall)
+            scores["Bonus Precision and Recall F1 Score"] = f1_bonus_precison_recall
 
         # Calculate false postive percentage
         false_positive_ratio = len(false_positives_flat) / (len(true_positives_flat) + len(false_positives_flat) + len(bonus_positives_flat)) if (len(true_positives_flat) + len(false_positives_flat) + len(bonus_positives_flat)) > 0 else 0
-        false_positive_ratios.append(false_positive_ratio)
+        scores["False Positive Ratio"] = false_positive_ratio
+
+        row_scores.append(scores)
+
+    # Score all queued Jaro-Winkler pairs in one batch
+    for metric, pairs in (("Jaro-Winkler Similarity", jaro_winkler_pairs), ("Bonus Jaro-Winkler Similarity", bonus_jaro_winkler_pairs)):
+        similarities = jaro_winkler_batch([(gt, tp) for _, gt, tp in pairs])
+        for (scores, _, _), similarity in zip(pairs, similarities):
+            scores[metric] = similarity
+
+    return row_scores
+
+def row_content_hash(row):
+    """
+    Hashes the columns of a row that affect its metric contribution.
+    """
+    digest = hashlib.sha1()
+    for column in ROW_HASH_COLUMNS:
+        digest.update(str(row[column]).encode("utf-8"))
+        digest.update(b"\x1f")
+    return digest.hexdigest()
+
+def read_sheet_rows(file_path, skip_ranges):
+    """
+    Reads the rows of an evaluated Excel sheet, leaving out the skipped sheet row ranges.
+    """
+    import pandas as pd
 
+    # Read the Excel file
+    df = pd.read_excel(file_path)
+
+    # Convert skip_ranges string to list of tuples
+    if skip_ranges:
+        skip_ranges = [tuple(map(int, rng.split('-'))) for rng in skip_ranges.split(',')]
+    print(skip_ranges)
+
+    rows = []
+    # Iterate through each row
+    for index, row in df.iterrows():
+        # Skip rows if within skip_ranges
+        skip_row = False
+        if skip_ranges:
+            for rng in skip_ranges:
+                if rng[0] <= index + 2 <= rng[1]:
+                    skip_row = True
+                    break
+        if skip_row:
+            continue
+        rows.append(row)
+    return rows
+
+def empty_totals():
+    return {metric: {"count": 0, "sum": "0", "sum_sq": "0", "min": None, "max": None} for metric in METRIC_COLUMNS}
+
+def update_totals(totals, scores, weight):
+    """
+    Adds (positive weight) or removes (negative weight) copies of one row's scores from
+    running totals. Returns the metrics whose minimum or maximum may have been removed.
+    Sums are exact fractions (stored as strings), so removing a row leaves no rounding drift.
+    """
+    stale = []
+    for metric in METRIC_COLUMNS:
+        value = scores[metric]
+        exact = Fraction(value)
+        total = totals[metric]
+        total["count"] += weight
+        total["sum"] = str(Fraction(total["sum"]) + weight * exact)
+        total["sum_sq"] = str(Fraction(total["sum_sq"]) + weight * exact * exact)
+        if weight > 0:
+            total["min"] = value if total["min"] is None else min(total["min"], value)
+            total["max"] = value if total["max"] is None else max(total["max"], value)
+        elif value == total["min"] or value == total["max"]:
+            stale.append(metric)
+    return stale
+
+def score_totals(row_scores):
+    totals = empty_totals()
+    for scores in row_scores:
+        update_totals(totals, scores, 1)
+    return totals
+
+def metric_statistics(total, number_of_fails=0):
+    """
+    Average, minimum, maximum and standard deviation from running totals, counting
+    number_of_fails extra zero scores.
+    """
+    count = total["count"] + number_of_fails
+    if count == 0:
+        return float("nan"), float("nan"), float("nan"), float("nan")
+    avg = Fraction(total["sum"]) / count
+    variance = Fraction(total["sum_sq"]) / count - avg * avg
+    avg, std = float(avg), float(variance) ** 0.5
+    minimum, maximum = total["min"], total["max"]
+    if number_of_fails > 0:
+        minimum = 0 if minimum is None else min(minimum, 0)
+        maximum = 0 if maximum is None else max(maximum, 0)
+    return avg, minimum, maximum, std
+
+def load_score_cache(cache_path, aligned_jaro=False):
+    """
+    Loads a sheet's score cache: per-row contributions keyed by row content hash, and
+    running totals per set of skipped rows.
+    """
+    if os.path.exists(cache_path):
+        with open(cache_path, "r", encoding="utf-8") as file:
+            cache = json.load(file)
+        if cache.get("version") == CACHE_VERSION and cache.get("aligned_jaro") == aligned_jaro:
+            return cache
+    return {"version": CACHE_VERSION, "aligned_jaro": aligned_jaro, "rows": {}, "views": {}}
+
+def save_score_cache(cache, cache_path, hashes):
+    # Keep only rows that are in the sheet now or counted in a view's totals
+    keep = set(hashes)
+    for view in cache["views"].values():
+        keep.update(view["counts"])
+    cache["rows"] = {row_hash: scores for row_hash, scores in cache["rows"].items() if row_hash in keep}
+    with open(cache_path, "w", encoding="utf-8") as file:
+        json.dump(cache, file)
+
+def score_new_rows(rows, cache, aligned_jaro=False):
+    """
+    Scores the rows whose content hash is not in the cache yet and returns every row's hash.
+    """
+    hashes = [row_content_hash(row) for row in rows]
+    changed = {}
+    for row_hash, row in zip(hashes, rows):
+        if row_hash not in cache["rows"] and row_hash not in changed:
+            changed[row_hash] = row
+    print(f"Rescoring {len(changed)} of {len(rows)} rows")
+
+    for row_hash, scores in zip(changed, score_rows(list(changed.values()), aligned_jaro)):
+        cache["rows"][row_hash] = scores
+    return hashes
+
+def incremental_score_rows(rows, cache_path, aligned_jaro=False):
+    """
+    Scores rows using a cache of per-row contributions keyed by row content hash.
+    Only rows that are new or whose content (e.g. adjustments) changed are rescored.
+    """
+    cache = load_score_cache(cache_path, aligned_jaro)
+    hashes = score_new_rows(rows, cache, aligned_jaro)
+    save_score_cache(cache, cache_path, hashes)
+    return [cache["rows"][row_hash] for row_hash in hashes]
+
+def incremental_totals(file_path, skip_ranges, aligned_jaro=False):
+    """
+    Returns (running totals, row count) for a sheet. The cache keeps the totals and row
+    counts of the last run; only added or changed rows are scored, and the totals move
+    by the contributions of added and removed rows. An unmodified sheet is not read at all.
+    """
+    cache_path = file_path.split(".")[0] + ".evalcache.json"
+    cache = load_score_cache(cache_path, aligned_jaro)
+    view_key = skip_ranges or ""
+    view = cache["views"].get(view_key)
+    stat = os.stat(file_path)
+    stamp = [stat.st_size, stat.st_mtime_ns]
+    if view is not None and view["stamp"] == stamp:
+        print("Sheet unchanged since the last run")
+        return view["totals"], sum(view["counts"].values())
+
+    if view is None:
+        view = {"counts": {}, "totals": empty_totals()}
+    rows = read_sheet_rows(file_path, skip_ranges)
+    hashes = score_new_rows(rows, cache, aligned_jaro)
+    counts = {}
+    for row_hash in hashes:
+        counts[row_hash] = counts.get(row_hash, 0) + 1
+
+    # Apply the difference between the last run's rows and this one's
+    totals = view["totals"]
+    stale = set()
+    for row_hash in set(view["counts"]) | set(counts):
+        delta = counts.get(row_hash, 0) - view["counts"].get(row_hash, 0)
+        if delta:
+            stale.update(update_totals(totals, cache["rows"][row_hash], delta))
+    for metric in METRIC_COLUMNS:
+        if totals[metric]["count"] == 0:
+            totals[metric] = empty_totals()[metric]
+        elif metric in stale:
+            # A removed row held the minimum or maximum; find the new one among the cached rows
+            values = [cache["rows"][row_hash][metric] for row_hash in counts]
+            totals[metric]["min"] = min(values)
+            totals[metric]["max"] = max(values)
+
+    view.update({"counts": counts, "totals": totals, "stamp": stamp})
+    cache["views"][view_key] = view
+    save_score_cache(cache, cache_path, hashes)
+    return totals, len(rows)
+
+def compute_metrics_for_excel(file_path, number_of_fails, skip_ranges, aligned_jaro=False, incremental=False):
+    # Score every row, or only the changed rows when running incrementally
+    if incremental:
+        totals, count = incremental_totals(file_path, skip_ranges, aligned_jaro)
+    else:
+        rows = read_sheet_rows(file_path, skip_ranges)
+        count = len(rows)
+        row_scores = score_rows(rows, aligned_jaro)
+        print([scores["Bonus Recall"] for scores in row_scores])
+        totals = score_totals(row_scores)
+
+    metrics = [
+        "Precision",
+        "Recall",
+        "F1-score",
+        "Jaro-Winkler Similarity",
+        "Bonus Precision",
+        "Bonus Recall",
+        "Bonus F1-score",
+        "Bonus Precision and Recall F1 Score"
+        # "Bonus Jaro-Winkler Similarity"
+    ]
     # Compute statistics
-    metrics = {
-        "Precision": precision_scores,
-        "Recall": recall_scores,
-        "F1-score": f1_scores,
-        "Jaro-Winkler Similarity": jaro_winkler_scores,
-        "Bonus Precision": bonus_precision_scores,
-        "Bonus Recall": bonus_recall_scores,
-        "Bonus F1-score": bonus_f1_scores,
-        "Bonus Precision and Recall F1 Score": f1_bonus_precison_recall_score
-        # "Bonus Jaro-Winkler Similarity": bonus_jaro_winkler_scores
-    }
-
-    print(bonus_recall_scores)
-
-    for metric, scores in metrics.items():
-        if number_of_fails > 0:
-            fails = [0] * number_of_fails
-            scores.extend(fails)
-        avg = np.mean(scores)
-        minimum = np.min(scores)
-        maximum = np.max(scores)
-        std = np.std(scores)
+    statistics = {metric: metric_statistics(totals[metric], number_of_fails) for metric in metrics}
+    false_positive_percentage = metric_statistics(totals["False Positive Ratio"])[0] * 100
 
+    for metric, (avg, minimum, maximum, std) in statistics.items():
         # Print statistics
         print(metric + ":")
         print("  Average:", avg)
@@ -165,7 +349,7 @@ def compute_metrics_for_excel(file_path, number_of_fails, skip_ranges):
             print('-' * 20)
             print()
 
-    print("False Positive Percentage: ", np.mean(false_positive_ratios) * 100)
+    print("False Positive Percentage: ", false_positive_percentage)
     print()
     print(f"Total Length: {count}")
 
@@ -175,15 +359,7 @@ def compute_metrics_for_excel(file_path, number_of_fails, skip_ranges):
     output_file_path = file_name + ".txt"
 
     with open(output_file_path, "w") as file:
-        for metric, scores in metrics.items():
-            if number_of_fails > 0:
-                fails = [0] * number_of_fails
-                scores.extend(fails)
-            avg = np.mean(scores)
-            minimum = np.min(scores)
-            maximum = np.max(scores)
-            std = np.std(scores)
-
+        for metric, (avg, minimum, maximum, std) in statistics.items():
             # Write statistics to the file
             file.write(metric + ":\n")
             file.write("  Average: " + str(avg) + "\n")
@@ -193,18 +369,18 @@ def compute_metrics_for_excel(file_path, number_of_fails, skip_ranges):
 
             if metric == "Jaro-Winkler Similarity":
                 file.write('-' * 20 + "\n\n")
-        file.write("False Positive Percentage: " + str(np.mean(false_positive_ratios) * 100) + "\n\n")
+        file.write("False Positive Percentage: " + str(false_positive_percentage) + "\n\n")
         file.write(f"Total Length: {count}")
 
-def manual_evaluation(output_file, ground_truth_file, excel_file):
+def manual_evaluation(output_file, ground_truth_file, excel_file, normalizer=None):
     # Store data
     all_data = []
 
     # Iterate through files
     with open(output_file, 'r', encoding="utf-8") as output_file, open(ground_truth_file, "r", encoding="utf-8") as gt_file:
         for output_line, gt_line in tqdm(zip(output_file, gt_file), desc="Reading JSONL", unit=" lines"):
-            output_data = json.loads(output_line)
-            gt_data = json.loads(gt_line)
+            output_data = loads(output_line)
+            gt_data = loads(gt_line)
 
             # Read the data
             # if output_data['valid'] == True:
@@ -214,7 +390,7 @@ def manual_evaluation(output_file, ground_truth_file, excel_file):
                 ground_truth = gt_data['output']
 
                 # Get lists
-                true_positives, false_positives, false_negatives = calculate_confusion_lists(output, ground_truth)
+                true_positives, false_positives, false_negatives = calculate_confusion_lists(output, ground_truth, normalizer)
 
                 # Prepare data for writing to Excel
                 data = {
@@ -234,39 +410,51 @@ def manual_evaluation(output_file, ground_truth_file, excel_file):
     write_to_excel(excel_file, all_data)
 
 def write_to_excel(file_path, all_data):
+    import pandas as pd
+
     # Create a DataFrame from the list of dictionaries
     df = pd.DataFrame(all_data)
 
     # Write the DataFrame to an Excel file
     df.to_excel(file_path, index=False)
 
-def calculate_confusion_lists(output, ground_truth):
+@timed('evaluate')
+def calculate_confusion_lists(output, ground_truth, normalizer=None):
     # Initate lists
     true_positives = []
     false_positives = []
     false_negatives = []
 
+    # Compare on normalised, lowercased triples but report the original ones
+    output_keys = [[normalize_text(part) for part in triplet] for triplet in output]
+    ground_truth_keys = [[normalize_text(part) for part in triplet] for triplet in ground_truth]
+    if normalizer is not None:
+        output_keys = [normalizer.normalize(triplet) for triplet in output_keys]
+        ground_truth_keys = [normalizer.normalize(triplet) for triplet in ground_truth_keys]
+    output_keys = [[part.lower() for part in triplet] for triplet in output_keys]
+    ground_truth_keys = [[part.lower() for part in triplet] for triplet in ground_truth_keys]
+
     # Classify each item
-    for triplet_gt in ground_truth:
+    for triplet_gt, key_gt in zip(ground_truth, ground_truth_keys):
         found_match = False
-        for triplet_out in output:
+        for key_out in output_keys:
             # Check if any part of the output triplet partially matches any part of the ground truth triplet
-            if (triplet_out[0].lower() in triplet_gt[0].lower()
-                and triplet_out[1].lower() in triplet_gt[1].lower()
-                and triplet_out[2].lower() in triplet_gt[2].lower()):
+            if (key_out[0] in key_gt[0]
+                and key_out[1] in key_gt[1]
+                and key_out[2] in key_gt[2]):
                 true_positives.append(triplet_gt)
                 found_match = True
                 break
         if not found_match:
             false_negatives.append(triplet_gt)
 
-    for triplet_out in output:
+    for triplet_out, key_out in zip(output, output_keys):
         found_match = False
-        for triplet_gt in ground_truth:
+        for key_gt in ground_truth_keys:
             # Check if any part of the ground truth triplet partially matches any part of the output triplet
-            if (triplet_gt[0].lower() in triplet_out[0].lower()
-                and triplet_gt[1].lower() in triplet_out[1].lower()
-                and triplet_gt[2].lower() in triplet_out[2].lower()):
+            if (key_gt[0] in key_out[0]
+                and key_gt[1] in key_out[1]
+                and key_gt[2] in key_out[2]):
                 found_match = True
                 break
         if not found_match:
@@ -275,12 +463,39 @@ def calculate_confusion_lists(output, ground_truth):
     return true_positives, false_positives, false_negatives
 
 
+def run_cli(argv=None):
+    parser = argparse.ArgumentParser(description='Build evaluation sheets and compute metrics from them.')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    sheet_parser = subparsers.add_parser('sheet', help='Match an output file against the ground truth and write the evaluation sheet')
+    sheet_parser.add_argument('output_file', type=str, help='Extraction output JSONL')
+    sheet_parser.add_argument('ground_truth_file', type=str, help='Ground truth JSONL')
+    sheet_parser.add_argument('excel_file', type=str, help='Evaluation sheet to write')
+    sheet_parser.add_argument('--synonym_index', type=str, default=None, help='Synonym index built with synonymIndex.py')
+
+    metrics_parser = subparsers.add_parser('metrics', help='Compute metrics from a reviewed evaluation sheet')
+    metrics_parser.add_argument('excel_file', type=str, help='Reviewed evaluation sheet')
+    metrics_parser.add_argument('--number_of_fails', type=int, default=0, help='Number of failed outputs to count as zero scores')
+    metrics_parser.add_argument('--skip_ranges', type=str, default=None, help='Sheet row ranges to skip, e.g. 17-26,40-45')
+    metrics_parser.add_argument('--aligned_jaro', action='store_true', help='Use per-triple aligned Jaro-Winkler similarity')
+    metrics_parser.add_argument('--incremental', action='store_true', help='Only rescore rows that changed since the last run')
+
+    args = parser.parse_args(argv)
+
+    if args.command == 'sheet':
+        normalizer = TripleNormalizer(SynonymIndex(args.synonym_index) if args.synonym_index else None)
+        manual_evaluation(args.output_file, args.ground_truth_file, args.excel_file, normalizer)
+    else:
+        compute_metrics_for_excel(args.excel_file, args.number_of_fails, args.skip_ranges, args.aligned_jaro, args.incremental)
+
 if __name__ == "__main__":
     # output_file = 'LLama_3/output_80_Llama_3_instruct_Filtered.jsonl'
     # ground_truth_file = "Data/Synthetic_And_Real_Test_Set/test_80.jsonl"
     # excel_file = 'LLama_3/output_80_Llama_3_instruct_Filtered.xlsx'
 
-    # manual_evaluation(output_file, ground_truth_file, excel_file)
+    # Optionally match subjects through a synonym index built with synonymIndex.py
+    # normalizer = TripleNormalizer(SynonymIndex("Data/chemical_synonyms.idx"))
+    # manual_evaluation(output_file, ground_truth_file, excel_file, normalizer)
 ##################################################################################################################################################
 
 
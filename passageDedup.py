@@ -0,0 +1,133 @@
+import re
+import zlib
+import hashlib
+import argparse
+import numpy as np
+from tqdm import tqdm
+from jsonlIO import iter_jsonl, JsonlWriter, OFFLINE_BATCH_SIZE
+
+WORD_PATTERN = re.compile(r'\w+')
+
+class MinHasher:
+    """
+    MinHash signatures over word shingles, using multiply-shift hashing so a whole
+    signature is computed with a few numpy operations.
+    """
+    def __init__(self, num_perm=128, shingle_size=5, seed=1):
+        rng = np.random.default_rng(seed)
+        self.a = rng.integers(1, 2 ** 63, num_perm, dtype=np.uint64) | np.uint64(1)
+        self.b = rng.integers(0, 2 ** 63, num_perm, dtype=np.uint64)
+        self.shingle_size = shingle_size
+
+    def shingles(self, text):
+        words = WORD_PATTERN.findall(text.lower())
+        if not words:
+            return []
+        k = min(self.shingle_size, len(words))
+        return [' '.join(words[i:i + k]) for i in range(len(words) - k + 1)]
+
+    def signature(self, text):
+        shingles = self.shingles(text)
+        if not shingles:
+            return None
+        hashes = np.fromiter((zlib.crc32(shingle.encode('utf-8')) for shingle in set(shingles)), dtype=np.uint64)
+        # (a * x + b) mod 2^64 wraps around by design; the high bits are the hash
+        with np.errstate(over='ignore'):
+            permuted = (hashes[:, None] * self.a + self.b) >> np.uint64(32)
+        return permuted.min(axis=0)
+
+class BandTable:
+    """
+    Fixed-size, direct-mapped table from LSH band key to the passage that first produced
+    it. Memory is capacity * 24 bytes whatever the corpus size; when two keys land on
+    the same slot the newer one wins, which can only cost a missed duplicate.
+    """
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.keys = np.zeros(capacity, dtype=np.uint64)
+        self.indices = np.full(capacity, -1, dtype=np.int64)
+        self.offsets = np.zeros(capacity, dtype=np.int64)
+
+    def get(self, key):
+        slot = key % self.capacity
+        if self.indices[slot] >= 0 and self.keys[slot] == key:
+            return int(self.indices[slot]), int(self.offsets[slot])
+        return None
+
+    def put(self, key, index, offset):
+        slot = key % self.capacity
+        self.keys[slot] = key
+        self.indices[slot] = index
+        self.offsets[slot] = offset
+
+class PassageDeduplicator:
+    """
+    Streams passages through MinHash/LSH and reports, for each one, the earlier
+    representative it is a near duplicate of. With b bands of r rows, passages with
+    Jaccard similarity s collide in at least one band with probability 1 - (1 - s^r)^b,
+    about 0.7 similarity for the default 16 bands of 8 rows.
+    """
+    def __init__(self, num_perm=128, bands=16, shingle_size=5, capacity=1 << 24):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.hasher = MinHasher(num_perm, shingle_size)
+        self.bands = bands
+        self.table = BandTable(capacity)
+        self.seen = 0
+        self.duplicates = 0
+
+    def band_keys(self, text):
+        signature = self.hasher.signature(text)
+        if signature is None:
+            return []
+        keys = []
+        for band, rows in enumerate(signature.reshape(self.bands, -1)):
+            digest = hashlib.blake2b(rows.tobytes(), digest_size=8, salt=band.to_bytes(16, 'little')).digest()
+            keys.append(int.from_bytes(digest, 'little'))
+        return keys
+
+    def find(self, text):
+        """
+        Returns (band keys, (index, offset) of the representative or None).
+        """
+        self.seen += 1
+        keys = self.band_keys(text)
+        for key in keys:
+            representative = self.table.get(key)
+            if representative is not None:
+                self.duplicates += 1
+                return keys, representative
+        return keys, None
+
+    def add(self, keys, index, offset=0):
+        """
+        Registers a passage as the representative of its cluster.
+        """
+        for key in keys:
+            self.table.put(key, index, offset)
+
+    def saved_fraction(self):
+        return self.duplicates / self.seen if self.seen else 0.0
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Find near-duplicate passages in a JSONL dataset with MinHash/LSH.')
+    parser.add_argument('dataset', type=str, help='Input JSONL dataset with an "input" field per line')
+    parser.add_argument('clusters', type=str, help='Output JSONL with the representative index of every passage')
+    parser.add_argument('--num_perm', type=int, default=128, help='MinHash signature length (default: 128)')
+    parser.add_argument('--bands', type=int, default=16, help='LSH bands; fewer bands need higher similarity to match (default: 16)')
+    parser.add_argument('--shingle_size', type=int, default=5, help='Words per shingle (default: 5)')
+    parser.add_argument('--table_mb', type=int, default=384, help='Memory for the band table in MB (default: 384)')
+
+    args = parser.parse_args(argv)
+
+    dedup = PassageDeduplicator(args.num_perm, args.bands, args.shingle_size, args.table_mb * 1024 ** 2 // 24)
+    with JsonlWriter(args.clusters, batch_size=OFFLINE_BATCH_SIZE) as outfile:
+        for index, data in enumerate(tqdm(iter_jsonl(args.dataset), desc="Hashing passages", unit=" passages")):
+            keys, representative = dedup.find(data['input'])
+            if representative is None:
+                dedup.add(keys, index)
+            outfile.write({'index': index, 'duplicate_of': representative[0] if representative else None})
+    print(f"{dedup.duplicates} of {dedup.seen} passages are near duplicates: {dedup.saved_fraction():.1%} of LLM calls saved")
+
+if __name__ == '__main__':
+    main()
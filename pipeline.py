@@ -0,0 +1,397 @@
+import os
+import json
+import sys
+import queue
+import argparse
+import functools
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, wait
+from tqdm import tqdm
+import metrics
+import tokenBudget
+from tokenBudget import SpendCapExceeded
+
+# Sentinel telling a stage worker that its input queue is finished
+STOP = object()
+# Errors that stop the whole pipeline instead of failing one document
+FATAL_ERRORS = (SpendCapExceeded,)
+# How often blocked queue operations check whether the pipeline is stopping
+POLL_INTERVAL = 0.1
+
+class Checkpoint:
+    """
+    Append-only JSONL record of one stage's result per document, so a re-run can pick
+    each document up after the last stage it completed. A result of None marks a
+    document the stage dropped (e.g. an article that did not pass the filter).
+    Only the byte offset of each entry is kept in memory; results are read back on demand.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.offsets = {}
+        self.file = None
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, 'rb') as file:
+            offset = 0
+            for line in file:
+                try:
+                    entry = json.loads(line)
+                    self.offsets[entry['id']] = offset
+                except (json.JSONDecodeError, KeyError):
+                    # A crash can leave a partial last line
+                    pass
+                offset += len(line)
+
+    def open(self):
+        self.file = open(self.path, 'ab')
+
+    def __contains__(self, doc_id):
+        return doc_id in self.offsets
+
+    def get(self, doc_id):
+        with open(self.path, 'rb') as file:
+            file.seek(self.offsets[doc_id])
+            return json.loads(file.readline())['result']
+
+    def write(self, doc_id, result):
+        line = (json.dumps({'id': doc_id, 'result': result}) + '\n').encode('utf-8')
+        with self.lock:
+            offset = self.file.tell()
+            self.file.write(line)
+            self.file.flush()
+            self.offsets[doc_id] = offset
+
+    def items(self):
+        """
+        Yields (id, result) for every checkpointed document, last entry per id winning.
+        """
+        with open(self.path, 'rb') as file:
+            for doc_id, offset in self.offsets.items():
+                file.seek(offset)
+                yield doc_id, json.loads(file.readline())['result']
+
+    def close(self):
+        if self.file:
+            self.file.close()
+            self.file = None
+
+class Stage:
+    """
+    One step of the pipeline: a function (doc_id, payload) -> result run by its own
+    pool of worker threads. Returning None drops the document from later stages.
+    With processes, each thread hands its document to a pool of as many worker
+    processes, for CPU-bound stages; the function and its arguments must then pickle.
+    """
+    def __init__(self, name, function, workers=1, processes=False, initializer=None, initargs=()):
+        self.name = name
+        self.function = function
+        self.workers = workers
+        self.processes = processes
+        self.initializer = initializer
+        self.initargs = initargs
+
+class Pipeline:
+    """
+    Streams documents through a chain of stages connected by bounded queues and
+    checkpoints every stage result under work_dir/<stage>.jsonl.
+    """
+    def __init__(self, stages, work_dir, queue_size=64):
+        self.stages = stages
+        self.work_dir = work_dir
+        self.queues = [queue.Queue(maxsize=queue_size) for _ in stages]
+        self.checkpoints = [Checkpoint(os.path.join(work_dir, f"{stage.name}.jsonl")) for stage in stages]
+        self.errors = {stage.name: 0 for stage in stages}
+        self.errors_lock = threading.Lock()
+        # Set when a stage hits a FATAL_ERRORS exception, which run() then re-raises
+        self.stopping = threading.Event()
+        self.fatal = None
+
+    def _resume_point(self, doc_id):
+        """
+        Returns (index of the first stage still to run, its input), or None if the document is finished.
+        """
+        for i in range(len(self.stages) - 1, -1, -1):
+            if doc_id in self.checkpoints[i]:
+                result = self.checkpoints[i].get(doc_id)
+                if result is None or i == len(self.stages) - 1:
+                    return None
+                return i + 1, result
+        return 0, None
+
+    def _put(self, i, item):
+        """
+        Puts an item on a stage's queue, giving up (False) if the pipeline is stopping.
+        """
+        while not self.stopping.is_set():
+            try:
+                self.queues[i].put(item, timeout=POLL_INTERVAL)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def _get(self, i):
+        while not self.stopping.is_set():
+            try:
+                return self.queues[i].get(timeout=POLL_INTERVAL)
+            except queue.Empty:
+                pass
+        return STOP
+
+    def _worker(self, i, pbar, logger, executor=None):
+        stage = self.stages[i]
+        while True:
+            item = self._get(i)
+            if item is STOP:
+                return
+            doc_id, payload = item
+            try:
+                with metrics.timer(f"stage_{stage.name}"):
+                    if executor is not None:
+                        result = executor.submit(stage.function, doc_id, payload).result()
+                    else:
+                        result = stage.function(doc_id, payload)
+            except FATAL_ERRORS as e:
+                # Nothing is checkpointed, so a re-run starts the document at this stage again
+                logger.error(f"Stopping the pipeline in stage {stage.name} at {doc_id}: {e}")
+                self.fatal = e
+                self.stopping.set()
+                return
+            except Exception as e:
+                # Nothing is checkpointed, so a re-run retries the document at this stage
+                logger.error(f"Error in stage {stage.name} for {doc_id}: {e}")
+                with self.errors_lock:
+                    self.errors[stage.name] += 1
+                metrics.inc(f"{stage.name}_errors")
+                pbar.update(1)
+                continue
+            self.checkpoints[i].write(doc_id, result)
+            pbar.update(1)
+            if result is not None and i + 1 < len(self.stages):
+                self._put(i + 1, (doc_id, result))
+
+    def run(self, documents, logger):
+        """
+        Runs every (doc_id, source) through the pipeline. Documents that already have
+        checkpoints re-enter at their first incomplete stage with the stored result.
+        A FATAL_ERRORS exception in any stage stops every stage and is re-raised.
+        """
+        os.makedirs(self.work_dir, exist_ok=True)
+        for checkpoint in self.checkpoints:
+            checkpoint.load()
+            checkpoint.open()
+
+        # Process pools are spawned before any thread starts; a pool only starts its worker
+        # processes when tasks arrive, so one no-op per worker starts (and initializes) them all now
+        executors = [ProcessPoolExecutor(stage.workers, mp_context=multiprocessing.get_context('spawn'),
+                                         initializer=stage.initializer, initargs=stage.initargs) if stage.processes else None
+                     for stage in self.stages]
+        for stage, executor in zip(self.stages, executors):
+            if executor is not None:
+                wait([executor.submit(os.getpid) for _ in range(stage.workers)])
+        bars = [tqdm(desc=f"{stage.name:10}", unit=" docs", position=i) for i, stage in enumerate(self.stages)]
+        threads = []
+        for i, stage in enumerate(self.stages):
+            stage_threads = [threading.Thread(target=self._worker, args=(i, bars[i], logger, executors[i]), daemon=True)
+                             for _ in range(stage.workers)]
+            for thread in stage_threads:
+                thread.start()
+            threads.append(stage_threads)
+
+        finished = 0
+        try:
+            for doc_id, source in documents:
+                resume = self._resume_point(doc_id)
+                if resume is None:
+                    finished += 1
+                    continue
+                i, payload = resume
+                if not self._put(i, (doc_id, source if i == 0 else payload)):
+                    break
+
+            # Shut stages down in order, so every item reaches the end before the next stage stops
+            for i, stage in enumerate(self.stages):
+                for _ in range(stage.workers):
+                    self._put(i, STOP)
+                for thread in threads[i]:
+                    thread.join()
+        finally:
+            self.stopping.set()
+            for executor in executors:
+                if executor is not None:
+                    executor.shutdown(cancel_futures=True)
+            for bar in bars:
+                bar.close()
+            for checkpoint in self.checkpoints:
+                checkpoint.close()
+        if self.fatal is not None:
+            raise self.fatal
+        return finished
+
+def iter_documents(input_path):
+    """
+    Yields (doc_id, xml path) for a folder of XML files or a shard manifest. Articles
+    in tar archives are streamed out of them and yielded as (doc_id, (name, xml bytes)).
+    """
+    from memo import iter_input_files, is_input, is_archive, iter_archive, document_name
+    from splitFiles import read_manifest
+    if input_path.endswith('.txt'):
+        files = (file_path for file_path, size in read_manifest(input_path) if is_input(file_path))
+    else:
+        files = iter_input_files(input_path)
+    for file_path in files:
+        if is_archive(file_path):
+            for member_name, data in iter_archive(file_path):
+                yield document_name(member_name), (f"{file_path}:{member_name}", data)
+        else:
+            yield document_name(file_path), file_path
+
+def prepare_passage(article, max_chars=8000):
+    """
+    Builds the passage sent to the extraction model: title and abstract, or the start
+    of the body for articles without an abstract, with whitespace collapsed.
+    """
+    text = article['abstract'] or article['body'][:max_chars]
+    passage = ' '.join((article['title'] + ' ' + text).split())
+    return passage[:max_chars] or None
+
+# Error logger of a filter worker process
+_filter_logger = None
+
+def _init_filter_worker(log_dir, metrics_config=None):
+    global _filter_logger
+    from memo import setup_error_logging, get_nlp
+    _filter_logger = setup_error_logging(log_dir, suffix=f"_filter_{os.getpid()}")
+    if metrics_config:
+        metrics.configure(**metrics_config)
+    get_nlp()
+
+def filter_document(doc_id, source, max_chars=8000, logger=None):
+    """
+    Parses and filters one article and returns its prepared passage as {'input': passage},
+    or None if it is dropped. Only the passage is returned, so the filter checkpoint
+    never holds article bodies. source is an XML path or (name, xml bytes).
+    """
+    from memo import parse_xml_file, filter_articles
+    file_path, data = source if isinstance(source, tuple) else (source, None)
+    with metrics.document(doc_id):
+        article = parse_xml_file(file_path, logger or _filter_logger, data)
+        if not article or not filter_articles(article):
+            return None
+    passage = prepare_passage(article, max_chars)
+    return {'input': passage} if passage else None
+
+def load_ground_truth(file_path):
+    """
+    Loads {id: triples} from a JSONL file with "id" and "output" fields per line.
+    """
+    ground_truth = {}
+    with open(file_path, 'r', encoding='utf-8') as file:
+        for line in file:
+            if line.strip():
+                data = json.loads(line)
+                ground_truth[data['id']] = data['output']
+    return ground_truth
+
+def build_stages(runner, logger, ground_truth=None, normalizer=None, workers=None, max_chars=8000, log_dir=None):
+    """
+    Builds the filter -> extract -> evaluate stages; filter also prepares the passage.
+    The evaluate stage is left out when there is no ground truth. With more than one
+    filter worker, filtering (XML parsing and spaCy, CPU bound) runs in worker processes
+    that log to log_dir.
+    """
+    from multiBasicEval import calculate_confusion_lists
+    workers = workers or {}
+
+    def extract_stage(doc_id, data):
+        return runner.extract(data['input'])
+
+    def evaluate_stage(doc_id, record):
+        if doc_id not in ground_truth:
+            return {'tp': None, 'fp': None, 'fn': None}
+        true_positives, false_positives, false_negatives = calculate_confusion_lists(record['output'], ground_truth[doc_id], normalizer)
+        return {'tp': len(true_positives), 'fp': len(false_positives), 'fn': len(false_negatives)}
+
+    filter_workers = workers.get('filter', 1)
+    if filter_workers > 1:
+        filter_stage = Stage('filter', functools.partial(filter_document, max_chars=max_chars), filter_workers, processes=True,
+                             initializer=_init_filter_worker, initargs=(log_dir, metrics.current_config()))
+    else:
+        filter_stage = Stage('filter', functools.partial(filter_document, max_chars=max_chars, logger=logger))
+    stages = [
+        filter_stage,
+        Stage('extract', extract_stage, workers.get('extract', 8)),
+    ]
+    if ground_truth is not None:
+        stages.append(Stage('evaluate', evaluate_stage, workers.get('evaluate', 1)))
+    return stages
+
+def summarize(pipeline):
+    """
+    Prints how many documents each stage produced and, with ground truth, micro precision/recall.
+    """
+    for stage, checkpoint in zip(pipeline.stages, pipeline.checkpoints):
+        checkpoint.load()
+        print(f"{stage.name:10} {len(checkpoint.offsets):>8} checkpointed {pipeline.errors[stage.name]:>6} errors this run")
+    if pipeline.stages[-1].name != 'evaluate':
+        return
+    tp = fp = fn = 0
+    for doc_id, counts in pipeline.checkpoints[-1].items():
+        if counts['tp'] is not None:
+            tp, fp, fn = tp + counts['tp'], fp + counts['fp'], fn + counts['fn']
+    precision = tp / (tp + fp) if tp + fp > 0 else 0
+    recall = tp / (tp + fn) if tp + fn > 0 else 0
+    print(f"TP: {tp} FP: {fp} FN: {fn} Precision: {precision:.4f} Recall: {recall:.4f}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Run XML filtering, passage preparation, LLM extraction and evaluation as one streaming pipeline.')
+    parser.add_argument('input', type=str, help='Folder of XML files, or a shard manifest from splitFiles.py --manifest')
+    parser.add_argument('work_dir', type=str, help='Folder for per-stage checkpoints; re-running with the same folder resumes')
+    parser.add_argument('--prompt_file', type=str, required=True, help='Text file holding the prompt; the passage is appended to it')
+    parser.add_argument('--provider', type=str, default='openai', choices=['openai', 'groq'], help='API provider (default: openai)')
+    parser.add_argument('--model', type=str, default='gpt-4o', help='Model name (default: gpt-4o)')
+    parser.add_argument('--base_url', type=str, default=None, help='Base URL of an OpenAI-compatible server')
+    parser.add_argument('--ground_truth', type=str, default=None, help='JSONL with "id" and "output" per document; enables the evaluate stage')
+    parser.add_argument('--synonym_index', type=str, default=None, help='Synonym index built with synonymIndex.py, used when evaluating')
+    parser.add_argument('--filter_workers', type=int, default=1, help='Processes parsing and filtering articles with spaCy (default: 1, in-process)')
+    parser.add_argument('--extract_workers', type=int, default=8, help='Concurrent LLM requests (default: 8)')
+    parser.add_argument('--evaluate_workers', type=int, default=1, help='Threads scoring extractions (default: 1)')
+    parser.add_argument('--queue_size', type=int, default=64, help='Maximum documents waiting between two stages (default: 64)')
+    parser.add_argument('--max_chars', type=int, default=8000, help='Maximum passage length in characters (default: 8000)')
+    metrics.add_arguments(parser)
+    tokenBudget.add_arguments(parser)
+
+    args = parser.parse_args(argv)
+
+    metrics.configure_from_args(args)
+    from memo import setup_error_logging
+    from extractionRunner import ExtractionRunner, create_client
+    from synonymIndex import SynonymIndex, TripleNormalizer
+
+    os.makedirs(args.work_dir, exist_ok=True)
+    logger = setup_error_logging(args.work_dir, "_pipeline")
+    with open(args.prompt_file, 'r', encoding='utf-8') as file:
+        prompt = file.read()
+    budget = tokenBudget.budget_from_args(args)
+    runner = ExtractionRunner(args.model, None, None, prompt, create_client(args.provider, base_url=args.base_url), budget, args.spend_cap)
+    ground_truth = load_ground_truth(args.ground_truth) if args.ground_truth else None
+    normalizer = TripleNormalizer(SynonymIndex(args.synonym_index) if args.synonym_index else None)
+    workers = {'filter': args.filter_workers, 'extract': args.extract_workers, 'evaluate': args.evaluate_workers}
+
+    stages = build_stages(runner, logger, ground_truth, normalizer, workers, args.max_chars, args.work_dir)
+    pipeline = Pipeline(stages, args.work_dir, args.queue_size)
+    try:
+        finished = pipeline.run(iter_documents(args.input), logger)
+    except SpendCapExceeded as e:
+        print(f"Stopped: {e}")
+        summarize(pipeline)
+        sys.exit(1)
+    print(f"{finished} documents were already complete")
+    summarize(pipeline)
+
+if __name__ == '__main__':
+    main()
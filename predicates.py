@@ -0,0 +1,95 @@
+import re
+
+# The 15 canonical predicates used in every extraction prompt
+PREDICATES = [
+    "Environmental processes",
+    "Biological processes",
+    "Industrial processes",
+    "Adverse biological roles",
+    "Normal biological roles",
+    "Environmental roles",
+    "Industrial applications",
+    "Low concentration Health effect",
+    "High concentration Health effect",
+    "No Exposure Health effect",
+    "Exposure Health effect",
+    "Organoleptic effects",
+    "Sources",
+    "Biological locations",
+    "Routes of exposure",
+]
+
+# Definitions given for each predicate in the extraction prompts
+PREDICATE_DEFINITIONS = {
+    "Environmental processes": "A series of events that occur naturally in the environment and not within an organism",
+    "Biological processes": "Naturally-occurring molecular events or a series thereof, leading to a known function or end-product",
+    "Industrial processes": "A series of molecular events that involve at least one synthetic reaction.",
+    "Adverse biological roles": "The biological function of a chemical that results in harmful effect for an organism. This can include biochemical effects of non-endogenous chemicals, which are also assigned an industrial application such as pharmaceuticals",
+    "Normal biological roles": "The biological function of a chemical. The biological role answers the question how a chemical is involved in molecular processes in an organism. This can include biochemical effects of non-endogenous chemicals, which are also assigned an industrial application such as pharmaceuticals. The biological role is limited to cellular levels, and will not include role at system process level, such as a chemical which has a role in a disease",
+    "Environmental roles": "A direct or indirect function of chemical product or process which affect the components of the environment",
+    "Industrial applications": "The assumed function of a chemical is utilized in any kind of industry, including agriculture, pharmaceutical, medical, and construction",
+    "Low concentration Health effect": "low concentration of chemical effect to humans",
+    "High concentration Health effect": "high concentration of chemical effect to humans",
+    "No Exposure Health effect": "having none of this chemicals effect to humans",
+    "Exposure Health effect": "if exposed to chemical effect to humans",
+    "Organoleptic effects": "Human sensual perception of chemical stimuli",
+    "Sources": "Natural or synthetic origin of a chemical",
+    "Biological locations": "The physiological origin within an organism, including anatomical components, biofluids and excreta",
+    "Routes of exposure": "A mean by which a chemical agent comes in contact with an organism, either under intended or unintended circumstances",
+}
+
+# JSON schema of a constrained extraction answer: a list of [subject, predicate, object]
+# with the predicate restricted to the 15 canonical ones. Servers that compile schemas
+# into grammars (vLLM, llama.cpp, Ollama) can only emit outputs that validate against it.
+TRIPLE_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "triples": {
+            "type": "array",
+            "items": {
+                "type": "array",
+                "prefixItems": [{"type": "string"}, {"enum": PREDICATES}, {"type": "string"}],
+                "items": False,
+                "minItems": 3,
+                "maxItems": 3,
+            },
+        },
+    },
+    "required": ["triples"],
+    "additionalProperties": False,
+}
+
+# Spellings that appear in the prompt examples but are not a simple plural/casing variant
+PREDICATE_ALIASES = {
+    "no concentration health effect": "No Exposure Health effect",
+    "organoleptic properties": "Organoleptic effects",
+}
+
+_WHITESPACE = re.compile(r"\s+")
+
+def _singular(word):
+    """
+    Strips a trailing plural from a single lowercase word.
+    """
+    if word.endswith("sses"):
+        return word[:-2]
+    if word.endswith("s") and not word.endswith("ss"):
+        return word[:-1]
+    return word
+
+def predicate_key(predicate):
+    """
+    Reduces a predicate to a case, whitespace and plural insensitive lookup key.
+    """
+    words = _WHITESPACE.sub(" ", predicate.strip().lower()).split(" ")
+    return " ".join(_singular(word) for word in words)
+
+_CANONICAL = {predicate_key(predicate): predicate for predicate in PREDICATES}
+for alias, predicate in PREDICATE_ALIASES.items():
+    _CANONICAL[predicate_key(alias)] = predicate
+
+def canonical_predicate(predicate):
+    """
+    Maps a predicate onto one of the 15 canonical predicates, or returns None if it is off-list.
+    """
+    return _CANONICAL.get(predicate_key(predicate))
@@ -1,36 +1,186 @@
 import os
+import re
+import sys
+import json
+import time
+import argparse
 import subprocess
-#only doing first 8 1 -8 
-#TODO
-#DO 1-8   9-16,  17-24, 25-32
-#range 1-7 9-15, 17-23, 25-31
-
-#missing 8,16,24,32 --> for the last run do 24-33  
-# List of XML directory paths
-xml_folders = [f"/mnt/data1/kjsidhu/filtered_results/split_{i}" for i in range(24, 33)]
-xml_folders.append("/mnt/data1/kjsidhu/filtered_results/split_8")
-xml_folders.append("/mnt/data1/kjsidhu/filtered_results/split_16")
+from datetime import datetime
+from memoryStats import available_memory
+
+# Folder holding the split_N directories from splitFiles.py (or the shard_N.txt manifests from
+# `python splitFiles.py <xml_dir> <manifest_dir> --manifest`); every split found there is a job.
+# Finished splits are tracked in the state file, so nothing needs hand-editing between runs.
+split_root = "/mnt/data1/kjsidhu/filtered_results"
+# split_root = "/mnt/data1/kjsidhu/manifests"
 # Define the shared output and stderr folders
 output_folder = "/mnt/data1/kjsidhu/Chemical_filtered_jsons"
 stderr_folder = "/mnt/data1/kjsidhu/memoSTDERR"
+log_folder = "/mnt/data1/kjsidhu/memoLogs"
+state_file = "/mnt/data1/kjsidhu/memoLogs/runparllel_state.json"
+
+# Each memo.py process holds the spaCy model plus one XML document of up to 50 MB
+MEMORY_PER_JOB = 3 * 1024 ** 3
+MAX_RETRIES = 3
+BACKOFF_SECONDS = 30
+POLL_SECONDS = 2
+
+def default_max_parallel():
+    """
+    Bounds concurrency by both CPU cores and the memory currently available.
+    """
+    by_memory = max(1, available_memory() // MEMORY_PER_JOB)
+    return max(1, min(os.cpu_count() or 1, by_memory))
+
+def load_state(path):
+    if os.path.exists(path):
+        with open(path, 'r') as file:
+            return json.load(file)
+    return {}
+
+def save_state(path, state):
+    """
+    Writes the job state atomically so a crash never leaves a truncated file.
+    """
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as file:
+        json.dump(state, file, indent=4)
+    os.replace(tmp_path, path)
+
+def job_name(xml_folder):
+    return os.path.splitext(os.path.basename(os.path.normpath(xml_folder)))[0]
+
+def find_jobs(root):
+    """
+    The split_N folders and shard_N.txt manifests that exist under root, in split order.
+    """
+    names = [name for name in os.listdir(root) if re.fullmatch(r'(split_\d+|shard_\d+\.txt)', name)]
+    names.sort(key=lambda name: int(re.search(r'\d+', name).group()))
+    return [os.path.join(root, name) for name in names]
+
+def has_output(xml_folder, output_folder):
+    """
+    Whether memo.py already wrote output for every document of the split. Splits run before
+    the state file existed leave no other trace; a split that crashed part way through is
+    not complete, and neither is one holding archives, whose articles are not known up front.
+    """
+    from memo import iter_input_files, is_input, is_archive, document_name
+    from splitFiles import read_manifest
+    if xml_folder.endswith(".txt"):
+        files = [file_path for file_path, size in read_manifest(xml_folder) if is_input(file_path)]
+    else:
+        files = list(iter_input_files(xml_folder))
+    if not files or any(is_archive(file_path) for file_path in files):
+        return False
+    return all(os.path.exists(os.path.join(output_folder, f"{document_name(file_path)}.json")) for file_path in files)
 
-def run_script(xml_folder, output_folder, stderr_folder):
+def run_script(xml_folder, output_folder, stderr_folder, log_file):
     # Command to run your initial script
-    command = f"python3 memo.py {xml_folder} {output_folder} {stderr_folder}"
-    # Start the subprocess and return the process handle
-    return subprocess.Popen(command, shell=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    command = [sys.executable, "memo.py"]
+    if xml_folder.endswith(".txt"):
+        command += ["--manifest", xml_folder, output_folder, stderr_folder]
+    else:
+        command += [xml_folder, output_folder, stderr_folder]
+    # Stream the child's output straight to its log file so full pipes can never block it
+    return subprocess.Popen(command, stdout=log_file, stderr=subprocess.STDOUT)
+
+def schedule(jobs, max_parallel, max_retries=MAX_RETRIES, backoff=BACKOFF_SECONDS, check_output=True):
+    """
+    Runs memo.py over every job with at most max_parallel children at once, retrying
+    failures with exponential backoff and recording job state after every change.
+    With check_output, a job the state file does not know yet is recorded as done
+    if every one of its documents already has output.
+    """
+    os.makedirs(output_folder, exist_ok=True)
+    os.makedirs(stderr_folder, exist_ok=True)
+    os.makedirs(log_folder, exist_ok=True)
+
+    state = load_state(state_file)
+    for xml_folder in jobs:
+        if xml_folder not in state and check_output and has_output(xml_folder, output_folder):
+            state[xml_folder] = {"status": "done", "attempts": 0, "inferred": True}
+            print(f"Output already exists, skipping: {xml_folder}")
+        entry = state.setdefault(xml_folder, {"status": "pending", "attempts": 0})
+        # Jobs that were running when the scheduler died, or that ran out of retries, are started again
+        if entry["status"] == "failed":
+            entry["attempts"] = 0
+        if entry["status"] in ("running", "failed"):
+            entry["status"] = "pending"
+    save_state(state_file, state)
+
+    queue = [xml_folder for xml_folder in jobs if state[xml_folder]["status"] == "pending"]
+    not_before = {}
+    running = {}
+    print(f"{len(queue)} of {len(jobs)} jobs to run, up to {max_parallel} at a time")
+
+    while queue or running:
+        # Reap finished children
+        for xml_folder, (process, log_file) in list(running.items()):
+            if process.poll() is None:
+                continue
+            log_file.close()
+            del running[xml_folder]
+            entry = state[xml_folder]
+            entry["returncode"] = process.returncode
+            entry["finished"] = datetime.now().isoformat(timespec='seconds')
+            if process.returncode == 0:
+                entry["status"] = "done"
+                print(f"Process completed successfully: {xml_folder}")
+            elif entry["attempts"] <= max_retries:
+                entry["status"] = "pending"
+                delay = backoff * 2 ** (entry["attempts"] - 1)
+                not_before[xml_folder] = time.time() + delay
+                queue.append(xml_folder)
+                print(f"Error in process: {xml_folder} (exit {process.returncode}), retrying in {delay}s; see {entry['log']}")
+            else:
+                entry["status"] = "failed"
+                print(f"Error in process: {xml_folder} (exit {process.returncode}), giving up after {entry['attempts']} attempts; see {entry['log']}")
+            save_state(state_file, state)
+
+        # Start ready jobs while there are free slots
+        now = time.time()
+        for xml_folder in list(queue):
+            if len(running) >= max_parallel:
+                break
+            if not_before.get(xml_folder, 0) > now:
+                continue
+            queue.remove(xml_folder)
+            entry = state[xml_folder]
+            entry["attempts"] += 1
+            entry["status"] = "running"
+            entry["started"] = datetime.now().isoformat(timespec='seconds')
+            entry["log"] = os.path.join(log_folder, f"{job_name(xml_folder)}.attempt{entry['attempts']}.log")
+            log_file = open(entry["log"], 'w')
+            running[xml_folder] = (run_script(xml_folder, output_folder, stderr_folder, log_file), log_file)
+            save_state(state_file, state)
+
+        time.sleep(POLL_SECONDS)
+
+def print_status(jobs):
+    """
+    Shows the state of every job and which shards remain.
+    """
+    state = load_state(state_file)
+    counts = {}
+    for xml_folder in jobs:
+        entry = state.get(xml_folder, {"status": "pending", "attempts": 0})
+        counts[entry["status"]] = counts.get(entry["status"], 0) + 1
+        print(f"{job_name(xml_folder):20} {entry['status']:8} attempts={entry['attempts']} {entry.get('log', '')}")
+    print()
+    print(", ".join(f"{status}: {count}" for status, count in sorted(counts.items())))
+    remaining = [job_name(xml_folder) for xml_folder in jobs if state.get(xml_folder, {}).get("status") != "done"]
+    print(f"Remaining: {' '.join(remaining) if remaining else 'none'}")
 
 if __name__ == "__main__":
-    processes = []
-
-    # Start all processes
-    for xml_folder in xml_folders:
-        processes.append(run_script(xml_folder, output_folder, stderr_folder))
-
-    # Wait for all processes to complete and capture outputs
-    for process in processes:
-        stdout, stderr = process.communicate()
-        if process.returncode != 0:
-            print(f"Error in process: {process.args}\n{stderr.decode('utf-8')}")
-        else:
-            print(f"Process completed successfully: {process.args}\n{stdout.decode('utf-8')}")
+    parser = argparse.ArgumentParser(description='Run memo.py over every split with bounded concurrency and retries.')
+    parser.add_argument('command', nargs='?', default='run', choices=['run', 'status'], help='Run the pending jobs or show job status (default: run)')
+    parser.add_argument('--max_parallel', type=int, default=None, help='Maximum concurrent memo.py processes (default: based on cores and available memory)')
+    parser.add_argument('--max_retries', type=int, default=MAX_RETRIES, help=f'Retries per failed job (default: {MAX_RETRIES})')
+    parser.add_argument('--ignore_output', action='store_true', help='Run splits missing from the state file even if all their documents already have output')
+    args = parser.parse_args()
+
+    xml_folders = find_jobs(split_root)
+    if args.command == 'status':
+        print_status(xml_folders)
+    else:
+        schedule(xml_folders, args.max_parallel or default_max_parallel(), args.max_retries, check_output=not args.ignore_output)
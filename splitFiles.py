@@ -1,18 +1,32 @@
 import os
+import json
+import heapq
+import errno
 import shutil
+import hashlib
 import argparse
-from math import ceil
+import threading
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
 from tqdm import tqdm
 
-def gather_all_files(input_dir):
+JOURNAL_NAME = '.split_journal.jsonl'
+
+def scan_files(input_dir, exclude_dir=None):
     """
-    Gathers all files from the input directory and its subdirectories.
+    Streams (path, size) for every file under the input directory using os.scandir,
+    without materialising the whole tree first.
     """
-    all_files = []
-    for root, dirs, files in os.walk(input_dir):
-        for file in files:
-            all_files.append(os.path.join(root, file))
-    return all_files
+    exclude_dir = os.path.abspath(exclude_dir) if exclude_dir else None
+    stack = [input_dir]
+    while stack:
+        current = stack.pop()
+        with os.scandir(current) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    if exclude_dir is None or os.path.abspath(entry.path) != exclude_dir:
+                        stack.append(entry.path)
+                elif entry.is_file(follow_symlinks=False):
+                    yield entry.path, entry.stat(follow_symlinks=False).st_size
 
 def create_output_directories(output_dir, num_splits):
     """
@@ -25,38 +39,251 @@ def create_output_directories(output_dir, num_splits):
         output_dirs.append(dir_path)
     return output_dirs
 
-def distribute_files(all_files, output_dirs):
+class SizeBalancer:
     """
-    Distributes files evenly across the output directories.
+    Online bin packing: every file goes to the split with the fewest bytes so far.
     """
-    num_files = len(all_files)
-    num_dirs = len(output_dirs)
-    files_per_dir = ceil(num_files / num_dirs)
-    
-    with tqdm(total=num_files, desc="Distributing files") as pbar:
-        for i, file_path in enumerate(all_files):
-            dest_dir = output_dirs[i // files_per_dir]
-            shutil.move(file_path, dest_dir)
-            pbar.update(1)
+    def __init__(self, num_splits, loads=None):
+        loads = loads or [0] * num_splits
+        self.heap = [(load, i) for i, load in enumerate(loads)]
+        heapq.heapify(self.heap)
+
+    def assign(self, file_path, size):
+        load, i = heapq.heappop(self.heap)
+        heapq.heappush(self.heap, (load + size, i))
+        return i
+
+class HashBalancer:
+    """
+    Stable assignment from a hash of the file name, independent of walk order.
+    """
+    def __init__(self, num_splits, loads=None):
+        self.num_splits = num_splits
 
+    def assign(self, file_path, size):
+        digest = hashlib.blake2b(os.path.basename(file_path).encode('utf-8'), digest_size=8).digest()
+        return int.from_bytes(digest, 'little') % self.num_splits
 
-def split_directory(input_dir, output_dir, num_splits=32):
+BALANCERS = {'size': SizeBalancer, 'hash': HashBalancer}
+
+def move_file(src, dst):
+    """
+    Moves a file without ever overwriting the destination: a hard link plus an unlink
+    when source and destination share a filesystem, a checked copy otherwise. Raises
+    FileExistsError if dst is taken by another file.
+    """
+    try:
+        os.link(src, dst)
+    except FileExistsError:
+        # A move interrupted between link and unlink left both names on the same file
+        if not os.path.samefile(src, dst):
+            raise
+    except OSError as e:
+        if e.errno not in (errno.EXDEV, errno.EPERM, errno.ENOTSUP, errno.EOPNOTSUPP):
+            raise
+        # Another filesystem, or one without hard links
+        if os.path.lexists(dst):
+            raise FileExistsError(errno.EEXIST, f"Refusing to overwrite {dst}", dst)
+        shutil.move(src, dst)
+        return
+    os.unlink(src)
+
+def unique_destination(directory, file_name, claimed):
+    """
+    Path for file_name in directory that no other file has taken or been assigned:
+    a second x.xml becomes x_2.xml, a third x_3.xml, and so on.
+    """
+    stem, dot, extension = file_name.partition('.')
+    dst = os.path.join(directory, file_name)
+    n = 1
+    while dst in claimed or os.path.lexists(dst):
+        n += 1
+        dst = os.path.join(directory, f"{stem}_{n}{dot}{extension}")
+    claimed.add(dst)
+    return dst
+
+class Journal:
+    """
+    Append-only record of planned and completed moves, so an interrupted split can be
+    resumed or rolled back. Each move is logged as 'plan' before it starts and 'done' after.
+    """
+    def __init__(self, journal_path):
+        self.path = journal_path
+        self.lock = threading.Lock()
+        self.file = None
+
+    def load(self):
+        """
+        Returns {src: entry} for every planned move, with entry['done'] set for completed ones.
+        """
+        moves = {}
+        if not os.path.exists(self.path):
+            return moves
+        with open(self.path, 'r', encoding='utf-8') as file:
+            for line in file:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # A crash can leave a partial last line
+                    continue
+                if entry['op'] == 'plan':
+                    moves[entry['src']] = {'dst': entry['dst'], 'split': entry['split'], 'size': entry['size'], 'done': False}
+                elif entry['op'] == 'done' and entry['src'] in moves:
+                    moves[entry['src']]['done'] = True
+        return moves
+
+    def open(self):
+        self.file = open(self.path, 'a', encoding='utf-8')
+
+    def write(self, entry):
+        with self.lock:
+            self.file.write(json.dumps(entry) + '\n')
+            self.file.flush()
+
+    def close(self):
+        if self.file:
+            self.file.close()
+            self.file = None
+
+def distribute_files(files, output_dirs, journal, strategy='size', workers=16, pending=None, loads=None):
+    """
+    Assigns streamed files to splits and moves them with a thread pool, journaling every
+    move. Files with the same name in one split get unique names (see unique_destination).
+    """
+    balancer = BALANCERS[strategy](len(output_dirs), loads)
+    claimed = set(dst for src, dst in (pending or []))
+    max_in_flight = workers * 64
+    in_flight = set()
+
+    def do_move(src, dst):
+        move_file(src, dst)
+        journal.write({'op': 'done', 'src': src})
+
+    def submit(executor, src, dst):
+        while len(in_flight) >= max_in_flight:
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                in_flight.discard(future)
+                future.result()
+                pbar.update(1)
+        in_flight.add(executor.submit(do_move, src, dst))
+
+    with ThreadPoolExecutor(max_workers=workers) as executor, tqdm(desc="Distributing files", unit=" files") as pbar:
+        # Finish moves that were planned before an interruption
+        for src, dst in (pending or []):
+            submit(executor, src, dst)
+
+        for file_path, size in files:
+            split = balancer.assign(file_path, size)
+            dst = unique_destination(output_dirs[split], os.path.basename(file_path), claimed)
+            journal.write({'op': 'plan', 'src': file_path, 'dst': dst, 'split': split, 'size': size})
+            submit(executor, file_path, dst)
+
+        for future in in_flight:
+            future.result()
+            pbar.update(1)
+
+def split_directory(input_dir, output_dir, num_splits=32, strategy='size', workers=16, resume=False):
     """
     Splits the input directory into the specified number of output directories.
     """
-    all_files = gather_all_files(input_dir)
     output_dirs = create_output_directories(output_dir, num_splits)
-    distribute_files(all_files, output_dirs)
+    journal = Journal(os.path.join(output_dir, JOURNAL_NAME))
+
+    moves = journal.load()
+    if moves and not resume:
+        raise RuntimeError(f"Found an unfinished split journal at {journal.path}; use --resume or --rollback")
+
+    # Rebuild split loads and the moves that were planned but never completed
+    loads = [0] * num_splits
+    pending = []
+    for src, entry in moves.items():
+        loads[entry['split']] += entry['size']
+        # A planned move whose source is gone already completed before the crash
+        if not entry['done'] and os.path.exists(src):
+            pending.append((src, entry['dst']))
+
+    journal.open()
+    try:
+        files = (item for item in scan_files(input_dir, exclude_dir=output_dir) if item[0] not in moves)
+        distribute_files(files, output_dirs, journal, strategy, workers, pending, loads)
+    finally:
+        journal.close()
+    os.remove(journal.path)
+
+def write_manifests(input_dir, output_dir, num_splits=32):
+    """
+    Writes one manifest per shard listing file paths and sizes, instead of moving files.
+    Shards are balanced by total bytes: files are placed largest first onto the lightest shard.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    files = list(tqdm(scan_files(input_dir), desc="Scanning files", unit=" files"))
+    files.sort(key=lambda item: item[1], reverse=True)
+
+    balancer = SizeBalancer(num_splits)
+    shards = [[] for _ in range(num_splits)]
+    for file_path, size in files:
+        shards[balancer.assign(file_path, size)].append((file_path, size))
+
+    manifest_paths = []
+    for i, shard in enumerate(shards):
+        manifest_path = os.path.join(output_dir, f'shard_{i+1}.txt')
+        with open(manifest_path, 'w', encoding='utf-8') as file:
+            for file_path, size in shard:
+                file.write(f"{os.path.abspath(file_path)}\t{size}\n")
+        manifest_paths.append(manifest_path)
+        print(f"{manifest_path}: {len(shard)} files, {sum(size for _, size in shard)} bytes")
+    return manifest_paths
+
+def read_manifest(manifest_path):
+    """
+    Yields (path, size) for every file listed in a shard manifest.
+    """
+    with open(manifest_path, 'r', encoding='utf-8') as file:
+        for line in file:
+            line = line.rstrip('\n')
+            if line:
+                file_path, size = line.rsplit('\t', 1)
+                yield file_path, int(size)
+
+def rollback_split(output_dir, workers=16):
+    """
+    Moves every file recorded in the journal back to where it came from.
+    """
+    journal = Journal(os.path.join(output_dir, JOURNAL_NAME))
+    moves = journal.load()
+
+    def undo(src, dst):
+        if os.path.exists(dst):
+            os.makedirs(os.path.dirname(src), exist_ok=True)
+            move_file(dst, src)
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(undo, src, entry['dst']) for src, entry in moves.items()]
+        for future in tqdm(futures, desc="Rolling back", unit=" files"):
+            future.result()
+    if os.path.exists(journal.path):
+        os.remove(journal.path)
 
-def main():
+def main(argv=None):
     parser = argparse.ArgumentParser(description='Split a directory into evenly distributed subdirectories.')
     parser.add_argument('input_dir', type=str, help='Path to the input directory')
     parser.add_argument('output_dir', type=str, help='Path to the output directory')
     parser.add_argument('--num_splits', type=int, default=32, help='Number of splits (default: 32)')
+    parser.add_argument('--strategy', type=str, default='size', choices=sorted(BALANCERS), help='Balance splits by total bytes or by a stable hash of the file name (default: size)')
+    parser.add_argument('--workers', type=int, default=16, help='Number of concurrent move threads (default: 16)')
+    parser.add_argument('--resume', action='store_true', help='Resume an interrupted split from its journal')
+    parser.add_argument('--rollback', action='store_true', help='Undo an interrupted split using its journal')
+    parser.add_argument('--manifest', action='store_true', help='Write shard_N.txt manifests to the output directory instead of moving files')
 
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
 
-    split_directory(args.input_dir, args.output_dir, args.num_splits)
+    if args.manifest:
+        write_manifests(args.input_dir, args.output_dir, args.num_splits)
+    elif args.rollback:
+        rollback_split(args.output_dir, args.workers)
+    else:
+        split_directory(args.input_dir, args.output_dir, args.num_splits, args.strategy, args.workers, args.resume)
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,170 @@
+import os
+import re
+import mmap
+import struct
+import hashlib
+import argparse
+from tqdm import tqdm
+from predicates import canonical_predicate
+
+# File layout: header, open-addressing slot table, then length-prefixed UTF-8 strings.
+# Every slot is (key hash, key offset, canonical offset); a zero key offset marks an empty slot.
+MAGIC = b"FFSYNIDX"
+HEADER = struct.Struct("<8sQ")
+SLOT = struct.Struct("<QQQ")
+LENGTH = struct.Struct("<I")
+LOAD_FACTOR = 0.5
+
+_WHITESPACE = re.compile(r"\s+")
+
+def normalize_name(name):
+    """
+    Reduces a chemical name to the case and whitespace insensitive key stored in the index.
+    """
+    return _WHITESPACE.sub(" ", name.strip()).casefold()
+
+def _hash(key):
+    """
+    Stable 64-bit hash of an index key (Python's hash() is salted per process).
+    """
+    return int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest(), "little")
+
+def read_dictionary(dictionary_path):
+    """
+    Reads a synonym dictionary where each line is: canonical name <TAB> synonym <TAB> synonym ...
+    The canonical name is also indexed as a synonym of itself.
+    """
+    with open(dictionary_path, "r", encoding="utf-8") as file:
+        for line in file:
+            names = [name for name in line.rstrip("\n").split("\t") if name.strip()]
+            if not names:
+                continue
+            canonical = names[0].strip()
+            for name in names:
+                yield normalize_name(name), canonical
+
+def build_index(dictionary_path, index_path):
+    """
+    Builds the memory-mappable synonym index from a dictionary file. This is done offline once.
+    When a synonym is listed under several canonical names, the first one wins.
+    """
+    mapping = {}
+    for key, canonical in tqdm(read_dictionary(dictionary_path), desc="Reading synonyms", unit=" names"):
+        mapping.setdefault(key, canonical)
+
+    num_slots = 1
+    while num_slots * LOAD_FACTOR < max(len(mapping), 1):
+        num_slots *= 2
+
+    strings_start = HEADER.size + num_slots * SLOT.size
+    blob = bytearray()
+    string_offsets = {}
+
+    def add_string(text):
+        if text not in string_offsets:
+            encoded = text.encode("utf-8")
+            string_offsets[text] = strings_start + len(blob)
+            blob.extend(LENGTH.pack(len(encoded)))
+            blob.extend(encoded)
+        return string_offsets[text]
+
+    table = bytearray(num_slots * SLOT.size)
+    mask = num_slots - 1
+    for key, canonical in tqdm(mapping.items(), desc="Building index", unit=" names"):
+        key_hash = _hash(key)
+        slot = key_hash & mask
+        # Linear probing until a free slot is found
+        while SLOT.unpack_from(table, slot * SLOT.size)[1]:
+            slot = (slot + 1) & mask
+        SLOT.pack_into(table, slot * SLOT.size, key_hash, add_string(key), add_string(canonical))
+
+    tmp_path = index_path + ".tmp"
+    with open(tmp_path, "wb") as file:
+        file.write(HEADER.pack(MAGIC, num_slots))
+        file.write(table)
+        file.write(blob)
+    os.replace(tmp_path, index_path)
+    print(f"Indexed {len(mapping)} synonyms into {index_path}")
+
+class SynonymIndex:
+    """
+    Read-only view of a synonym index. The file is memory-mapped, so opening it is
+    instant and the pages are shared between processes; each lookup is O(1).
+    """
+    def __init__(self, index_path):
+        self.file = open(index_path, "rb")
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.num_slots = HEADER.unpack_from(self.data, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{index_path} is not a synonym index")
+        self.mask = self.num_slots - 1
+
+    def _read_string(self, offset):
+        length = LENGTH.unpack_from(self.data, offset)[0]
+        start = offset + LENGTH.size
+        return self.data[start:start + length].decode("utf-8")
+
+    def lookup(self, name):
+        """
+        Returns the canonical name for a synonym, or None if it is not in the index.
+        """
+        key = normalize_name(name)
+        key_hash = _hash(key)
+        slot = key_hash & self.mask
+        while True:
+            slot_hash, key_offset, canonical_offset = SLOT.unpack_from(self.data, HEADER.size + slot * SLOT.size)
+            if key_offset == 0:
+                return None
+            if slot_hash == key_hash and self._read_string(key_offset) == key:
+                return self._read_string(canonical_offset)
+            slot = (slot + 1) & self.mask
+
+    def canonical(self, name):
+        """
+        Returns the canonical name for a synonym, or the name itself if it is unknown.
+        """
+        return self.lookup(name) or name
+
+    def close(self):
+        self.data.close()
+        self.file.close()
+
+class TripleNormalizer:
+    """
+    Normalises triples before matching: subjects through the synonym index (if given),
+    predicates onto the 15 canonical predicates.
+    """
+    def __init__(self, synonym_index=None):
+        self.synonym_index = synonym_index
+
+    def normalize(self, triple):
+        subject, predicate, obj = triple
+        if self.synonym_index is not None:
+            subject = self.synonym_index.canonical(subject)
+        predicate = canonical_predicate(predicate) or predicate
+        return [subject, predicate, obj]
+
+def main():
+    parser = argparse.ArgumentParser(description='Build or query a memory-mapped chemical synonym index.')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    build_parser = subparsers.add_parser('build', help='Build the index from a tab-separated synonym dictionary')
+    build_parser.add_argument('dictionary', type=str, help='Dictionary file: canonical name, then synonyms, tab separated')
+    build_parser.add_argument('index', type=str, help='Path to write the index to')
+
+    lookup_parser = subparsers.add_parser('lookup', help='Look up the canonical name of one or more synonyms')
+    lookup_parser.add_argument('index', type=str, help='Path to the index')
+    lookup_parser.add_argument('names', type=str, nargs='+', help='Names to look up')
+
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        build_index(args.dictionary, args.index)
+    else:
+        index = SynonymIndex(args.index)
+        for name in args.names:
+            print(f"{name}\t{index.lookup(name)}")
+        index.close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+import os
+import json
+import random
+import argparse
+from xml.sax.saxutils import escape
+from tqdm import tqdm
+
+CHEMICALS = [
+    "benzene", "toluene", "formaldehyde", "arsenic", "cadmium", "lead acetate", "bisphenol A",
+    "acetaminophen", "caffeine", "ethanol", "glyphosate", "chlorpyrifos", "mercury chloride",
+    "sodium fluoride", "nicotine", "cisplatin", "paraquat", "atrazine", "triclosan", "vinyl chloride",
+]
+DISEASES = [
+    "hepatotoxicity", "nephrotoxicity", "leukemia", "asthma", "contact dermatitis", "neuropathy",
+    "oxidative stress", "hypertension", "anemia", "insomnia",
+]
+SOURCES = ["tobacco smoke", "drinking water", "industrial effluent", "coffee beans", "treated wood", "pesticide residue"]
+LOCATIONS = ["liver", "kidney", "blood", "urine", "adipose tissue", "brain"]
+FILLER = (
+    "Samples were collected in triplicate and analysed by high performance liquid chromatography. "
+    "Statistical significance was assessed with a two-tailed t-test at p < 0.05. "
+    "The spectrometer was calibrated before each acquisition and data were processed with standard software. "
+    "Participants were recruited from outpatient clinics between 2015 and 2019. "
+)
+
+# Sentence templates and the triple each one states
+TEMPLATES = [
+    ("Exposure to {chemical} caused {disease} in the exposed cohort.", "{chemical}", "Exposure Health effect", "{disease}"),
+    ("High doses of {chemical} were associated with {disease}.", "{chemical}", "High concentration Health effect", "{disease}"),
+    ("{chemical} is commonly found in {source}.", "{chemical}", "Sources", "{source}"),
+    ("{chemical} accumulated in the {location} of treated animals.", "{chemical}", "Biological locations", "{location}"),
+]
+
+def make_passage(rng, num_facts, filler_sentences):
+    """
+    Returns a passage and the triples it states. Facts are interleaved with
+    methods-style boilerplate so the filter and extractor see realistic noise.
+    """
+    sentences = []
+    triples = []
+    for _ in range(num_facts):
+        template, subject, predicate, obj = rng.choice(TEMPLATES)
+        values = {"chemical": rng.choice(CHEMICALS), "disease": rng.choice(DISEASES),
+                  "source": rng.choice(SOURCES), "location": rng.choice(LOCATIONS)}
+        sentence = template.format(**values)
+        sentences.append(sentence[0].upper() + sentence[1:])
+        triples.append([subject.format(**values), predicate, obj.format(**values)])
+    filler = [sentence + "." for sentence in FILLER.split(". ") if sentence.strip(". ")]
+    for _ in range(filler_sentences):
+        sentences.insert(rng.randrange(len(sentences) + 1), rng.choice(filler).strip())
+    return " ".join(sentences), triples
+
+def make_article(rng, doc_id, body_paragraphs):
+    abstract, triples = make_passage(rng, rng.randint(2, 5), 2)
+    paragraphs = [make_passage(rng, rng.randint(0, 3), 6)[0] for _ in range(body_paragraphs)]
+    title = f"Effects of {rng.choice(CHEMICALS)} on {rng.choice(DISEASES)} (synthetic article {doc_id})"
+    body = "".join(f"<sec><title>Section {i + 1}</title><p>{escape(paragraph)}</p></sec>" for i, paragraph in enumerate(paragraphs))
+    xml = (
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        '<article xmlns:xlink="http://www.w3.org/1999/xlink" xmlns:mml="http://www.w3.org/1998/Math/MathML">'
+        f'<front><article-meta><title-group><article-title>{escape(title)}</article-title></title-group>'
+        f'<abstract><p>{escape(abstract)}</p></abstract></article-meta></front>'
+        f'<body>{body}</body></article>\n'
+    )
+    return xml, abstract, triples
+
+def generate(output_dir, num_docs, body_paragraphs=20, seed=0):
+    """
+    Writes num_docs PMC-style XML files to output_dir/xml, plus passages.jsonl
+    (44_Testing.jsonl-style records with the stated triples as "output") and
+    ground_truth.jsonl keyed by document id for the pipeline's evaluate stage.
+    """
+    rng = random.Random(seed)
+    xml_dir = os.path.join(output_dir, "xml")
+    os.makedirs(xml_dir, exist_ok=True)
+    with open(os.path.join(output_dir, "passages.jsonl"), "w", encoding="utf-8") as passages, \
+         open(os.path.join(output_dir, "ground_truth.jsonl"), "w", encoding="utf-8") as ground_truth:
+        for i in tqdm(range(num_docs), desc="Generating articles", unit=" docs"):
+            doc_id = f"PMC_SYN{i:08d}"
+            xml, abstract, triples = make_article(rng, doc_id, body_paragraphs)
+            with open(os.path.join(xml_dir, f"{doc_id}.xml"), "w", encoding="utf-8") as file:
+                file.write(xml)
+            passages.write(json.dumps({"input": abstract, "output": triples}) + "\n")
+            ground_truth.write(json.dumps({"id": doc_id, "output": triples}) + "\n")
+    return xml_dir
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Generate a synthetic PMC-style XML corpus and matching extraction passages.')
+    parser.add_argument('output_dir', type=str, help='Folder to write xml/, passages.jsonl and ground_truth.jsonl to')
+    parser.add_argument('--num_docs', type=int, default=1000, help='Number of articles (default: 1000)')
+    parser.add_argument('--body_paragraphs', type=int, default=20, help='Body paragraphs per article, controls XML size (default: 20)')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed (default: 0)')
+
+    args = parser.parse_args(argv)
+
+    generate(args.output_dir, args.num_docs, args.body_paragraphs, args.seed)
+
+if __name__ == '__main__':
+    main()
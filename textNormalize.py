@@ -0,0 +1,188 @@
+import re
+import html
+import time
+import argparse
+import unicodedata
+from itertools import repeat
+from concurrent.futures import ProcessPoolExecutor
+from tqdm import tqdm
+from jsonlIO import iter_jsonl, loads, dumps
+
+# Bytes 0x80-0x9f as Windows-1252 shows them; text mis-decoded as cp1252 contains these
+# characters where latin-1 would leave C1 control characters
+_CP1252_HIGH = bytes(range(0x80, 0xa0)).decode('cp1252', errors='ignore')
+_TO_BYTE = {}
+for _byte in range(0x80, 0x100):
+    _TO_BYTE[chr(_byte)] = _byte
+for _char in _CP1252_HIGH:
+    _TO_BYTE[_char] = _char.encode('cp1252')[0]
+_CONTINUATION = '[' + re.escape(''.join(char for char, byte in _TO_BYTE.items() if 0x80 <= byte <= 0xbf)) + ']'
+
+# A UTF-8 lead byte (0xc2-0xf4) followed by continuation bytes, all shown as latin-1/cp1252 characters
+MOJIBAKE_PATTERN = re.compile('[\u00c2-\u00f4]' + _CONTINUATION + '{1,3}')
+# What is left of a three-byte punctuation sequence whose last byte was lost, e.g. a thin space
+BROKEN_PUNCTUATION_PATTERN = re.compile('\u00e2[\u0080\u20ac](?=\\s|\ufffd|$)\ufffd?')
+
+PUNCTUATION = {
+    '\u2010': '-', '\u2011': '-', '\u2012': '-', '\u2013': '-', '\u2014': '-', '\u2212': '-',
+    '\u2018': "'", '\u2019': "'", '\u201a': "'", '\u201b': "'",
+    '\u201c': '"', '\u201d': '"', '\u201e': '"', '\u201f': '"',
+    '\u00ad': '', '\u200b': '', '\ufeff': '',
+}
+# Compatibility characters folded on purpose. Blanket NFKC would also flatten
+# superscripts, subscripts and fractions (10⁻³, H₂O, m², ½), which carry meaning.
+FOLDS = {
+    '\u00b5': '\u03bc',  # micro sign -> Greek mu
+    '\ufb00': 'ff', '\ufb01': 'fi', '\ufb02': 'fl', '\ufb03': 'ffi', '\ufb04': 'ffl', '\ufb05': 'st', '\ufb06': 'st',
+    '\u3000': ' ',
+}
+# Full-width ASCII forms (e.g. from CJK publishers)
+FOLDS.update({chr(code): chr(code - 0xfee0) for code in range(0xff01, 0xff5f)})
+FOLDS.update(PUNCTUATION)
+# A regex substitution is an order of magnitude faster than str.translate on non-ASCII text
+FOLD_PATTERN = re.compile('[' + ''.join(re.escape(char) for char in FOLDS) + ']')
+
+# Markup that leaks into text: JATS and HTML inline elements, and MathML, with or
+# without a namespace prefix. Attributes must be name="value" pairs, so prose between
+# comparison operators ('p <LOQ and >10') is never taken for a tag.
+MARKUP_TAGS = [
+    'a', 'b', 'i', 'u', 'em', 'strong', 'span', 'div', 'p', 'br', 'hr', 'sup', 'sub', 'sc', 'tt',
+    'italic', 'bold', 'underline', 'overline', 'monospace', 'roman', 'sans-serif', 'small-caps', 'strike',
+    'xref', 'ext-link', 'uri', 'email', 'named-content', 'styled-content', 'inline-formula', 'disp-formula',
+    'inline-graphic', 'graphic', 'tex-math', 'label', 'caption', 'title', 'sec', 'fn', 'break',
+    'list', 'list-item', 'table', 'thead', 'tbody', 'tr', 'td', 'th', 'abbrev',
+    'math', 'semantics', 'annotation', 'mrow', 'mi', 'mn', 'mo', 'ms', 'mtext', 'mspace', 'msub', 'msup',
+    'msubsup', 'mfrac', 'msqrt', 'mroot', 'mover', 'munder', 'munderover', 'mstyle', 'mfenced',
+    'mtable', 'mtr', 'mtd', 'mpadded', 'mphantom',
+]
+TAG_PATTERN = re.compile(
+    r'</?(?:[A-Za-z][\w.-]*:)?(?:' + '|'.join(re.escape(tag) for tag in sorted(MARKUP_TAGS, key=len, reverse=True)) + r')'
+    r'(?:\s+[\w:.-]+\s*=\s*(?:"[^"<>]*"|\'[^\'<>]*\'))*\s*/?>', re.IGNORECASE)
+
+def _repair(match):
+    text = match.group()
+    try:
+        return bytes(_TO_BYTE[char] for char in text).decode('utf-8')
+    except (KeyError, UnicodeDecodeError):
+        return text
+
+def repair_mojibake(text):
+    """
+    Re-decodes UTF-8 that was decoded as latin-1 or cp1252, e.g. 'Î¼' -> 'μ'. Runs
+    that do not form valid UTF-8 are left alone, so correct text is never changed.
+    """
+    text = MOJIBAKE_PATTERN.sub(_repair, text)
+    return BROKEN_PUNCTUATION_PATTERN.sub(' ', text)
+
+def normalize_text(text):
+    """
+    Repairs mojibake, drops stray markup tags and entities, applies NFC, folds micro
+    signs, ligatures and full-width forms (FOLDS), maps typographic dashes and quotes
+    to ASCII and collapses whitespace, thin spaces included.
+    """
+    if not text.isascii():
+        text = repair_mojibake(text)
+        text = unicodedata.normalize('NFC', text)
+        text = FOLD_PATTERN.sub(lambda match: FOLDS[match.group()], text)
+    if '<' in text:
+        text = TAG_PATTERN.sub(' ', text)
+    if '&' in text:
+        text = html.unescape(text)
+    return ' '.join(text.split())
+
+def normalize_record(record, fields=('input',)):
+    for field in fields:
+        if isinstance(record.get(field), str):
+            record[field] = normalize_text(record[field])
+    return record
+
+def _needs_normalizing(line):
+    # Plain ASCII without escapes, tags, entities or doubled spaces is already normal
+    return not line.isascii() or b'\\' in line or b'<' in line or b'&' in line or b'  ' in line
+
+def normalize_lines(lines, fields=('input',)):
+    """
+    Normalises a batch of raw JSONL lines; lines that are already normal pass through untouched.
+    """
+    output = []
+    for line in lines:
+        if line.strip() and _needs_normalizing(line.rstrip(b'\r\n')):
+            record = normalize_record(loads(line), fields)
+            line = dumps(record) + b'\n'
+        output.append(line)
+    return output
+
+def _batches(file, batch_bytes):
+    batch = []
+    size = 0
+    for line in file:
+        batch.append(line)
+        size += len(line)
+        if size >= batch_bytes:
+            yield batch
+            batch, size = [], 0
+    if batch:
+        yield batch
+
+def normalize_jsonl(input_path, output_path, fields=('input',), workers=1, batch_bytes=8 * 1024 * 1024):
+    """
+    Normalises the given fields of every record in a JSONL file, in batches of lines
+    spread over worker processes, and returns (bytes in, bytes out, seconds).
+    """
+    start = time.perf_counter()
+    bytes_in = 0
+    bytes_out = 0
+    with open(input_path, 'rb') as infile, open(output_path, 'wb') as outfile, \
+            tqdm(unit='B', unit_scale=True, desc="Normalising") as pbar:
+        if workers > 1:
+            executor = ProcessPoolExecutor(workers)
+            results = executor.map(normalize_lines, _batches(infile, batch_bytes), repeat(fields))
+        else:
+            executor = None
+            results = (normalize_lines(batch, fields) for batch in _batches(infile, batch_bytes))
+        try:
+            for lines in results:
+                for line in lines:
+                    outfile.write(line)
+                    bytes_out += len(line)
+                pbar.update(bytes_out - pbar.n)
+        finally:
+            if executor is not None:
+                executor.shutdown()
+        bytes_in = infile.tell()
+    return bytes_in, bytes_out, time.perf_counter() - start
+
+def token_savings(input_path, output_path, model, fields=('input',)):
+    """
+    Counts the tokens of the given fields before and after normalisation.
+    """
+    from tokenBudget import count_tokens
+    totals = []
+    for path in (input_path, output_path):
+        total = 0
+        for record in iter_jsonl(path):
+            total += sum(count_tokens(record[field], model) for field in fields if isinstance(record.get(field), str))
+        totals.append(total)
+    return totals
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Repair mojibake and normalise text fields of a JSONL dataset.')
+    parser.add_argument('input', type=str, help='Input JSONL file')
+    parser.add_argument('output', type=str, help='Output JSONL file')
+    parser.add_argument('--fields', type=str, default='input', help='Comma separated text fields to normalise (default: input)')
+    parser.add_argument('--workers', type=int, default=1, help='Worker processes (default: 1)')
+    parser.add_argument('--model', type=str, default='gpt-4o', help='Model whose tokenizer counts the savings (default: gpt-4o)')
+    parser.add_argument('--no_tokens', action='store_true', help='Skip counting token savings')
+
+    args = parser.parse_args(argv)
+
+    fields = tuple(args.fields.split(','))
+    bytes_in, bytes_out, seconds = normalize_jsonl(args.input, args.output, fields, args.workers)
+    print(f"{bytes_in / 1e6:.1f} MB -> {bytes_out / 1e6:.1f} MB in {seconds:.2f}s ({bytes_in / 1e6 / seconds:.0f} MB/s)")
+    if not args.no_tokens:
+        before, after = token_savings(args.input, args.output, args.model, fields)
+        saved = (before - after) / before if before else 0
+        print(f"Tokens: {before} -> {after} ({saved:.1%} saved)")
+
+if __name__ == '__main__':
+    main()
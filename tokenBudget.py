@@ -0,0 +1,214 @@
+import re
+import math
+import argparse
+from itertools import islice
+from functools import lru_cache
+from tqdm import tqdm
+from jsonlIO import iter_jsonl
+
+# Context window in tokens; models missing here need context_tokens (--context_tokens)
+MODEL_CONTEXT = {
+    "gpt-4o": 128000,
+    "gpt-4o-mini": 128000,
+    "llama-3.1-70b-versatile": 131072,
+    "llama-3.1-8b-instant": 131072,
+}
+DEFAULT_RESERVE_OUTPUT = 1024
+# Typical completion length of a triple list, used to project cost before a run
+DEFAULT_COMPLETION_TOKENS = 300
+
+SENTENCE_PATTERN = re.compile(r'(?<=[.!?])\s+')
+APPROX_PATTERN = re.compile(r'\w+|[^\w\s]')
+
+class SpendCapExceeded(Exception):
+    pass
+
+def _approximate_count(text):
+    """
+    Tokenizer-free estimate: one token per punctuation mark and one per four
+    characters of every word, which tracks BPE tokenizers closely on English prose.
+    """
+    return sum(math.ceil(len(piece) / 4) for piece in APPROX_PATTERN.findall(text))
+
+@lru_cache(maxsize=None)
+def get_counter(model):
+    """
+    Returns a token counting function for a model, created once per model. Uses the
+    model's tiktoken encoding when tiktoken and its encoding files are available,
+    otherwise the local approximation.
+    """
+    try:
+        import tiktoken
+        try:
+            encoding = tiktoken.encoding_for_model(model)
+        except KeyError:
+            encoding = tiktoken.get_encoding("o200k_base")
+        return lambda text: len(encoding.encode(text, disallowed_special=()))
+    except Exception:
+        # No tiktoken, or its encoding files cannot be downloaded here
+        return _approximate_count
+
+def count_tokens(text, model):
+    return get_counter(model)(text)
+
+class TokenBudget:
+    """
+    Keeps every request within the model's context window (or a smaller max_input_tokens),
+    leaving reserve_output tokens for the completion. The context window of a model missing
+    from MODEL_CONTEXT, e.g. one served locally, must be given as context_tokens.
+    """
+    def __init__(self, model, max_input_tokens=None, reserve_output=DEFAULT_RESERVE_OUTPUT, mode='split', context_tokens=None):
+        self.model = model
+        self.count = get_counter(model)
+        context = MODEL_CONTEXT.get(model, context_tokens)
+        if context is None:
+            raise ValueError(f"Unknown context window for {model}; pass it with --context_tokens")
+        self.max_input_tokens = min(max_input_tokens or context, context - reserve_output)
+        self.mode = mode
+        self.settings = (max_input_tokens, reserve_output, mode, context_tokens)
+        # The prompt is the same for most requests, so its count is kept for the next one
+        self._prompt_count = (None, 0)
+
+    def for_model(self, model):
+        """
+        The same budget settings applied to another model, e.g. the small model of a cascade.
+        """
+        return TokenBudget(model, *self.settings)
+
+    def prompt_tokens(self, prompt):
+        cached_prompt, count = self._prompt_count
+        if prompt != cached_prompt:
+            count = self.count(prompt)
+            self._prompt_count = (prompt, count)
+        return count
+
+    def passage_budget(self, prompt):
+        prompt_tokens = self.prompt_tokens(prompt)
+        budget = self.max_input_tokens - prompt_tokens
+        if budget <= 0:
+            raise ValueError(f"The prompt alone uses {prompt_tokens} of {self.max_input_tokens} input tokens for {self.model}")
+        return budget
+
+    def fit(self, prompt, passage):
+        """
+        Returns the passage as a list of pieces that each fit after the prompt: the
+        passage itself if it fits, else its first piece ('truncate') or all pieces
+        ('split'). Pieces break at sentence boundaries where possible.
+        """
+        budget = self.passage_budget(prompt)
+        if self.count(passage) <= budget:
+            return [passage]
+        pieces = []
+        current = []
+        current_tokens = 0
+        for unit in self._units(passage, budget):
+            tokens = self.count(unit) + 1
+            if current and current_tokens + tokens > budget:
+                pieces.append(' '.join(current))
+                if self.mode == 'truncate':
+                    return pieces
+                current, current_tokens = [], 0
+            current.append(unit)
+            current_tokens += tokens
+        if current:
+            pieces.append(' '.join(current))
+        return pieces[:1] if self.mode == 'truncate' else pieces
+
+    def _units(self, passage, budget):
+        """
+        Sentences of the passage, with any sentence longer than the budget cut into word runs.
+        """
+        for sentence in SENTENCE_PATTERN.split(passage):
+            if self.count(sentence) < budget:
+                yield sentence
+                continue
+            words = sentence.split()
+            start = 0
+            while start < len(words):
+                # Binary search for the longest run of words that fits
+                low, high = start + 1, len(words)
+                while low < high:
+                    middle = (low + high + 1) // 2
+                    if self.count(' '.join(words[start:middle])) < budget:
+                        low = middle
+                    else:
+                        high = middle - 1
+                yield ' '.join(words[start:low])
+                start = low
+
+def project_run(passages, prompt, budget, completion_tokens=DEFAULT_COMPLETION_TOKENS, mean_latency=None, concurrency=1,
+                prompts_for=None, batch_size=256):
+    """
+    Projects the requests, tokens, cost and duration of a run from local token counts.
+    prompts_for, if given, returns the prompts of a batch of passages (e.g. ExampleBank.prompts
+    with few-shot examples chosen per passage).
+    """
+    from extractionRunner import request_cost
+    requests = 0
+    prompt_tokens = 0
+    passages = iter(tqdm(passages, desc="Counting tokens", unit=" passages"))
+    while True:
+        batch = list(islice(passages, batch_size))
+        if not batch:
+            break
+        prompts = prompts_for(batch) if prompts_for is not None else [prompt] * len(batch)
+        for passage, passage_prompt in zip(batch, prompts):
+            passage_prompt_count = budget.prompt_tokens(passage_prompt)
+            for piece in budget.fit(passage_prompt, passage):
+                requests += 1
+                prompt_tokens += passage_prompt_count + budget.count(piece)
+    total_completion = requests * completion_tokens
+    projection = {
+        "model": budget.model,
+        "requests": requests,
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens_estimate": total_completion,
+        "cost_usd": request_cost(budget.model, prompt_tokens, total_completion),
+        "duration_seconds": requests * mean_latency / concurrency if mean_latency else None,
+    }
+    return projection
+
+def check_spend_cap(projection, spend_cap):
+    if spend_cap is not None and projection["cost_usd"] > spend_cap:
+        raise SpendCapExceeded(f"Projected cost ${projection['cost_usd']:.2f} exceeds the spend cap of ${spend_cap:.2f}")
+
+def print_projection(projection):
+    print(f"Model: {projection['model']}")
+    print(f"Requests: {projection['requests']}, prompt tokens: {projection['prompt_tokens']}, "
+          f"completion tokens (estimate): {projection['completion_tokens_estimate']}")
+    print(f"Projected cost: ${projection['cost_usd']:.2f}")
+    if projection['duration_seconds'] is not None:
+        print(f"Projected duration: {projection['duration_seconds'] / 3600:.2f} h")
+
+def add_arguments(parser):
+    parser.add_argument('--context_tokens', type=int, default=None, help='Context window of a model missing from tokenBudget.MODEL_CONTEXT, e.g. a local model')
+    parser.add_argument('--max_input_tokens', type=int, default=None, help='Input token budget per request (default: the model context window)')
+    parser.add_argument('--reserve_output', type=int, default=DEFAULT_RESERVE_OUTPUT, help=f'Tokens kept free for the completion (default: {DEFAULT_RESERVE_OUTPUT})')
+    parser.add_argument('--overflow', type=str, default='split', choices=['split', 'truncate'], help='Split long passages into several requests or keep only the first part (default: split)')
+    parser.add_argument('--spend_cap', type=float, default=None, help='Refuse to start, or stop, a run whose cost would exceed this many USD')
+
+def budget_from_args(args):
+    return TokenBudget(args.model, args.max_input_tokens, args.reserve_output, args.overflow, args.context_tokens)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Project the token use, cost and duration of an extraction run before starting it.')
+    parser.add_argument('dataset', type=str, help='Input JSONL dataset with an "input" field per line')
+    parser.add_argument('--prompt_file', type=str, required=True, help='Text file holding the prompt')
+    parser.add_argument('--model', type=str, default='gpt-4o', help='Model name (default: gpt-4o)')
+    parser.add_argument('--completion_tokens', type=int, default=DEFAULT_COMPLETION_TOKENS, help=f'Expected completion tokens per request (default: {DEFAULT_COMPLETION_TOKENS})')
+    parser.add_argument('--mean_latency', type=float, default=None, help='Mean seconds per request, e.g. from evalReport.py, to project duration')
+    parser.add_argument('--concurrency', type=int, default=1, help='Concurrent requests when projecting duration (default: 1)')
+    add_arguments(parser)
+
+    args = parser.parse_args(argv)
+
+    with open(args.prompt_file, 'r', encoding='utf-8') as file:
+        prompt = file.read()
+    budget = budget_from_args(args)
+    passages = (data['input'] for data in iter_jsonl(args.dataset))
+    projection = project_run(passages, prompt, budget, args.completion_tokens, args.mean_latency, args.concurrency)
+    print_projection(projection)
+    check_spend_cap(projection, args.spend_cap)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,267 @@
+import os
+import json
+import time
+import hashlib
+import sqlite3
+import argparse
+from tqdm import tqdm
+from synonymIndex import SynonymIndex, TripleNormalizer
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS terms (
+    id INTEGER PRIMARY KEY,
+    text TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS triples (
+    id INTEGER PRIMARY KEY,
+    subject_id INTEGER NOT NULL,
+    predicate_id INTEGER NOT NULL,
+    object_id INTEGER NOT NULL,
+    support INTEGER NOT NULL DEFAULT 0,
+    UNIQUE (subject_id, predicate_id, object_id)
+);
+CREATE INDEX IF NOT EXISTS triples_predicate ON triples (predicate_id, support);
+CREATE INDEX IF NOT EXISTS triples_object ON triples (object_id);
+CREATE TABLE IF NOT EXISTS sources (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL UNIQUE,
+    ingested_bytes INTEGER NOT NULL DEFAULT 0,
+    fingerprint TEXT
+);
+CREATE TABLE IF NOT EXISTS provenance (
+    triple_id INTEGER NOT NULL,
+    source_id INTEGER NOT NULL,
+    offset INTEGER NOT NULL,
+    PRIMARY KEY (triple_id, source_id, offset)
+) WITHOUT ROWID;
+"""
+
+BATCH_SIZE = 10000
+TERM_CACHE_SIZE = 1000000
+# Bytes hashed at each end of the ingested part of a source
+FINGERPRINT_BYTES = 65536
+
+def normalize_term(text):
+    return ' '.join(text.split()).lower()
+
+def prefix_fingerprint(path, end):
+    """
+    Hash of the first and last FINGERPRINT_BYTES of the first end bytes of a file, so
+    a rewritten source is told apart from an appended one without rereading all of it.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as file:
+        digest.update(file.read(min(end, FINGERPRINT_BYTES)))
+        if end > FINGERPRINT_BYTES:
+            tail_start = max(FINGERPRINT_BYTES, end - FINGERPRINT_BYTES)
+            file.seek(tail_start)
+            digest.update(file.read(end - tail_start))
+    return digest.hexdigest()
+
+class TripleStore:
+    """
+    SQLite store of deduplicated triples. Strings are dictionary-encoded into integer
+    term ids, each distinct triple is stored once with the number of passages that
+    support it, and provenance keeps the byte offset of every supporting JSONL record.
+    """
+    def __init__(self, db_path, normalizer=None):
+        self.connection = sqlite3.connect(db_path)
+        self.connection.executescript(SCHEMA)
+        # Stores created before sources were fingerprinted
+        if 'fingerprint' not in [row[1] for row in self.connection.execute("PRAGMA table_info(sources)")]:
+            self.connection.execute("ALTER TABLE sources ADD COLUMN fingerprint TEXT")
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.execute("PRAGMA cache_size=-262144")  # 256 MB page cache
+        self.normalizer = normalizer or TripleNormalizer()
+        self.term_cache = {}
+
+    def normalize(self, triple):
+        subject, predicate, obj = self.normalizer.normalize(triple)
+        # Canonical predicates keep their spelling; free text is compared case-insensitively
+        return normalize_term(subject), ' '.join(predicate.split()), normalize_term(obj)
+
+    def term_id(self, text, create=True):
+        term_id = self.term_cache.get(text)
+        if term_id is not None:
+            return term_id
+        row = self.connection.execute("SELECT id FROM terms WHERE text = ?", (text,)).fetchone()
+        if row is not None:
+            term_id = row[0]
+        elif create:
+            term_id = self.connection.execute("INSERT INTO terms (text) VALUES (?)", (text,)).lastrowid
+        else:
+            return None
+        if len(self.term_cache) >= TERM_CACHE_SIZE:
+            self.term_cache.clear()
+        self.term_cache[text] = term_id
+        return term_id
+
+    def add(self, triples, source_id, offset):
+        """
+        Adds the triples of one passage. A triple repeated within the passage, or a
+        passage that was already ingested, does not add support twice.
+        """
+        added = 0
+        keys = {self.normalize(triple) for triple in triples if len(triple) == 3}
+        for subject, predicate, obj in keys:
+            ids = (self.term_id(subject), self.term_id(predicate), self.term_id(obj))
+            self.connection.execute(
+                "INSERT INTO triples (subject_id, predicate_id, object_id) VALUES (?, ?, ?) "
+                "ON CONFLICT (subject_id, predicate_id, object_id) DO NOTHING", ids)
+            triple_id = self.connection.execute(
+                "SELECT id FROM triples WHERE subject_id = ? AND predicate_id = ? AND object_id = ?", ids).fetchone()[0]
+            cursor = self.connection.execute(
+                "INSERT OR IGNORE INTO provenance (triple_id, source_id, offset) VALUES (?, ?, ?)", (triple_id, source_id, offset))
+            if cursor.rowcount:
+                self.connection.execute("UPDATE triples SET support = support + 1 WHERE id = ?", (triple_id,))
+                added += 1
+        return added
+
+    def forget(self, source_id):
+        """
+        Removes the support and provenance one source contributed, before it is ingested again.
+        """
+        self.connection.execute(
+            "UPDATE triples SET support = support - (SELECT COUNT(*) FROM provenance p WHERE p.triple_id = triples.id AND p.source_id = ?) "
+            "WHERE id IN (SELECT triple_id FROM provenance WHERE source_id = ?)", (source_id, source_id))
+        self.connection.execute("DELETE FROM provenance WHERE source_id = ?", (source_id,))
+        self.connection.execute("DELETE FROM triples WHERE support <= 0")
+
+    def checkpoint(self, source_id, path, offset):
+        self.connection.execute("UPDATE sources SET ingested_bytes = ?, fingerprint = ? WHERE id = ?",
+                                (offset, prefix_fingerprint(path, offset), source_id))
+        self.connection.commit()
+
+    def ingest(self, jsonl_path):
+        """
+        Ingests an extraction output JSONL file. Only the bytes appended since the last
+        ingest of the same file are read, so growing output files can be merged repeatedly.
+        A file that was rewritten rather than appended to, detected by the fingerprint of
+        its ingested part, replaces what it contributed before.
+        """
+        path = os.path.abspath(jsonl_path)
+        self.connection.execute("INSERT OR IGNORE INTO sources (path) VALUES (?)", (path,))
+        source_id, start, fingerprint = self.connection.execute(
+            "SELECT id, ingested_bytes, fingerprint FROM sources WHERE path = ?", (path,)).fetchone()
+        if start and (os.path.getsize(path) < start or
+                      fingerprint is not None and prefix_fingerprint(path, start) != fingerprint):
+            self.forget(source_id)
+            start = 0
+
+        records = 0
+        added = 0
+        offset = start
+        with open(path, 'rb') as file, tqdm(desc=f"Ingesting {os.path.basename(path)}", unit=" records") as pbar:
+            file.seek(start)
+            for line in file:
+                if not line.endswith(b'\n'):
+                    # A partially written last record is picked up on the next ingest
+                    break
+                record_offset = offset
+                offset += len(line)
+                if not line.strip():
+                    continue
+                data = json.loads(line)
+                added += self.add(data.get('output', []), source_id, record_offset)
+                records += 1
+                pbar.update(1)
+                if records % BATCH_SIZE == 0:
+                    self.checkpoint(source_id, path, offset)
+        self.checkpoint(source_id, path, offset)
+        return records, added
+
+    def lookup(self, subject=None, predicate=None, obj=None, limit=100):
+        """
+        Returns (subject, predicate, object, support) for triples matching every given
+        field, most supported first.
+        """
+        conditions = []
+        params = []
+        for column, value in (("subject_id", subject), ("predicate_id", predicate), ("object_id", obj)):
+            if value is None:
+                continue
+            if column == "predicate_id":
+                value = self.normalize(["", value, ""])[1]
+            else:
+                value = normalize_term(value)
+            term_id = self.term_id(value, create=False)
+            if term_id is None:
+                return []
+            conditions.append(f"t.{column} = ?")
+            params.append(term_id)
+        where = "WHERE " + " AND ".join(conditions) if conditions else ""
+        query = (
+            "SELECT s.text, p.text, o.text, t.support FROM triples t "
+            "JOIN terms s ON s.id = t.subject_id JOIN terms p ON p.id = t.predicate_id JOIN terms o ON o.id = t.object_id "
+            f"{where} ORDER BY t.support DESC LIMIT ?")
+        return self.connection.execute(query, params + [limit]).fetchall()
+
+    def provenance(self, subject, predicate, obj):
+        """
+        Returns (source path, byte offset) for every passage supporting one triple.
+        """
+        subject, predicate, obj = self.normalize([subject, predicate, obj])
+        ids = [self.term_id(term, create=False) for term in (subject, predicate, obj)]
+        if None in ids:
+            return []
+        return self.connection.execute(
+            "SELECT src.path, pr.offset FROM triples t JOIN provenance pr ON pr.triple_id = t.id "
+            "JOIN sources src ON src.id = pr.source_id "
+            "WHERE t.subject_id = ? AND t.predicate_id = ? AND t.object_id = ?", ids).fetchall()
+
+    def stats(self):
+        count = lambda table: self.connection.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+        supporting = self.connection.execute("SELECT COALESCE(SUM(support), 0) FROM triples").fetchone()[0]
+        return {"triples": count("triples"), "terms": count("terms"), "sources": count("sources"), "supporting_passages": supporting}
+
+    def close(self):
+        self.connection.close()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Merge extraction output into a deduplicated triple store and query it.')
+    parser.add_argument('--synonym_index', type=str, default=None, help='Synonym index built with synonymIndex.py, used to normalise subjects')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    ingest_parser = subparsers.add_parser('ingest', help='Add extraction output JSONL files to the store')
+    ingest_parser.add_argument('db', type=str, help='Path to the SQLite store')
+    ingest_parser.add_argument('files', type=str, nargs='+', help='Extraction output JSONL files')
+
+    lookup_parser = subparsers.add_parser('lookup', help='Find triples by subject, predicate and/or object')
+    lookup_parser.add_argument('db', type=str, help='Path to the SQLite store')
+    lookup_parser.add_argument('--subject', type=str, default=None)
+    lookup_parser.add_argument('--predicate', type=str, default=None)
+    lookup_parser.add_argument('--object', type=str, default=None)
+    lookup_parser.add_argument('--limit', type=int, default=100, help='Maximum triples to print (default: 100)')
+    lookup_parser.add_argument('--provenance', action='store_true', help='Also print the source records of each triple')
+
+    stats_parser = subparsers.add_parser('stats', help='Print the size of the store')
+    stats_parser.add_argument('db', type=str, help='Path to the SQLite store')
+
+    args = parser.parse_args(argv)
+
+    normalizer = TripleNormalizer(SynonymIndex(args.synonym_index) if args.synonym_index else None)
+    store = TripleStore(args.db, normalizer)
+    try:
+        if args.command == 'ingest':
+            for file_path in args.files:
+                records, added = store.ingest(file_path)
+                print(f"{file_path}: {records} new records, {added} supporting triples")
+            print(json.dumps(store.stats(), indent=4))
+        elif args.command == 'lookup':
+            start = time.perf_counter()
+            rows = store.lookup(args.subject, args.predicate, args.object, args.limit)
+            elapsed = time.perf_counter() - start
+            for subject, predicate, obj, support in rows:
+                print(f"{support:>8}  {json.dumps([subject, predicate, obj])}")
+                if args.provenance:
+                    for path, offset in store.provenance(subject, predicate, obj):
+                        print(f"          {path}:{offset}")
+            print(f"{len(rows)} triples in {elapsed * 1000:.1f} ms")
+        else:
+            print(json.dumps(store.stats(), indent=4))
+    finally:
+        store.close()
+
+if __name__ == '__main__':
+    main()